@@ -0,0 +1,84 @@
+"""add trigger-maintained per-owner row counts
+
+Revision ID: 3d5b8e6f2c17
+Revises: 7e1f0c2d9a41
+Create Date: 2026-10-18 11:02:09.512770
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "3d5b8e6f2c17"
+down_revision = "7e1f0c2d9a41"
+branch_labels = None
+depends_on = None
+
+# Table -> owner column whose per-owner counts are kept in row_counts
+COUNTED = {"drafts": "user_id", "item": "owner_id"}
+
+
+def upgrade():
+    op.create_table(
+        "row_counts",
+        sa.Column("table_name", sqlmodel.sql.sqltypes.AutoString(length=63), nullable=False),
+        sa.Column("owner_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("table_name", "owner_id"),
+    )
+    # Runs in the writing transaction, so counts commit or roll back with the rows
+    op.execute(
+        """
+        CREATE FUNCTION row_counts_maintain() RETURNS trigger AS $$
+        DECLARE
+            old_owner uuid;
+            new_owner uuid;
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                EXECUTE format('SELECT ($1).%I', TG_ARGV[0]) INTO old_owner USING OLD;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                EXECUTE format('SELECT ($1).%I', TG_ARGV[0]) INTO new_owner USING NEW;
+            END IF;
+            IF old_owner IS NOT DISTINCT FROM new_owner THEN
+                RETURN NULL;
+            END IF;
+            IF old_owner IS NOT NULL THEN
+                UPDATE row_counts SET count = count - 1
+                WHERE table_name = TG_TABLE_NAME AND owner_id = old_owner;
+            END IF;
+            IF new_owner IS NOT NULL THEN
+                INSERT INTO row_counts (table_name, owner_id, count)
+                VALUES (TG_TABLE_NAME, new_owner, 1)
+                ON CONFLICT (table_name, owner_id) DO UPDATE SET count = row_counts.count + 1;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table, owner in COUNTED.items():
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_row_counts
+            AFTER INSERT OR DELETE OR UPDATE OF {owner} ON "{table}"
+            FOR EACH ROW EXECUTE FUNCTION row_counts_maintain('{owner}')
+            """
+        )
+        op.execute(
+            f"""
+            INSERT INTO row_counts (table_name, owner_id, count)
+            SELECT '{table}', {owner}, count(*) FROM "{table}" GROUP BY {owner}
+            """
+        )
+
+
+def downgrade():
+    for table in COUNTED:
+        op.execute(f'DROP TRIGGER {table}_row_counts ON "{table}"')
+    op.execute("DROP FUNCTION row_counts_maintain()")
+    op.drop_table("row_counts")
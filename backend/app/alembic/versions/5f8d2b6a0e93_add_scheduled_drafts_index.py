@@ -0,0 +1,31 @@
+"""add partial index on scheduled unpublished drafts
+
+Revision ID: 5f8d2b6a0e93
+Revises: 9a2c4e7b1d08
+Create Date: 2026-10-18 12:21:37.840551
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5f8d2b6a0e93"
+down_revision = "9a2c4e7b1d08"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The scheduler polls this on every tick; published drafts never enter the index
+    op.create_index(
+        "ix_drafts_due_scheduled_time",
+        "drafts",
+        ["scheduled_time"],
+        postgresql_where=sa.text("NOT is_published AND scheduled_time IS NOT NULL"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_drafts_due_scheduled_time", table_name="drafts")
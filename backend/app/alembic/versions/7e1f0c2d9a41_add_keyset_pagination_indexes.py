@@ -0,0 +1,48 @@
+"""add created_at and keyset pagination indexes
+
+Revision ID: 7e1f0c2d9a41
+Revises: 4b37cfeafd36
+Create Date: 2026-10-18 10:12:41.118203
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "7e1f0c2d9a41"
+down_revision = "4b37cfeafd36"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "user",
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.add_column(
+        "item",
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    # Keyset pagination needs a total order; NULL created_at would drop rows from pages
+    op.execute(
+        "UPDATE drafts SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL"
+    )
+
+    op.create_index("ix_user_created_at_id", "user", ["created_at", "id"])
+    op.create_index("ix_item_created_at_id", "item", ["created_at", "id"])
+    op.create_index("ix_item_owner_id_created_at_id", "item", ["owner_id", "created_at", "id"])
+    op.create_index("ix_drafts_created_at_id", "drafts", ["created_at", "id"])
+    op.create_index("ix_drafts_user_id_created_at_id", "drafts", ["user_id", "created_at", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_drafts_user_id_created_at_id", table_name="drafts")
+    op.drop_index("ix_drafts_created_at_id", table_name="drafts")
+    op.drop_index("ix_item_owner_id_created_at_id", table_name="item")
+    op.drop_index("ix_item_created_at_id", table_name="item")
+    op.drop_index("ix_user_created_at_id", table_name="user")
+    op.drop_column("item", "created_at")
+    op.drop_column("user", "created_at")
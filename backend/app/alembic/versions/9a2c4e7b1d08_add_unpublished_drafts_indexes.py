@@ -0,0 +1,38 @@
+"""add partial indexes on unpublished drafts
+
+Revision ID: 9a2c4e7b1d08
+Revises: 3d5b8e6f2c17
+Create Date: 2026-10-18 11:40:52.307114
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9a2c4e7b1d08"
+down_revision = "3d5b8e6f2c17"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Random draft selection seeks to a random id within the caller's unpublished drafts
+    op.create_index(
+        "ix_drafts_unpublished_user_id_id",
+        "drafts",
+        ["user_id", "id"],
+        postgresql_where=sa.text("NOT is_published"),
+    )
+    op.create_index(
+        "ix_drafts_unpublished_id",
+        "drafts",
+        ["id"],
+        postgresql_where=sa.text("NOT is_published"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_drafts_unpublished_id", table_name="drafts")
+    op.drop_index("ix_drafts_unpublished_user_id_id", table_name="drafts")
@@ -0,0 +1,62 @@
+"""add tweet outbox
+
+Revision ID: b6e1d4a8c352
+Revises: 5f8d2b6a0e93
+Create Date: 2026-10-18 13:40:52.207316
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "b6e1d4a8c352"
+down_revision = "5f8d2b6a0e93"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "tweet_outbox",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("draft_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("content", sqlmodel.sql.sqltypes.AutoString(length=280), nullable=False),
+        sa.Column("status", sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("last_error", sqlmodel.sql.sqltypes.AutoString(length=1000), nullable=True),
+        sa.Column("twitter_id", sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["draft_id"], ["drafts.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # The relay polls this for due rows and lapsed leases; sent and failed rows stay out
+    op.create_index(
+        "ix_tweet_outbox_pending_next_attempt_at",
+        "tweet_outbox",
+        ["next_attempt_at"],
+        postgresql_where=sa.text("status IN ('pending', 'sending')"),
+    )
+    # At most one delivery in flight per draft, whichever path enqueued it
+    op.create_index(
+        "ix_tweet_outbox_pending_draft_id",
+        "tweet_outbox",
+        ["draft_id"],
+        unique=True,
+        postgresql_where=sa.text("status IN ('pending', 'sending')"),
+    )
+    op.create_index("ix_tweet_outbox_draft_id", "tweet_outbox", ["draft_id"])
+
+
+def downgrade():
+    op.drop_index("ix_tweet_outbox_draft_id", table_name="tweet_outbox")
+    op.drop_index("ix_tweet_outbox_pending_draft_id", table_name="tweet_outbox")
+    op.drop_index("ix_tweet_outbox_pending_next_attempt_at", table_name="tweet_outbox")
+    op.drop_table("tweet_outbox")
@@ -1,19 +1,26 @@
-from collections.abc import Generator
-import json
+import uuid
+from collections.abc import AsyncGenerator, Generator
 from typing import Annotated
 
 from app.cache import CacheService, get_cache_service
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
-from sqlmodel import Session
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
 from app.core.config import settings
-from app.core.db import engine
-from app.models import TokenPayload, User
+from app.core.db import (
+    async_engine,
+    engine,
+    pick_replica,
+    refresh_stale_replicas,
+    replicas,
+)
+from app.models import TokenPayload, User, UserPublic
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -21,46 +28,157 @@ reusable_oauth2 = OAuth2PasswordBearer(
 
 
 def get_db() -> Generator[Session, None, None]:
+    # A Session only checks out a pooled connection on first use, so requests served
+    # entirely from cache (see get_current_user) never touch the pool
     with Session(engine) as session:
         yield session
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    # Objects stay readable after commit; lazy refreshes are not possible on an async session
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+def token_user_id(request: Request) -> uuid.UUID | None:
+    """
+    The user id from the request's bearer token, or None when it has no valid token.
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+        )
+        return uuid.UUID(TokenPayload(**payload).sub)
+    except (InvalidTokenError, ValidationError, TypeError, ValueError):
+        return None
+
+
+def read_pin_key(user_id: uuid.UUID) -> str:
+    return f"db_pin:{user_id}"
+
+
+async def pin_reads_to_primary(request: Request, cache: CacheService) -> None:
+    """
+    Send the authenticated user's reads to the primary for a while, so they see their
+    own writes. Anonymous writes are not pinned: behind the proxy they share one address.
+    """
+    user_id = token_user_id(request)
+    if user_id is not None:
+        await cache.set(
+            read_pin_key(user_id), "1", expire=settings.DB_READ_YOUR_WRITES_SECONDS
+        )
+
+
+async def reads_pinned(request: Request, cache: CacheService) -> bool:
+    user_id = token_user_id(request)
+    return user_id is not None and await cache.get(read_pin_key(user_id)) is not None
+
+
+async def get_read_db(
+    request: Request, cache: Annotated[CacheService, Depends(get_cache_service)]
+) -> AsyncGenerator[Session, None]:
+    """
+    Session for read-only endpoints: a replica within the lag threshold, unless the
+    user wrote recently or no replica qualifies, in which case the primary.
+    """
+    bind = engine
+    if replicas and not await reads_pinned(request, cache):
+        # Lag is measured in the background; this request uses the last measurement
+        refresh_stale_replicas()
+        replica = pick_replica()
+        if replica is not None:
+            bind = replica.engine
+    with Session(bind) as session:
+        yield session
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
+ReadSessionDep = Annotated[Session, Depends(get_read_db)]
 CS = Annotated[CacheService, Depends(get_cache_service)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
+USER_CACHE_TTL = 3600
+
+
+def user_cache_key(user_id: uuid.UUID | str) -> str:
+    return f"user:{user_id}"
+
+
+def user_email_cache_key(email: str) -> str:
+    return f"user:email:{email}"
+
 
-async def get_current_user(session: SessionDep, token: TokenDep, cache: CS) -> User:
+async def cache_user(cache: CacheService, user: User | UserPublic) -> None:
+    """
+    Write-through the cached projection of a user; call after every change to a user row.
+    """
+    await cache.set(
+        user_cache_key(user.id),
+        UserPublic.model_validate(user).model_dump_json(),
+        expire=USER_CACHE_TTL,
+    )
+
+
+async def uncache_user(cache: CacheService, user: User | UserPublic) -> None:
+    """
+    Drop a user's cached projection and email index entry, e.g. on delete or email change.
+    """
+    await cache.delete_many([user_cache_key(user.id), user_email_cache_key(user.email)])
+
+
+async def get_user_id_by_email(
+    session: AsyncSession, cache: CacheService, email: str
+) -> uuid.UUID | None:
+    """
+    Resolve an email to a user id through the cached index, falling back to the database.
+    """
+    cached = await cache.get(user_email_cache_key(email))
+    if cached is not None:
+        return uuid.UUID(cached)
+    user = (await session.exec(select(User.id).where(User.email == email))).first()
+    if user is not None:
+        await cache.set(user_email_cache_key(email), str(user), expire=USER_CACHE_TTL)
+    return user
+
+
+async def get_current_user(
+    session: AsyncSessionDep, token: TokenDep, cache: CS
+) -> UserPublic:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
         token_data = TokenPayload(**payload)
-    except (InvalidTokenError, ValidationError):
+        user_id = uuid.UUID(token_data.sub)
+    except (InvalidTokenError, ValidationError, TypeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    # Check if user is in cache
-    user = cache.get(f"user:{token_data.sub}")
-    if user is None:
-        user = session.get(User, token_data.sub)
-        if user:
-            cache.set(f"user:{token_data.sub}", user.model_dump_json(), expire=3600)  # Store user in cache
+    # Cache hits never query the database; the projection carries no password hash
+    cached = await cache.get(user_cache_key(user_id))
+    if cached is not None:
+        user = UserPublic.model_validate_json(cached)
     else:
-        user = User(**json.loads(user))
-        
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+        db_user = await session.get(User, user_id)
+        if not db_user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user = UserPublic.model_validate(db_user)
+        await cache_user(cache, user)
+
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return user
 
 
-CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentUser = Annotated[UserPublic, Depends(get_current_user)]
 
 
-def get_current_active_superuser(current_user: CurrentUser) -> User:
+def get_current_active_superuser(current_user: CurrentUser) -> UserPublic:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=403, detail="The user doesn't have enough privileges"
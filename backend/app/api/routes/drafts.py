@@ -3,9 +3,11 @@ from typing import Any
 
 from app.utils import generate_title
 from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from sqlmodel import select
 
-from app.api.deps import CurrentUser, SessionDep
+from app.api.deps import CurrentUser, ReadSessionDep, SessionDep
+from app.counts import CountMode, count_rows
+from app.pagination import page, paginate
 from app.models import (
     Draft,
     DraftCreate,
@@ -20,36 +22,36 @@ router = APIRouter()
 
 @router.get("/", response_model=DraftsPublic)
 def index(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+    session: ReadSessionDep,
+    current_user: CurrentUser,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    count: CountMode = "estimate",
 ) -> Any:
     """
-    Retrieve drafts.
+    Retrieve drafts, newest first. Pass `next_cursor` back as `cursor` for the next page.
+    `count` picks a planner estimate (all drafts only; the default), an exact total or
+    none.
     """
 
     if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Draft)
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Draft).offset(skip).limit(limit).order_by(Draft.created_at.desc())
-        )
+        total = count_rows(session, Draft, count)
+        statement = paginate(select(Draft), Draft, skip, limit, cursor)
         drafts = session.exec(statement).all()
     else:
-        count_statement = (
-            select(func.count())
-            .select_from(Draft)
-            .where(Draft.user_id == current_user.id)
-        )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Draft)
-            .where(Draft.user_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-            .order_by(Draft.created_at.desc())
+        total = count_rows(session, Draft, count, owner_id=current_user.id)
+        statement = paginate(
+            select(Draft).where(Draft.user_id == current_user.id),
+            Draft,
+            skip,
+            limit,
+            cursor,
         )
         drafts = session.exec(statement).all()
 
-    return DraftsPublic(data=drafts, count=count)
+    drafts, next_cursor = page(drafts, limit)
+    return DraftsPublic(data=drafts, count=total, next_cursor=next_cursor)
 
 
 @router.get("/{id}", response_model=DraftPublic)
@@ -2,43 +2,48 @@ import uuid
 from typing import Any
 
 from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from sqlmodel import select
 
-from app.api.deps import CurrentUser, SessionDep
+from app.api.deps import CurrentUser, ReadSessionDep, SessionDep
+from app.counts import CountMode, count_rows
 from app.models import Item, ItemCreate, ItemPublic, ItemsPublic, ItemUpdate, Message
+from app.pagination import page, paginate
 
 router = APIRouter()
 
 
 @router.get("/", response_model=ItemsPublic)
 def read_items(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+    session: ReadSessionDep,
+    current_user: CurrentUser,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    count: CountMode = "estimate",
 ) -> Any:
     """
-    Retrieve items.
+    Retrieve items, newest first. Pass `next_cursor` back as `cursor` for the next page.
+    `count` picks a planner estimate (all items only; the default), an exact total or
+    none.
     """
 
     if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Item)
-        count = session.exec(count_statement).one()
-        statement = select(Item).offset(skip).limit(limit)
+        total = count_rows(session, Item, count)
+        statement = paginate(select(Item), Item, skip, limit, cursor)
         items = session.exec(statement).all()
     else:
-        count_statement = (
-            select(func.count())
-            .select_from(Item)
-            .where(Item.owner_id == current_user.id)
-        )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Item)
-            .where(Item.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
+        total = count_rows(session, Item, count, owner_id=current_user.id)
+        statement = paginate(
+            select(Item).where(Item.owner_id == current_user.id),
+            Item,
+            skip,
+            limit,
+            cursor,
         )
         items = session.exec(statement).all()
 
-    return ItemsPublic(data=items, count=count)
+    items, next_cursor = page(items, limit)
+    return ItemsPublic(data=items, count=total, next_cursor=next_cursor)
 
 
 @router.get("/{id}", response_model=ItemPublic)
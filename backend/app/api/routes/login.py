@@ -6,11 +6,18 @@ from fastapi.responses import HTMLResponse
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app import crud
-from app.api.deps import CurrentUser, SessionDep, get_current_active_superuser
+from app.api.deps import (
+    CS,
+    AsyncSessionDep,
+    CurrentUser,
+    SessionDep,
+    get_current_active_superuser,
+    get_user_id_by_email,
+)
 from app.core import security
 from app.core.config import settings
-from app.core.security import get_password_hash
-from app.models import Message, NewPassword, Social, Token, UserCreate, UserPublic
+from app.core.security import password_service
+from app.models import Message, NewPassword, Social, Token, UserPublic
 from app.utils import (
     generate_password_reset_token,
     generate_reset_password_email,
@@ -22,33 +29,35 @@ router = APIRouter()
 
 
 @router.post("/login/social")
-async def social(credentials: Social, session: SessionDep) -> Token:
+async def social(credentials: Social, session: AsyncSessionDep, cache: CS) -> Token:
     """
     Return a new token for current user
     """
-    user = crud.get_user_by_email(session=session, email=credentials.email)
-    if not user:
-        user_create = UserCreate.model_validate(credentials)
-        user = crud.create_user(session=session, user_create=user_create)
+    # Repeat logins resolve the user from cache without a database round trip
+    user_id = await get_user_id_by_email(session, cache, credentials.email)
+    if not user_id:
+        user = await crud.async_create_social_user(session=session, social=credentials)
+        user_id = user.id
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return Token(
         access_token=security.create_access_token(
-            user.id, expires_delta=access_token_expires
+            user_id, expires_delta=access_token_expires
         )
     )
 
 
 @router.post("/login/access-token")
-def login_access_token(
-    session: SessionDep, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+async def login_access_token(
+    session: AsyncSessionDep,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Token:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = crud.authenticate(
-        session=session, email=form_data.username, password=form_data.password
-    )
-    if not user:
+    user = await crud.async_get_user_by_email(session=session, email=form_data.username)
+    if not user or not await password_service.verify(
+        form_data.password, user.hashed_password
+    ):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -93,14 +102,14 @@ def recover_password(email: str, session: SessionDep) -> Message:
 
 
 @router.post("/reset-password/")
-def reset_password(session: SessionDep, body: NewPassword) -> Message:
+async def reset_password(session: AsyncSessionDep, body: NewPassword) -> Message:
     """
     Reset password
     """
     email = verify_password_reset_token(token=body.token)
     if not email:
         raise HTTPException(status_code=400, detail="Invalid token")
-    user = crud.get_user_by_email(session=session, email=email)
+    user = await crud.async_get_user_by_email(session=session, email=email)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -108,10 +117,10 @@ def reset_password(session: SessionDep, body: NewPassword) -> Message:
         )
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    hashed_password = get_password_hash(password=body.new_password)
+    hashed_password = await password_service.hash(body.new_password)
     user.hashed_password = hashed_password
     session.add(user)
-    session.commit()
+    await session.commit()
     return Message(message="Password updated successfully")
 
 
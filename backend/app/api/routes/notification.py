@@ -1,4 +1,4 @@
-import json
+import logging
 import uuid
 from app.models import (
     Message,
@@ -17,23 +17,21 @@ from fastapi import HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
 
-from pywebpush import webpush, WebPushException
-
-from app.api.deps import SessionDep
-from app.core.config import settings
-from sqlmodel import select
+from app.api.deps import AsyncSessionDep, ReadSessionDep, SessionDep
+from app.core.db import async_engine
+from app.webpush import webpush_service
+from sqlmodel import col, delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 import psycopg2
 from psycopg2.errors import UniqueViolation
 from sqlalchemy.exc import IntegrityError
 
 
+logger = logging.getLogger(__name__)
+
 # Create a router for collections
 router = APIRouter()
 
-# VAPID keys
-VAPID_PRIVATE_KEY = settings.VAPID_PRIVATE_KEY
-VAPID_CLAIMS = {"sub": "mailto:{}".format(settings.ADMIN_EMAIL)}
-
 
 # Pydantic models
 class PushSubscriptionRequest(BaseModel):
@@ -65,7 +63,7 @@ class NotificationTemplateSearch(BaseModel):
 
 
 @router.get("/templates")
-def get_templates(db: SessionDep, skip: int = 0, limit: int = 100):
+def get_templates(db: ReadSessionDep, skip: int = 0, limit: int = 100):
     """Get notification templates."""
 
     statement = select(NotificationTemplate).offset(skip).limit(limit)
@@ -156,11 +154,15 @@ def get_subscription_by_endpoint(db: SessionDep, data: PushSubscriptionSearch):
 
 
 @router.post("/subscribe")
-async def subscribe(subscription: PushSubscriptionRequest, db: SessionDep):
+async def subscribe(subscription: PushSubscriptionRequest, db: AsyncSessionDep):
     """Save a push subscription."""
     existing_subscription = (
-        db.query(PushSubscription).filter_by(endpoint=subscription.endpoint).first()
-    )
+        await db.exec(
+            select(PushSubscription).where(
+                PushSubscription.endpoint == subscription.endpoint
+            )
+        )
+    ).first()
 
     if existing_subscription:
         raise HTTPException(status_code=422, detail="Subscription already exists.")
@@ -172,7 +174,7 @@ async def subscribe(subscription: PushSubscriptionRequest, db: SessionDep):
         group=subscription.group,
     )
     db.add(new_subscription)
-    db.commit()
+    await db.commit()
     return {"message": "Subscription added successfully."}
 
 
@@ -192,7 +194,9 @@ def unsubscribe(db: SessionDep, id: str) -> Message:
 
 @router.post("/")
 async def send_notification(
-    notification: NotificationRequest, db: SessionDep, background_tasks: BackgroundTasks
+    notification: NotificationRequest,
+    db: AsyncSessionDep,
+    background_tasks: BackgroundTasks,
 ):
     """Send push notifications to a target group or specific users."""
     if not notification.group and not notification.users:
@@ -202,57 +206,51 @@ async def send_notification(
 
     # Fetch subscriptions based on group or user IDs
     if notification.group:
-        subscriptions = (
-            db.query(PushSubscription).filter_by(group=notification.group).all()
-        )
-    elif notification.users:
-        subscriptions = (
-            db.query(PushSubscription)
-            .filter(PushSubscription.id.in_(notification.users))
-            .all()
+        statement = select(PushSubscription).where(
+            PushSubscription.group == notification.group
         )
     else:
-        subscriptions = []
+        statement = select(PushSubscription).where(
+            col(PushSubscription.id).in_(notification.users)
+        )
+    subscriptions = (await db.exec(statement)).all()
 
     if not subscriptions:
         raise HTTPException(
             status_code=404, detail="No subscriptions found for the target."
         )
 
-    # Add the notification sending task to the background
-    background_tasks.add_task(
-        send_notifications_to_subscribers, subscriptions, notification
-    )
+    # Add the notification sending task to the background. Plain tuples, since the
+    # request's session is closed by the time the task runs
+    targets = [(sub.id, sub.endpoint, sub.p256dh, sub.auth) for sub in subscriptions]
+    background_tasks.add_task(send_notifications_to_subscribers, targets, notification)
 
     return {"message": "Notifications are being sent."}
 
 
-def send_notifications_to_subscribers(subscriptions, notification):
-    failed_subscriptions = []
-
-    for subscriber in subscriptions:
-        try:
-            webpush(
-                subscription_info={
-                    "endpoint": subscriber.endpoint,
-                    "keys": {
-                        "p256dh": subscriber.p256dh,
-                        "auth": subscriber.auth,
-                    },
-                },
-                data=json.dumps(
-                    {
-                        "title": notification.title,
-                        "body": notification.body,
-                        "path": "/collections",
-                    }
-                ),
-                vapid_private_key=settings.VAPID_PRIVATE_KEY,
-                vapid_claims=VAPID_CLAIMS,
-            )
-        except WebPushException as ex:
-            failed_subscriptions.append(subscriber.id)
+async def send_notifications_to_subscribers(targets, notification):
+    result = await webpush_service.send(
+        targets,
+        {
+            "title": notification.title,
+            "body": notification.body,
+            "path": "/collections",
+        },
+    )
+    logger.info(
+        f"Sent {result.sent} of {len(targets)} notifications in {result.seconds:.1f}s"
+    )
 
     # Log or handle failed subscriptions as needed
-    if failed_subscriptions:
-        print(f"Failed to send notifications to: {failed_subscriptions}")
+    if result.failed:
+        logger.error(f"Failed to send {result.failed} notifications")
+    # The push service will never accept these again
+    if result.gone:
+        try:
+            async with AsyncSession(async_engine) as session:
+                await session.exec(  # type: ignore[call-overload]
+                    delete(PushSubscription).where(PushSubscription.id.in_(result.gone))  # type: ignore[attr-defined]
+                )
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Error deleting expired subscriptions: {str(e)}")
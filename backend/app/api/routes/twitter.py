@@ -1,178 +1,224 @@
-import time
-import random  # Add this import for random selection
+import uuid
+from typing import Any, Literal
 
-import requests
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from requests.exceptions import RequestException
-from requests_oauthlib import OAuth1
+from pydantic import BaseModel, Field
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.api.deps import SessionDep, CurrentUser
-from app.core.config import settings
-from app.models import Draft, Tweet
-from datetime import datetime
+from app.api.deps import AsyncSessionDep, CurrentUser
+from app.models import Draft, TweetOutbox, TweetOutboxPublic, UserPublic
+from app.outbox import enqueue_tweet
 
 router = APIRouter()
 
-# Define the Twitter API endpoint for creating tweets
-TWITTER_API_URL = "https://api.twitter.com/2/tweets"
-# Constants
-MAX_RETRIES = 3
-BACKOFF_FACTOR = 2  # Exponential backoff factor
-
-# Set up OAuth1 authentication for Twitter
-auth = OAuth1(
-    client_key=settings.TWITTER_CONSUMER_KEY,
-    client_secret=settings.TWITTER_CONSUMER_SECRET,
-    resource_owner_key=settings.TWITTER_ACCESS_TOKEN,
-    resource_owner_secret=settings.TWITTER_ACCESS_TOKEN_SECRET,
-)
-
 
 # Pydantic model for the tweet content
 class TweetRequest(BaseModel):
-    id: str
+    id: uuid.UUID
+
+
+class BulkTweetRequest(BaseModel):
+    ids: list[uuid.UUID] = Field(min_length=1, max_length=100)
+
+
+class BulkTweetResult(BaseModel):
+    id: uuid.UUID
+    status: Literal[
+        "queued",
+        "not_found",
+        "forbidden",
+        "already_published",
+        "invalid",
+        "locked",
+    ]
+    # Outbox entry to follow via GET /twitter/outbox/{id} once queued
+    outbox_id: uuid.UUID | None = None
+    error: Any = None
 
 
-@router.post("/")
-async def post_tweet(db: SessionDep, current_user: CurrentUser, tweet: TweetRequest):
+class BulkTweetResponse(BaseModel):
+    queued: int
+    failed: int
+    results: list[BulkTweetResult]
+
+
+@router.post("/", status_code=202)
+async def post_tweet(
+    db: AsyncSessionDep, current_user: CurrentUser, tweet: TweetRequest
+):
     """
-    Endpoint to post a tweet to Twitter with validation, retries, and database logging.
+    Endpoint to queue a draft for posting to Twitter.
+
+    The draft is marked published and its tweet recorded in the outbox in one
+    transaction; the outbox relay delivers it, so this returns without waiting on Twitter.
 
     Args:
-        tweet (Tweet): The content of the tweet.
-        db (Session): SQLAlchemy database session.
+        tweet (TweetRequest): The id of the draft to publish.
+        db (AsyncSession): SQLAlchemy database session.
 
     Returns:
-        dict: Response from the Twitter API or error details.
+        dict: The queued outbox entry's id, to follow via GET /twitter/outbox/{id}.
     """
-    draft = db.get(Draft, tweet.id)
+    # Locked so concurrent requests for the same draft queue it once
+    draft = (
+        await db.exec(select(Draft).where(Draft.id == tweet.id).with_for_update())
+    ).first()
     if not draft:
         raise HTTPException(status_code=404, detail="Draft not found")
     if not current_user.is_superuser and (draft.user_id != current_user.id):
         raise HTTPException(status_code=400, detail="Not enough permissions")
-
-    content = draft.content
+    if draft.is_published:
+        raise HTTPException(status_code=409, detail="Draft is already published")
 
     # Validate content length
-    if len(content) > 280:
-        raise HTTPException(status_code=400, detail="Content exceeds the maximum length of 280 characters")
-
-    # # Create the payload for the tweet
-    payload = {"text": content}
-
-    retries = 0
-    while retries < MAX_RETRIES:
-        try:
-            # Make the API request
-            response = requests.post(TWITTER_API_URL, json=payload, auth=auth)
-
-            if response.status_code == 201:
-                # Success: Save to database
-                twitter_response = response.json()
-                new_tweet = Tweet(
-                    content=content,
-                    twitter_id=twitter_response.get("data", {}).get("id"),
-                )
-                db.add(new_tweet)
-                db.commit()
-
-                # set is_published
-                draft.sqlmodel_update(
-                    {"is_published": True, "updated_at": datetime.now()}
-                )
-                db.add(draft)
-                db.commit()
-
-                return {
-                    "message": "Tweet posted successfully",
-                    "tweet": twitter_response,
-                }
-
-            elif response.status_code == 429:
-                # Rate limit hit: Exponential backoff
-                wait_time = BACKOFF_FACTOR**retries
-                time.sleep(wait_time)
-                retries += 1
-                continue
-
-            else:
-                print(response.json())
-                raise HTTPException(
-                    status_code=400, detail=response.json()
-                )
-
-        except RequestException as e:
-            retries += 1
-            time.sleep(BACKOFF_FACTOR**retries)
-            if retries == MAX_RETRIES:
-                raise HTTPException(status_code=500, detail=str(e)) from e
-
-
-@router.post("/publish-random-draft")
-async def publish_random_draft(db: SessionDep, current_user: CurrentUser):
+    if len(draft.content) > 280:
+        raise HTTPException(
+            status_code=400,
+            detail="Content exceeds the maximum length of 280 characters",
+        )
+
+    entry = enqueue_tweet(db, draft)
+    await db.commit()
+
+    return {"message": "Tweet queued for publishing", "id": entry.id}
+
+
+@router.get("/outbox/{id}", response_model=TweetOutboxPublic)
+async def read_outbox_entry(
+    db: AsyncSessionDep, current_user: CurrentUser, id: uuid.UUID
+) -> Any:
+    """
+    Delivery status of a queued tweet.
     """
-    Endpoint to publish a random unpublished draft to Twitter.
+    entry = await db.get(TweetOutbox, id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Outbox entry not found")
+    if not current_user.is_superuser and (entry.user_id != current_user.id):
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+    return entry
 
-    Args:
-        db (Session): SQLAlchemy database session.
 
-    Returns:
-        dict: Response from the Twitter API or error details.
+@router.post("/bulk", status_code=202, response_model=BulkTweetResponse)
+async def bulk_post_tweets(
+    db: AsyncSessionDep, current_user: CurrentUser, body: BulkTweetRequest
+) -> Any:
     """
-    # Fetch all unpublished drafts
-    unpublished_drafts = db.query(Draft).filter(Draft.is_published == False).all()
+    Queue many drafts for publishing at once and report the outcome per draft.
 
-    if not unpublished_drafts:
-        raise HTTPException(status_code=404, detail="No unpublished drafts found")
+    Drafts are loaded and locked in one query, and every eligible draft is queued in
+    the outbox in one transaction; the outbox relay delivers the tweets, so no lock is
+    held while Twitter is called. Drafts locked by another publisher (e.g. the
+    scheduler) are reported as "locked".
+    """
+    ids = list(dict.fromkeys(body.ids))
+    drafts = {
+        draft.id: draft
+        for draft in (
+            await db.exec(
+                select(Draft)
+                .where(Draft.id.in_(ids))  # type: ignore[attr-defined]
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+    }
+    # Ids that exist but were skipped because another transaction holds them
+    locked = set()
+    if len(drafts) < len(ids):
+        missing = [id for id in ids if id not in drafts]
+        locked = set(
+            (await db.exec(select(Draft.id).where(Draft.id.in_(missing)))).all()  # type: ignore[attr-defined]
+        )
 
-    # Select a random draft
-    draft = random.choice(unpublished_drafts)
+    def queue(id: uuid.UUID) -> BulkTweetResult:
+        draft = drafts.get(id)
+        if draft is None:
+            return BulkTweetResult(
+                id=id, status="locked" if id in locked else "not_found"
+            )
+        if not current_user.is_superuser and draft.user_id != current_user.id:
+            return BulkTweetResult(id=id, status="forbidden")
+        if draft.is_published:
+            return BulkTweetResult(id=id, status="already_published")
+        if len(draft.content) > 280:
+            return BulkTweetResult(
+                id=id,
+                status="invalid",
+                error="Content exceeds the maximum length of 280 characters",
+            )
+        entry = enqueue_tweet(db, draft)
+        return BulkTweetResult(id=id, status="queued", outbox_id=entry.id)
+
+    results = [queue(id) for id in ids]
+    await db.commit()
+
+    queued = sum(result.status == "queued" for result in results)
+    return BulkTweetResponse(
+        queued=queued, failed=len(results) - queued, results=results
+    )
+
+
+async def pick_random_unpublished_draft(
+    db: AsyncSession, current_user: UserPublic
+) -> Draft | None:
+    """
+    Pick and lock a random unpublished draft the caller may publish, in two index seeks at most.
+
+    This takes the first id at or after a random UUID, so the pick is gap-weighted,
+    not uniform: a draft's chance is the gap between its id and the previous one
+    (wrapping around), which for random UUIDs varies by a small multiple from
+    draft to draft. In exchange the partial indexes on unpublished drafts keep each
+    seek O(log n) however many drafts exist, where a uniform OFFSET pick walks the
+    index. Drafts locked by a concurrent publisher are skipped.
+    """
+    statement = (
+        select(Draft)
+        .where(~col(Draft.is_published))
+        .with_for_update(skip_locked=True)
+    )
+    if not current_user.is_superuser:
+        statement = statement.where(Draft.user_id == current_user.id)
+    pivot = uuid.uuid4()
+    draft = (
+        await db.exec(statement.where(Draft.id >= pivot).order_by(Draft.id).limit(1))
+    ).first()
+    if draft is None:
+        # Wrap around to the lowest id
+        draft = (await db.exec(statement.order_by(Draft.id).limit(1))).first()
+    return draft
+
+
+@router.post("/publish-random-draft", status_code=202)
+async def publish_random_draft(db: AsyncSessionDep, current_user: CurrentUser):
+    """
+    Endpoint to queue a random unpublished draft for posting to Twitter.
 
-    if not current_user.is_superuser and (draft.user_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
+    Args:
+        db (AsyncSession): SQLAlchemy database session.
 
-    content = draft.content
+    Returns:
+        dict: The queued outbox entry's id and the chosen draft's id.
+    """
+    draft = await pick_random_unpublished_draft(db, current_user)
+
+    if not draft:
+        raise HTTPException(status_code=404, detail="No unpublished drafts found")
 
     # Validate content length
-    if len(content) > 280:
+    if len(draft.content) > 280:
         return {
             "success": False,
             "error": "Content exceeds the maximum length of 280 characters",
         }
 
-    # Create the payload for the tweet
-    payload = {"text": content}
-
-    # Make the API request
-    response = requests.post(TWITTER_API_URL, json=payload, auth=auth)
-
-    if response.status_code == 201:
-        # Success: Save to database
-        twitter_response = response.json()
-        new_tweet = Tweet(
-            content=content,
-            twitter_id=twitter_response.get("data", {}).get("id"),
-        )
-        db.add(new_tweet)
-        db.commit()
-
-        # set is_published
-        draft.sqlmodel_update(
-            {"is_published": True, "updated_at": datetime.now()}
-        )
-        db.add(draft)
-        db.commit()
+    entry = enqueue_tweet(db, draft)
+    await db.commit()
 
-        return {
-            "message": "Random draft published successfully",
-            "tweet": twitter_response,
-        }
-    else:
-        # Handle errors
-        raise HTTPException(
-            status_code=response.status_code, detail=response.json()
-        )
+    return {
+        "message": "Random draft queued for publishing",
+        "id": entry.id,
+        "draft_id": draft.id,
+    }
 
 
 # @router.get("/link-preview")
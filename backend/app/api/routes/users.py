@@ -2,16 +2,23 @@ import uuid
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import col, delete, func, select
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import col, delete, select
 
 from app import crud
 from app.api.deps import (
+    CS,
+    AsyncSessionDep,
     CurrentUser,
+    ReadSessionDep,
     SessionDep,
+    cache_user,
     get_current_active_superuser,
+    uncache_user,
 )
 from app.core.config import settings
-from app.core.security import get_password_hash, verify_password
+from app.core.security import password_service
+from app.counts import CountMode, count_rows
 from app.models import (
     Item,
     Message,
@@ -24,6 +31,7 @@ from app.models import (
     UserUpdate,
     UserUpdateMe,
 )
+from app.pagination import page, paginate
 from app.utils import generate_new_account_email, send_email
 
 router = APIRouter()
@@ -34,40 +42,51 @@ router = APIRouter()
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UsersPublic,
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+def read_users(
+    session: ReadSessionDep,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    count: CountMode = "estimate",
+) -> Any:
     """
-    Retrieve users.
+    Retrieve users, newest first. Pass `next_cursor` back as `cursor` for the next page.
+    `count` picks a planner estimate (the default), an exact total or none.
     """
 
-    count_statement = select(func.count()).select_from(User)
-    count = session.exec(count_statement).one()
-
-    statement = select(User).offset(skip).limit(limit)
-    users = session.exec(statement).all()
+    total = count_rows(session, User, count)
+    statement = paginate(select(User), User, skip, limit, cursor)
+    users, next_cursor = page(session.exec(statement).all(), limit)
 
-    return UsersPublic(data=users, count=count)
+    return UsersPublic(data=users, count=total, next_cursor=next_cursor)
 
 
 @router.post(
     "/", dependencies=[Depends(get_current_active_superuser)], response_model=UserPublic
 )
-def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
+async def create_user(*, session: AsyncSessionDep, user_in: UserCreate) -> Any:
     """
     Create new user.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
+    user = await crud.async_get_user_by_email(session=session, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
 
-    user = crud.create_user(session=session, user_create=user_in)
+    user = await crud.async_create_user(
+        session=session,
+        user_create=user_in,
+        hashed_password=await password_service.hash(user_in.password),
+    )
     if settings.emails_enabled and user_in.email:
         email_data = generate_new_account_email(
             email_to=user_in.email, username=user_in.email, password=user_in.password
         )
-        send_email(
+        # SMTP is blocking
+        await run_in_threadpool(
+            send_email,
             email_to=user_in.email,
             subject=email_data.subject,
             html_content=email_data.html_content,
@@ -76,44 +95,60 @@ def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
 
 
 @router.patch("/me", response_model=UserPublic)
-def update_user_me(
-    *, session: SessionDep, user_in: UserUpdateMe, current_user: CurrentUser
+async def update_user_me(
+    *,
+    session: AsyncSessionDep,
+    cache: CS,
+    user_in: UserUpdateMe,
+    current_user: CurrentUser,
 ) -> Any:
     """
     Update own user.
     """
 
     if user_in.email:
-        existing_user = crud.get_user_by_email(session=session, email=user_in.email)
+        existing_user = await crud.async_get_user_by_email(
+            session=session, email=user_in.email
+        )
         if existing_user and existing_user.id != current_user.id:
             raise HTTPException(
                 status_code=409, detail="User with this email already exists"
             )
     user_data = user_in.model_dump(exclude_unset=True)
-    current_user.sqlmodel_update(user_data)
-    session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
-    return current_user
+    user = await session.get(User, current_user.id)
+    if user_in.email and user_in.email != user.email:
+        await uncache_user(cache, user)
+    user.sqlmodel_update(user_data)
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    await cache_user(cache, user)
+    return user
 
 
 @router.patch("/me/password", response_model=Message)
-def update_password_me(
-    *, session: SessionDep, body: UpdatePassword, current_user: CurrentUser
+async def update_password_me(
+    *,
+    session: AsyncSessionDep,
+    cache: CS,
+    body: UpdatePassword,
+    current_user: CurrentUser,
 ) -> Any:
     """
     Update own password.
     """
-    if not verify_password(body.current_password, current_user.hashed_password):
+    user = await session.get(User, current_user.id)
+    if not await password_service.verify(body.current_password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect password")
     if body.current_password == body.new_password:
         raise HTTPException(
             status_code=400, detail="New password cannot be the same as the current one"
         )
-    hashed_password = get_password_hash(body.new_password)
-    current_user.hashed_password = hashed_password
-    session.add(current_user)
-    session.commit()
+    hashed_password = await password_service.hash(body.new_password)
+    user.hashed_password = hashed_password
+    session.add(user)
+    await session.commit()
+    await cache_user(cache, user)
     return Message(message="Password updated successfully")
 
 
@@ -126,7 +161,9 @@ def read_user_me(current_user: CurrentUser) -> Any:
 
 
 @router.delete("/me", response_model=Message)
-def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
+async def delete_user_me(
+    session: AsyncSessionDep, cache: CS, current_user: CurrentUser
+) -> Any:
     """
     Delete own user.
     """
@@ -135,25 +172,30 @@ def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
     statement = delete(Item).where(col(Item.owner_id) == current_user.id)
-    session.exec(statement)  # type: ignore
-    session.delete(current_user)
-    session.commit()
+    await session.exec(statement)  # type: ignore
+    await session.delete(await session.get(User, current_user.id))
+    await session.commit()
+    await uncache_user(cache, current_user)
     return Message(message="User deleted successfully")
 
 
 @router.post("/signup", response_model=UserPublic)
-def register_user(session: SessionDep, user_in: UserRegister) -> Any:
+async def register_user(session: AsyncSessionDep, user_in: UserRegister) -> Any:
     """
     Create new user without the need to be logged in.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
+    user = await crud.async_get_user_by_email(session=session, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system",
         )
     user_create = UserCreate.model_validate(user_in)
-    user = crud.create_user(session=session, user_create=user_create)
+    user = await crud.async_create_user(
+        session=session,
+        user_create=user_create,
+        hashed_password=await password_service.hash(user_create.password),
+    )
     return user
 
 
@@ -165,7 +207,7 @@ def read_user_by_id(
     Get a specific user by id.
     """
     user = session.get(User, user_id)
-    if user == current_user:
+    if user and user.id == current_user.id:
         return user
     if not current_user.is_superuser:
         raise HTTPException(
@@ -180,9 +222,10 @@ def read_user_by_id(
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UserPublic,
 )
-def update_user(
+async def update_user(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
+    cache: CS,
     user_id: uuid.UUID,
     user_in: UserUpdate,
 ) -> Any:
@@ -190,39 +233,53 @@ def update_user(
     Update a user.
     """
 
-    db_user = session.get(User, user_id)
+    db_user = await session.get(User, user_id)
     if not db_user:
         raise HTTPException(
             status_code=404,
             detail="The user with this id does not exist in the system",
         )
     if user_in.email:
-        existing_user = crud.get_user_by_email(session=session, email=user_in.email)
+        existing_user = await crud.async_get_user_by_email(
+            session=session, email=user_in.email
+        )
         if existing_user and existing_user.id != user_id:
             raise HTTPException(
                 status_code=409, detail="User with this email already exists"
             )
 
-    db_user = crud.update_user(session=session, db_user=db_user, user_in=user_in)
+    if user_in.email and user_in.email != db_user.email:
+        await uncache_user(cache, db_user)
+    hashed_password = None
+    if user_in.password:
+        hashed_password = await password_service.hash(user_in.password)
+    db_user = await crud.async_update_user(
+        session=session,
+        db_user=db_user,
+        user_in=user_in,
+        hashed_password=hashed_password,
+    )
+    await cache_user(cache, db_user)
     return db_user
 
 
 @router.delete("/{user_id}", dependencies=[Depends(get_current_active_superuser)])
-def delete_user(
-    session: SessionDep, current_user: CurrentUser, user_id: uuid.UUID
+async def delete_user(
+    session: AsyncSessionDep, cache: CS, current_user: CurrentUser, user_id: uuid.UUID
 ) -> Message:
     """
     Delete a user.
     """
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if user == current_user:
+    if user.id == current_user.id:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
     statement = delete(Item).where(col(Item.owner_id) == user_id)
-    session.exec(statement)  # type: ignore
-    session.delete(user)
-    session.commit()
+    await session.exec(statement)  # type: ignore
+    await session.delete(user)
+    await session.commit()
+    await uncache_user(cache, user)
     return Message(message="User deleted successfully")
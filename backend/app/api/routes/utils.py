@@ -1,9 +1,14 @@
+from typing import Any
+
 from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
-from app.api.deps import get_current_active_superuser
+from app.api.deps import CS, get_current_active_superuser
+from app.core.db import pools
 from app.models import Message
+from app.twitter import twitter_client
 from app.utils import generate_test_email, send_email
+from app.webpush import webpush_service
 
 router = APIRouter()
 
@@ -29,3 +34,47 @@ def test_email(email_to: EmailStr) -> Message:
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
+
+
+@router.get(
+    "/cache-stats/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+async def cache_stats(cache: CS) -> dict[str, Any]:
+    """
+    Cache hit/miss counters, latency and bytes stored per key namespace, for this worker.
+    """
+    return cache.get_stats()
+
+
+@router.get(
+    "/db-pool-stats/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+async def db_pool_stats() -> dict[str, Any]:
+    """
+    Connections in use, overflow, timeouts and checkout latency per engine, for this worker.
+    """
+    return {name: pool.snapshot() for name, pool in pools().items()}
+
+
+@router.get(
+    "/twitter-rate-limits/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+async def twitter_rate_limits() -> dict[str, Any]:
+    """
+    Remaining Twitter rate limit budget per endpoint, shared by all workers.
+    """
+    return await twitter_client.rate_limits.budgets()
+
+
+@router.get(
+    "/webpush-stats/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+async def webpush_stats() -> dict[str, Any]:
+    """
+    Push notification throughput, encryption time and latency per push service, for this worker.
+    """
+    return webpush_service.get_stats()
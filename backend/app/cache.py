@@ -1,33 +1,513 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
 from datetime import timedelta
 from typing import Any
 
-from redis import Redis
+from redis.asyncio import ConnectionPool, Redis, SSLConnection
+from redis.asyncio.client import Pipeline
+from redis.asyncio.lock import Lock
+from redis.commands.core import AsyncScript
+from redis.exceptions import ConnectionError, ResponseError, TimeoutError
 
+from app import metrics
 from app.core.config import settings
+from app.metrics import Histogram
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Redis client
-redis_client = Redis(
+
+class CacheUnavailableError(Exception):
+    """
+    Raised instead of calling Redis while the circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive connection failures. While open, callers
+    fail fast and a background task probes Redis with exponential backoff until it answers.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 1.0,
+        max_reset_timeout: float = 30.0,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.failures = 0
+        self.opens = 0
+        self.opened_at: float | None = None
+        self.probe: Callable[[], Awaitable[Any]] | None = None
+        self.on_close: list[Callable[[], None]] = []
+        self._probe_task: asyncio.Task | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def record_success(self) -> None:
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold and not self.is_open:
+            self.open()
+
+    def open(self) -> None:
+        logger.warning("Redis circuit opened; serving from in-process fallbacks")
+        self.opened_at = time.monotonic()
+        self.opens += 1
+        if self.probe is not None:
+            self._probe_task = asyncio.create_task(self._probe_until_closed())
+
+    def close(self) -> None:
+        logger.info("Redis circuit closed")
+        self.opened_at = None
+        self.failures = 0
+        for callback in self.on_close:
+            callback()
+
+    def stop(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+
+    async def _probe_until_closed(self) -> None:
+        backoff = self.reset_timeout
+        while self.is_open:
+            await asyncio.sleep(backoff)
+            try:
+                await asyncio.wait_for(self.probe(), timeout=self.reset_timeout)
+            except Exception:
+                backoff = min(backoff * 2, self.max_reset_timeout)
+                continue
+            self.close()
+
+
+class GuardedPipeline(Pipeline):
+    breaker: CircuitBreaker
+
+    async def execute(self, raise_on_error: bool = True) -> list[Any]:
+        if self.breaker.is_open:
+            raise CacheUnavailableError("Redis circuit is open")
+        try:
+            result = await super().execute(raise_on_error)
+        except (ConnectionError, TimeoutError):
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+
+class GuardedRedis(Redis):
+    """
+    Redis client whose commands, scripts and pipelines all pass through a circuit breaker.
+    """
+
+    def __init__(self, *args: Any, breaker: CircuitBreaker, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+        breaker.probe = self._ping_unguarded
+
+    async def _ping_unguarded(self) -> Any:
+        return await super().execute_command("PING")
+
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        if self.breaker.is_open:
+            raise CacheUnavailableError("Redis circuit is open")
+        try:
+            result = await super().execute_command(*args, **options)
+        except (ConnectionError, TimeoutError):
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def pipeline(
+        self, transaction: bool = True, shard_hint: str | None = None
+    ) -> GuardedPipeline:
+        pipe = GuardedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+        pipe.breaker = self.breaker
+        return pipe
+
+
+# Shared connection pool; connections are opened on startup and reused by every request
+redis_pool = ConnectionPool(
+    connection_class=SSLConnection,
     host=settings.REDIS_HOST,
     port=settings.REDIS_PORT,
     password=settings.REDIS_PASSWORD,
-    ssl=True,
-    decode_responses=True,
+    # Values are kept binary so codec-encoded payloads survive; CacheService decodes text
+    decode_responses=False,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    # A slow Redis must fail fast rather than hold up the request
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
 )
+redis_breaker = CircuitBreaker(
+    failure_threshold=settings.CACHE_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.CACHE_BREAKER_RESET_TIMEOUT,
+    max_reset_timeout=settings.CACHE_BREAKER_MAX_RESET_TIMEOUT,
+)
+redis_client = GuardedRedis(connection_pool=redis_pool, breaker=redis_breaker)
+# The invalidation listener sits idle between messages, which the request pool's
+# read timeout would turn into a reconnect (and an L1 flush) every half second.
+# It gets its own connection that waits indefinitely; keepalive and periodic
+# health checks still notice a dead link.
+redis_pubsub_client = Redis(
+    connection_pool=ConnectionPool(
+        connection_class=SSLConnection,
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        password=settings.REDIS_PASSWORD,
+        decode_responses=False,
+        socket_timeout=None,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_keepalive=True,
+        health_check_interval=30,
+    )
+)
+
+# Commands that never modify a key; anything else issued through a pipeline drops the key from L1
+_READ_COMMANDS = {
+    "GET",
+    "MGET",
+    "EXISTS",
+    "TTL",
+    "PTTL",
+    "TYPE",
+    "STRLEN",
+    "SMEMBERS",
+    "SCARD",
+}
+
+
+@dataclass
+class CacheStats:
+    l1_hits: int = 0
+    l1_misses: int = 0
+    l1_evictions: int = 0
+    l1_rejections: int = 0
+    l2_hits: int = 0
+    l2_misses: int = 0
+    invalidations_sent: int = 0
+    invalidations_received: int = 0
+
+
+@dataclass
+class NamespaceStats:
+    hits: int = 0
+    misses: int = 0
+    errors: int = 0
+    bytes_stored: int = 0
+    get_latency: Histogram = field(default_factory=Histogram)
+    set_latency: Histogram = field(default_factory=Histogram)
+
+    def snapshot(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "errors": self.errors,
+            "bytes_stored": self.bytes_stored,
+            "get_latency": self.get_latency.snapshot(),
+            "set_latency": self.set_latency.snapshot(),
+        }
+
+
+# Keys are grouped by the text before their first ":" (user, rate_limit, a function name...)
+MAX_NAMESPACES = 100
+
+
+class LocalCache:
+    """
+    Bounded, per-process LRU cache used as an L1 tier in front of Redis.
+
+    Entries live for at most `ttl` seconds, so a missed invalidation message can
+    only ever serve a value that is `ttl` seconds stale.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: int,
+        prefixes: list[str],
+        max_item_bytes: int,
+        stats: CacheStats,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.prefixes = tuple(prefixes)
+        self.max_item_bytes = max_item_bytes
+        self.stats = stats
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def admits(self, key: str, value: Any) -> bool:
+        """
+        Admission policy: only hot, small values from allow-listed prefixes.
+        """
+        if not key.startswith(self.prefixes):
+            return False
+        if isinstance(value, str | bytes) and len(value) > self.max_item_bytes:
+            self.stats.l1_rejections += 1
+            return False
+        return True
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats.l1_misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.stats.l1_misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats.l1_hits += 1
+            return value
+
+    def set(self, key: str, value: Any, expire: int | None = None) -> None:
+        if not self.admits(key, value):
+            return
+        ttl = min(self.ttl, expire) if expire else self.ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.stats.l1_evictions += 1
+
+    def discard(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class LocalLock:
+    """
+    Per-process stand-in for a Redis lock while the circuit is open.
+    """
+
+    def __init__(self, name: str, held: set[str]):
+        self.name = name
+        self._held = held
+
+    async def release(self) -> None:
+        self._held.discard(self.name)
 
 
 class CacheService:
-    def __init__(self, redis: Redis):
+    def __init__(
+        self,
+        redis: Redis,
+        local: LocalCache | None = None,
+        breaker: CircuitBreaker | None = None,
+        pubsub_redis: Redis | None = None,
+    ):
         self.redis = redis
+        self.local = local
+        # Client for the invalidation listener; needs no read timeout
+        self.pubsub_redis = pubsub_redis or redis
+        # Never opens unless the client reports failures to it (see GuardedRedis)
+        self.breaker = breaker or CircuitBreaker()
+        self.breaker.on_close.append(self._recovered)
+        # Approximate, per-worker stand-in for Redis while the circuit is open
+        self.fallback = LocalCache(
+            max_size=settings.CACHE_FALLBACK_MAX_SIZE,
+            ttl=settings.CACHE_FALLBACK_TTL,
+            prefixes=[""],
+            max_item_bytes=settings.CACHE_LOCAL_MAX_ITEM_BYTES,
+            stats=CacheStats(),
+        )
+        self._local_locks: set[str] = set()
+        self.stats = local.stats if local is not None else CacheStats()
+        self.namespaces: dict[str, NamespaceStats] = {}
+        self._scripts: dict[str, AsyncScript] = {}
+        # Identifies this process so it can ignore its own invalidation messages
+        self.origin = uuid.uuid4().hex
+        self._listener: asyncio.Task | None = None
+
+    async def connect(self) -> None:
+        """
+        Open the connection pool and start listening for peer invalidations.
+        """
+        try:
+            await self.redis.ping()
+        except Exception as e:
+            _log_error("Error connecting to cache", e)
+        if self.local is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        self.breaker.stop()
+        await self.redis.aclose()
+        if self.pubsub_redis is not self.redis:
+            await self.pubsub_redis.aclose()
+
+    def _recovered(self) -> None:
+        # Writes made during the outage never reached Redis or the other workers
+        self.fallback.clear()
+        if self.local is not None:
+            self.local.clear()
+
+    async def _publish_invalidation(self, **message: Any) -> None:
+        """
+        Tell peer workers to drop entries from their L1 tier.
+        """
+        if self.local is None:
+            return
+        try:
+            await self.redis.publish(
+                settings.CACHE_INVALIDATION_CHANNEL,
+                json.dumps({"origin": self.origin, **message}),
+            )
+            self.stats.invalidations_sent += 1
+        except Exception as e:
+            _log_error("Error publishing cache invalidation", e)
+
+    async def _discard_local(self, *keys: str) -> None:
+        """
+        Drop keys from this worker's L1 tier and tell peers to do the same.
+        """
+        if self.local is None:
+            return
+        # Keys the admission policy never lets in cannot be stale in any worker
+        keys = tuple(key for key in keys if key.startswith(self.local.prefixes))
+        if not keys:
+            return
+        self.local.discard(*keys)
+        await self._publish_invalidation(keys=list(keys))
 
-    def set(
+    def _handle_invalidation(self, message: dict[str, Any]) -> None:
+        if self.local is None or message.get("type") != "message":
+            return
+        try:
+            data = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if data.get("origin") == self.origin:
+            return
+        self.stats.invalidations_received += 1
+        if data.get("flush"):
+            self.local.clear()
+        if data.get("keys"):
+            self.local.discard(*data["keys"])
+
+    async def _listen(self) -> None:
+        backoff = 1
+        while True:
+            pubsub = self.pubsub_redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                # Anything written while we were disconnected may be stale
+                self.local.clear()
+                backoff = 1
+                async for message in pubsub.listen():
+                    self._handle_invalidation(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _log_error("Cache invalidation listener error", e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                await pubsub.aclose()
+
+    def _ns(self, key: str) -> NamespaceStats:
+        name = key.split(":", 1)[0]
+        if name not in self.namespaces and len(self.namespaces) >= MAX_NAMESPACES:
+            name = "other"
+        return self.namespaces.setdefault(name, NamespaceStats())
+
+    def get_stats(self) -> dict[str, Any]:
+        """
+        Hit/miss counters for both tiers, plus per-namespace hits, errors, latency and bytes
+        """
+        stats = asdict(self.stats)
+        stats["l1_enabled"] = self.local is not None
+        stats["l1_size"] = len(self.local) if self.local is not None else 0
+        stats["circuit_open"] = self.breaker.is_open
+        stats["circuit_opens"] = self.breaker.opens
+        stats["fallback_size"] = len(self.fallback)
+        stats["namespaces"] = {
+            name: ns.snapshot() for name, ns in sorted(self.namespaces.items())
+        }
+        return stats
+
+    def collect(self) -> Iterable[str]:
+        """
+        Prometheus exposition lines for `app.metrics.render`
+        """
+        namespaces = sorted(self.namespaces.items())
+        for attr, kind, help in [
+            ("hits", "counter", "Cache lookups that found a value"),
+            ("misses", "counter", "Cache lookups that found nothing"),
+            ("errors", "counter", "Cache operations that raised"),
+            ("bytes_stored", "counter", "Bytes written to the cache"),
+        ]:
+            yield from metrics.sample_lines(
+                f"cache_{attr}_total",
+                kind,
+                help,
+                [({"namespace": name}, getattr(ns, attr)) for name, ns in namespaces],
+            )
+        for attr in ["get_latency", "set_latency"]:
+            yield from metrics.histogram_lines(
+                f"cache_{attr}_seconds",
+                f"Cache {attr.split('_')[0]} latency",
+                [({"namespace": name}, getattr(ns, attr)) for name, ns in namespaces],
+            )
+        for attr, value in asdict(self.stats).items():
+            yield from metrics.sample_lines(
+                f"cache_{attr}_total", "counter", "Cache tier counter", [({}, value)]
+            )
+        yield from metrics.sample_lines(
+            "cache_circuit_open",
+            "gauge",
+            "1 while Redis is bypassed",
+            [({}, int(self.breaker.is_open))],
+        )
+        yield from metrics.sample_lines(
+            "cache_circuit_opens_total",
+            "counter",
+            "Times the Redis circuit opened",
+            [({}, self.breaker.opens)],
+        )
+
+    async def set(
         self,
         key: str,
         value: Any,
         expire: int | None = timedelta(hours=24),
+        tags: list[str] | None = None,
     ) -> bool:
         """
         Set a key-value pair in cache
@@ -35,16 +515,37 @@ class CacheService:
             key: Cache key
             value: Value to store
             expire: Time in seconds after which the key will expire
+            tags: Tags the key is registered under, see `invalidate`
         Returns:
             bool: True if successful, False otherwise
         """
+        ns = self._ns(key)
+        started = time.perf_counter()
         try:
-            return self.redis.set(key, value, ex=expire)
+            if tags:
+                # The pipeline drops the key from L1 here and in peers once it runs
+                async with self.pipeline(transaction=True) as pipe:
+                    pipe.set(key, value, ex=expire)
+                    for tag in tags:
+                        self._register_tag(pipe, tag, key, _seconds(expire))
+                    result, *_ = await pipe.execute()
+            else:
+                result = await self.redis.set(key, value, ex=expire)
+                await self._discard_local(key)
+            value = _to_bytes(value)
+            ns.set_latency.observe(time.perf_counter() - started)
+            ns.bytes_stored += len(value)
+            if self.local is not None:
+                self.local.set(key, value, _seconds(expire))
+            return result
         except Exception as e:
-            logger.error(f"Error setting cache: {str(e)}")
+            ns.errors += 1
+            _log_error("Error setting cache", e)
+            if self.breaker.is_open:
+                self.fallback.set(key, _to_bytes(value), _seconds(expire))
             return False
 
-    def get(self, key: str) -> str | None:
+    async def get(self, key: str) -> str | None:
         """
         Get value from cache by key
         Args:
@@ -52,13 +553,20 @@ class CacheService:
         Returns:
             Optional[str]: Value if exists, None otherwise
         """
-        try:
-            return self.redis.get(key)
-        except Exception as e:
-            logger.error(f"Error getting from cache: {str(e)}")
-            return None
+        return _to_str(await self.get_bytes(key))
+
+    async def get_bytes(self, key: str) -> bytes | None:
+        """
+        Get the raw stored bytes for a key, e.g. a codec-encoded payload
+        Args:
+            key: Cache key
+        Returns:
+            Optional[bytes]: Value if exists, None otherwise
+        """
+        (value,) = await self.get_many_bytes([key])
+        return value
 
-    def delete(self, key: str) -> bool:
+    async def delete(self, key: str) -> bool:
         """
         Delete a key from cache
         Args:
@@ -66,13 +574,159 @@ class CacheService:
         Returns:
             bool: True if deleted, False otherwise
         """
+        await self._discard_local(key)
+        self.fallback.discard(key)
         try:
-            return bool(self.redis.delete(key))
+            return bool(await self.redis.delete(key))
         except Exception as e:
-            logger.error(f"Error deleting from cache: {str(e)}")
+            self._ns(key).errors += 1
+            _log_error("Error deleting from cache", e)
             return False
 
-    def exists(self, key: str) -> bool:
+    async def get_many(self, keys: list[str]) -> list[str | None]:
+        """
+        Get several values in a single round trip
+        Args:
+            keys: Cache keys
+        Returns:
+            list: Values in the same order as keys, None for missing keys
+        """
+        return [_to_str(value) for value in await self.get_many_bytes(keys)]
+
+    async def get_many_bytes(self, keys: list[str]) -> list[bytes | None]:
+        """
+        Raw-bytes variant of `get_many`
+        """
+        started = time.perf_counter()
+        values: list[bytes | None] = [None] * len(keys)
+        pending = list(range(len(keys)))
+        if self.local is not None:
+            pending = []
+            for index, key in enumerate(keys):
+                values[index] = self.local.get(key)
+                if values[index] is None:
+                    pending.append(index)
+        if pending:
+            try:
+                fetched = await self.redis.mget([keys[index] for index in pending])
+            except Exception as e:
+                for key in {keys[index] for index in pending}:
+                    self._ns(key).errors += 1
+                _log_error("Error getting from cache", e)
+                fetched = [
+                    self.fallback.get(keys[index]) if self.breaker.is_open else None
+                    for index in pending
+                ]
+            for index, value in zip(pending, fetched, strict=True):
+                values[index] = value
+                if value is None:
+                    self.stats.l2_misses += 1
+                else:
+                    self.stats.l2_hits += 1
+                    if self.local is not None:
+                        self.local.set(keys[index], value)
+        elapsed = time.perf_counter() - started
+        observed: set[int] = set()
+        for key, value in zip(keys, values, strict=True):
+            ns = self._ns(key)
+            if value is None:
+                ns.misses += 1
+            else:
+                ns.hits += 1
+            if id(ns) not in observed:
+                observed.add(id(ns))
+                ns.get_latency.observe(elapsed)
+        return values
+
+    async def set_many(
+        self,
+        mapping: dict[str, Any],
+        expire: int | None = timedelta(hours=24),
+    ) -> bool:
+        """
+        Set several key-value pairs in a single round trip
+        Args:
+            mapping: Keys and values to store
+            expire: Time in seconds after which the keys will expire
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if not mapping:
+            return True
+        started = time.perf_counter()
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    pipe.set(key, value, ex=expire)
+                await pipe.execute()
+        except Exception as e:
+            for key in mapping:
+                self._ns(key).errors += 1
+            _log_error("Error setting many in cache", e)
+            if self.breaker.is_open:
+                for key, value in mapping.items():
+                    self.fallback.set(key, _to_bytes(value), _seconds(expire))
+            return False
+        elapsed = time.perf_counter() - started
+        await self._discard_local(*mapping)
+        for key, value in mapping.items():
+            value = _to_bytes(value)
+            ns = self._ns(key)
+            ns.set_latency.observe(elapsed)
+            ns.bytes_stored += len(value)
+            if self.local is not None:
+                self.local.set(key, value, _seconds(expire))
+        return True
+
+    async def delete_many(self, keys: list[str]) -> int:
+        """
+        Delete several keys in a single round trip
+        Args:
+            keys: Cache keys to delete
+        Returns:
+            int: Number of keys deleted
+        """
+        if not keys:
+            return 0
+        await self._discard_local(*keys)
+        self.fallback.discard(*keys)
+        try:
+            return await self.redis.delete(*keys)
+        except Exception as e:
+            for key in keys:
+                self._ns(key).errors += 1
+            _log_error("Error deleting many from cache", e)
+            return 0
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = True) -> AsyncIterator[Pipeline]:
+        """
+        Buffer commands and send them in one round trip on `await pipe.execute()`.
+        Keys written through the pipeline are dropped from the L1 tier once it runs.
+        Replies are returned as Redis sends them, so string values come back as bytes.
+        Usage:
+            async with cache.pipeline() as pipe:
+                pipe.incr(key)
+                pipe.expire(key, 60, nx=True)
+                count, _ = await pipe.execute()
+        """
+        async with self.redis.pipeline(transaction=transaction) as pipe:
+            execute = pipe.execute
+
+            async def execute_and_discard(raise_on_error: bool = True) -> list[Any]:
+                written = [
+                    _to_str(args[1])
+                    for args, _ in pipe.command_stack
+                    if len(args) > 1 and str(args[0]).upper() not in _READ_COMMANDS
+                ]
+                results = await execute(raise_on_error)
+                await self._discard_local(*written)
+                return results
+
+            pipe.execute = execute_and_discard  # type: ignore[method-assign]
+            yield pipe
+
+    async def exists(self, key: str) -> bool:
         """
         Check if a key exists in cache
         Args:
@@ -81,80 +735,145 @@ class CacheService:
             bool: True if exists, False otherwise
         """
         try:
-            return bool(self.redis.exists(key))
+            return bool(await self.redis.exists(key))
         except Exception as e:
-            logger.error(f"Error checking cache existence: {str(e)}")
+            _log_error("Error checking cache existence", e)
             return False
 
-    def clear(self) -> bool:
+    async def clear(self) -> bool:
         """
         Clear all keys from the current database
         Returns:
             bool: True if successful, False otherwise
         """
+        if self.local is not None:
+            self.local.clear()
+            await self._publish_invalidation(flush=True)
+        self.fallback.clear()
         try:
-            return bool(self.redis.flushdb())
+            return bool(await self.redis.flushdb())
         except Exception as e:
-            logger.error(f"Error clearing cache: {str(e)}")
+            _log_error("Error clearing cache", e)
             return False
 
-    def invalidate(self, key: str)-> bool:
+    @staticmethod
+    def _register_tag(pipe: Pipeline, tag: str, key: str, expire: int | None) -> None:
+        """
+        Add a key to a tag's index, a sorted set scored by when the key expires.
+        EXPIRE NX/GT needs Redis 7 or later.
+        """
+        tag_key = _tag_key(tag)
+        now = time.time()
+        # Members whose key has expired are pruned on every write, so a busy tag
+        # whose index never expires does not grow without bound
+        pipe.zremrangebyscore(tag_key, "-inf", now)
+        pipe.zadd(tag_key, {key: now + expire if expire else float("inf")})
+        if expire:
+            # The index lives as long as its longest-lived member
+            pipe.expire(tag_key, expire, nx=True)
+            pipe.expire(tag_key, expire, gt=True)
+        else:
+            pipe.persist(tag_key)
+
+    async def _purge(self, keys: list[str]) -> None:
+        # Only the tag's own members: other keys may share its name as a prefix
+        await self._discard_local(*keys)
+        self.fallback.discard(*keys)
+        await self.redis.delete(*keys)
+
+    async def invalidate(self, key: str) -> bool:
         """
-        Delete all keys matching a pattern
+        Delete every key registered under a tag, in O(keys in the tag)
         Args:
-            pattern: Pattern to match keys against (e.g., "product:*")
+            key: Tag to invalidate (e.g., "product" for keys cached with tags=["product"])
         Returns:
             bool: True if successful, False otherwise
         """
+        tag_key = _tag_key(key)
+        # Detach the index first so keys tagged while we purge land in a fresh set
+        purge_key = f"{tag_key}:purge:{uuid.uuid4().hex}"
         try:
-            # Get all keys that might contain this product
-            search_keys = self.redis.keys(f"{key}:*")
-
-            # Delete all related cache entries
-            if search_keys:
-                self.redis.delete(*search_keys)
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.rename(tag_key, purge_key)
+                pipe.expire(purge_key, 3600)
+                await pipe.execute()
+        except ResponseError:
+            # No such tag: nothing is cached under it
             return True
         except Exception as e:
-            logger.error(f"Error deleting pattern from cache: {str(e)}")
+            _log_error("Error invalidating cache tag", e)
+            return False
+        try:
+            batch: list[str] = []
+            async for member, _ in self.redis.zscan_iter(purge_key, count=500):
+                batch.append(_to_str(member))
+                if len(batch) >= 500:
+                    await self._purge(batch)
+                    batch = []
+            if batch:
+                await self._purge(batch)
+            await self.redis.delete(purge_key)
+            return True
+        except Exception as e:
+            _log_error("Error invalidating cache tag", e)
             return False
 
-
-    def delete_pattern(self, pattern: str) -> bool:
+    async def delete_pattern(self, pattern: str) -> bool:
         """
-        Delete all keys matching a pattern
+        Delete all keys matching a pattern.
+        This walks the whole keyspace; prefer tagging keys and calling `invalidate`.
         Args:
             pattern: Pattern to match keys against (e.g., "product:*")
         Returns:
             bool: True if successful, False otherwise
         """
+        if self.local is not None:
+            # Glob patterns are not worth mirroring locally; drop the whole tier
+            self.local.clear()
+            await self._publish_invalidation(flush=True)
+        self.fallback.clear()
         try:
             cursor = 0
             while True:
-                cursor, keys = self.redis.scan(cursor, pattern, 100)
+                cursor, keys = await self.redis.scan(cursor, pattern, 100)
                 if keys:
-                    self.redis.delete(*keys)
+                    await self.redis.delete(*keys)
                 if cursor == 0:
                     break
             return True
         except Exception as e:
-            logger.error(f"Error deleting pattern from cache: {str(e)}")
+            _log_error("Error deleting pattern from cache", e)
             return False
 
-    def incr(self, key: str) -> int:
+    async def incr(self, key: str, expire: int | None = None) -> int:
         """
         Increment the value of a key by 1
         Args:
             key: Cache key
+            expire: Optional TTL applied in the same round trip if the key has none
+                (EXPIRE NX, Redis 7 or later)
         Returns:
             int: New value after increment
         """
+        ns = self._ns(key)
+        started = time.perf_counter()
         try:
-            return self.redis.incr(key)
+            if expire is None:
+                await self._discard_local(key)
+                count = await self.redis.incr(key)
+            else:
+                async with self.pipeline(transaction=True) as pipe:
+                    pipe.incr(key)
+                    pipe.expire(key, expire, nx=True)
+                    count, _ = await pipe.execute()
+            ns.set_latency.observe(time.perf_counter() - started)
+            return count
         except Exception as e:
-            logger.error(f"Error incrementing cache key: {str(e)}")
+            ns.errors += 1
+            _log_error("Error incrementing cache key", e)
             return 0
 
-    def expire(self, key: str, seconds: int) -> bool:
+    async def expire(self, key: str, seconds: int) -> bool:
         """
         Set expiration time for a key
         Args:
@@ -164,12 +883,121 @@ class CacheService:
             bool: True if successful, False otherwise
         """
         try:
-            return self.redis.expire(key, seconds)
+            return await self.redis.expire(key, seconds)
         except Exception as e:
-            logger.error(f"Error setting expiration: {str(e)}")
+            _log_error("Error setting expiration", e)
             return False
 
+    async def run_script(self, script: str, keys: list[str], args: list[Any]) -> Any:
+        """
+        Run a Lua script atomically in one round trip (EVALSHA, falling back to EVAL)
+        Args:
+            script: Lua source; registered once per process
+            keys: Keys the script touches
+            args: Script arguments
+        Returns:
+            Any: The script's reply. Errors are raised to the caller, which decides how to degrade.
+        """
+        if script not in self._scripts:
+            self._scripts[script] = self.redis.register_script(script)
+        ns = self._ns(keys[0]) if keys else self._ns("script")
+        started = time.perf_counter()
+        try:
+            result = await self._scripts[script](keys=keys, args=args)
+        except Exception:
+            ns.errors += 1
+            raise
+        ns.set_latency.observe(time.perf_counter() - started)
+        return result
+
+    async def acquire_lock(self, name: str, timeout: float) -> Lock | LocalLock | None:
+        """
+        Try once to take a short-lived distributed lock.
+        While the circuit is open the lock only excludes callers in this worker.
+        Args:
+            name: Lock key
+            timeout: Seconds after which the lock frees itself if never released
+        Returns:
+            Optional[Lock]: The held lock, or None if another caller holds it
+        """
+        if self.breaker.is_open:
+            if name in self._local_locks:
+                return None
+            self._local_locks.add(name)
+            return LocalLock(name, self._local_locks)
+        lock = self.redis.lock(
+            name, timeout=timeout, blocking=False, thread_local=False
+        )
+        try:
+            if await lock.acquire():
+                return lock
+            return None
+        except Exception as e:
+            _log_error("Error acquiring cache lock", e)
+            return None
+
+    async def release_lock(self, lock: Lock | LocalLock) -> None:
+        """
+        Release a lock taken with `acquire_lock`; a lock that already expired is ignored
+        """
+        try:
+            await lock.release()
+        except Exception as e:
+            logger.warning(f"Error releasing cache lock: {str(e)}")
+
+
+def _tag_key(tag: str) -> str:
+    # Tag indexes used to be plain sets under "tag:"; the new prefix keeps a rolling
+    # deploy from hitting WRONGTYPE on indexes the old code wrote
+    return f"tags:{tag}"
+
+
+def _log_error(message: str, e: Exception) -> None:
+    # An open circuit is already logged once when it opens
+    if not isinstance(e, CacheUnavailableError):
+        logger.error(f"{message}: {str(e)}")
+
+
+def _to_bytes(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+def _to_str(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return value.decode()
+    return value
+
+
+def _seconds(expire: int | timedelta | None) -> int | None:
+    if isinstance(expire, timedelta):
+        return int(expire.total_seconds())
+    return expire
+
+
+local_cache = (
+    LocalCache(
+        max_size=settings.CACHE_LOCAL_MAX_SIZE,
+        ttl=settings.CACHE_LOCAL_TTL,
+        prefixes=settings.CACHE_LOCAL_PREFIXES,
+        max_item_bytes=settings.CACHE_LOCAL_MAX_ITEM_BYTES,
+        stats=CacheStats(),
+    )
+    if settings.CACHE_LOCAL_ENABLED
+    else None
+)
+
+# Shared per process so the L1 tier and its counters outlive a single request
+cache_service = CacheService(
+    redis_client,
+    local=local_cache,
+    breaker=redis_breaker,
+    pubsub_redis=redis_pubsub_client,
+)
+metrics.register_collector(cache_service.collect)
+
 
 # Dependencies
 async def get_cache_service():
-    return CacheService(redis_client)
+    return cache_service
@@ -70,6 +70,40 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def SQLALCHEMY_ASYNC_DATABASE_URI(self) -> PostgresDsn:
+        return MultiHostUrl.build(
+            scheme="postgresql+asyncpg",
+            username=self.POSTGRES_USER,
+            password=self.POSTGRES_PASSWORD,
+            host=self.POSTGRES_SERVER,
+            port=self.POSTGRES_PORT,
+            path=self.POSTGRES_DB,
+        )
+
+    # Optional read replicas for read-only endpoints (comma-separated SQLAlchemy URLs)
+    DATABASE_REPLICA_URLS: Annotated[list[str] | str, BeforeValidator(parse_cors)] = []
+    # Replicas lagging further behind than this are skipped; lag is re-checked this often
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_REPLICA_LAG_CHECK_INTERVAL: float = 5.0
+    # Seconds to wait for a replica connection (libpq minimum is 2), so a dead
+    # replica fails its lag check quickly
+    DB_REPLICA_CONNECT_TIMEOUT: int = 2
+    # After a write, the caller's reads go to the primary for this long
+    DB_READ_YOUR_WRITES_SECONDS: int = 10
+
+    # Per worker; total connections are workers * (pool size + overflow) per engine
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Seconds to wait for a free connection before failing the request
+    DB_POOL_TIMEOUT: float = 30
+    # Seconds after which a connection is replaced, ahead of server or proxy idle timeouts
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Server-side limit per statement in milliseconds (0 disables)
+    DB_STATEMENT_TIMEOUT_MS: int = 30_000
+
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
     SMTP_PORT: int = 587
@@ -123,6 +157,38 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: str = "password"
+    REDIS_MAX_CONNECTIONS: int = 50
+    # Seconds; a stalled Redis should cost a request this much at most
+    REDIS_SOCKET_TIMEOUT: float = 0.5
+    # Consecutive connection failures before Redis is bypassed, and the probe backoff
+    CACHE_BREAKER_FAILURE_THRESHOLD: int = 5
+    CACHE_BREAKER_RESET_TIMEOUT: float = 1.0
+    CACHE_BREAKER_MAX_RESET_TIMEOUT: float = 30.0
+    # Per-worker cache used while the circuit is open
+    CACHE_FALLBACK_MAX_SIZE: int = 1024
+    CACHE_FALLBACK_TTL: int = 60
+
+    # In-process L1 cache in front of Redis, kept coherent across workers via pub/sub
+    CACHE_LOCAL_ENABLED: bool = False
+    CACHE_LOCAL_MAX_SIZE: int = 1024
+    CACHE_LOCAL_TTL: int = 30
+    CACHE_LOCAL_MAX_ITEM_BYTES: int = 16 * 1024
+    # Only keys starting with one of these prefixes are admitted to the L1 tier
+    CACHE_LOCAL_PREFIXES: Annotated[list[str] | str, BeforeValidator(parse_cors)] = [
+        "user:"
+    ]
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    # Codec for @cache payloads; orjson/msgpack fall back to json when not installed
+    CACHE_CODEC: Literal["json", "orjson", "msgpack"] = "json"
+    # Payloads larger than this many bytes are zlib-compressed (0 disables)
+    CACHE_COMPRESS_THRESHOLD: int = 1024
+
+    # bcrypt runs in its own thread pool; calls beyond workers + queue get a 503
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+
+    # Expose Prometheus text metrics at /metrics; keep it off public networks
+    METRICS_ENABLED: bool = False
 
     SUPABASE_URL: str = ""
     SUPABASE_KEY: str = ""
@@ -132,9 +198,44 @@ class Settings(BaseSettings):
     TWITTER_BEARER_TOKEN: str = ""
     TWITTER_ACCESS_TOKEN: str = ""
     TWITTER_ACCESS_TOKEN_SECRET: str = ""
+    # Seconds per request; connections are kept alive and shared per worker
+    TWITTER_TIMEOUT: float = 10.0
+    TWITTER_CONNECT_TIMEOUT: float = 5.0
+    TWITTER_MAX_CONNECTIONS: int = 20
+    # Seconds a request queues for an exhausted rate limit window before it is rejected
+    TWITTER_RATE_LIMIT_MAX_WAIT: float = 5.0
+
+    # Scheduled publishing worker (python -m app.scheduler)
+    SCHEDULER_POLL_INTERVAL: float = 5.0
+    SCHEDULER_BATCH_SIZE: int = 20
+    # Upper bound on the backoff for a due draft that cannot be queued
+    SCHEDULER_MAX_RETRY_DELAY: float = 3600.0
+    # Serve Prometheus metrics from the worker on this port (0 disables)
+    SCHEDULER_METRICS_PORT: int = 0
+
+    # Tweet outbox relay, run by the same worker
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_BATCH_SIZE: int = 20
+    # Tweets in flight per relay process
+    OUTBOX_CONCURRENCY: int = 5
+    # Deliveries are marked failed, and their draft unpublished, after this many errors
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_MAX_RETRY_DELAY: float = 600.0
+    # Seconds a claimed row is reserved for its relay before another may resend it;
+    # must outlast a delivery, client retries included
+    OUTBOX_LEASE: float = 300.0
 
     VAPID_PUBLIC_KEY: str = ""
     VAPID_PRIVATE_KEY: str = ""
+    # Push requests in flight per worker, across all push services
+    WEBPUSH_CONCURRENCY: int = 100
+    # Keep-alive connections per push service (FCM, Mozilla, Apple, ...)
+    WEBPUSH_CONNECTIONS_PER_SERVICE: int = 20
+    # Processes encrypting payloads; 0 encrypts in a thread instead
+    WEBPUSH_ENCRYPT_WORKERS: int = 2
+    WEBPUSH_TIMEOUT: float = 10.0
+    # Seconds a push service keeps a notification for an offline device
+    WEBPUSH_TTL: int = 0
 
 
 settings = Settings()  # type: ignore
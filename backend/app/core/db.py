@@ -1,10 +1,156 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any
+
+from sqlalchemy import Engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool
 from sqlmodel import Session, create_engine, select
 
-from app import crud
+from app import crud, metrics
+from app.core import pool
 from app.core.config import settings
 from app.models import User, UserCreate
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+logger = logging.getLogger(__name__)
+
+
+def pool_options() -> dict[str, Any]:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+statement_timeout = settings.DB_STATEMENT_TIMEOUT_MS
+engine = create_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=pool.SyncPool,
+    connect_args={"options": f"-c statement_timeout={statement_timeout}"}
+    if statement_timeout
+    else {},
+    **pool_options(),
+)
+# Used by async routes so queries never block the event loop; both engines coexist
+# while routes are migrated
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_ASYNC_DATABASE_URI),
+    poolclass=pool.AsyncPool,
+    connect_args={"server_settings": {"statement_timeout": str(statement_timeout)}}
+    if statement_timeout
+    else {},
+    **pool_options(),
+)
+
+
+# Zero when the replica has replayed everything it received, so an idle primary does
+# not read as lag
+REPLICA_LAG = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class Replica:
+    """
+    A read replica engine with a periodically refreshed replication lag.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.lag = float("inf")
+        self.checked_at = float("-inf")
+
+    @property
+    def stale(self) -> bool:
+        return (
+            time.monotonic() - self.checked_at > settings.DB_REPLICA_LAG_CHECK_INTERVAL
+        )
+
+    def refresh_lag(self) -> float:
+        """
+        Measure replication lag in seconds; an unreachable replica counts as infinitely behind.
+        """
+        # Concurrent requests skip the check while this one runs
+        self.checked_at = time.monotonic()
+        try:
+            with self.engine.connect() as connection:
+                self.lag = float(connection.execute(REPLICA_LAG).scalar() or 0)
+        except Exception as e:
+            logger.error(f"Error checking replica lag: {str(e)}")
+            self.lag = float("inf")
+        self.checked_at = time.monotonic()
+        return self.lag
+
+    @property
+    def healthy(self) -> bool:
+        return self.lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+
+
+replicas = [
+    Replica(
+        create_engine(
+            url,
+            poolclass=pool.instrumented(QueuePool),
+            connect_args={
+                "connect_timeout": settings.DB_REPLICA_CONNECT_TIMEOUT,
+                **(
+                    {"options": f"-c statement_timeout={statement_timeout}"}
+                    if statement_timeout
+                    else {}
+                ),
+            },
+            **pool_options(),
+        )
+    )
+    for url in settings.DATABASE_REPLICA_URLS
+]
+# Keeps background lag checks referenced until they finish
+_lag_checks: set[asyncio.Task[float]] = set()
+
+
+def refresh_stale_replicas() -> None:
+    """
+    Start a lag check on a worker thread for every stale replica, without waiting for it.
+    Must be called from the event loop.
+    """
+    for replica in replicas:
+        if replica.stale:
+            # Claimed before the thread starts so concurrent requests skip it
+            replica.checked_at = time.monotonic()
+            task = asyncio.create_task(asyncio.to_thread(replica.refresh_lag))
+            _lag_checks.add(task)
+            task.add_done_callback(_lag_checks.discard)
+
+
+def pick_replica() -> Replica | None:
+    """
+    A random replica within the lag threshold, or None to read from the primary.
+    Lag is only cached (see refresh_stale_replicas); a replica is not picked until
+    its first check succeeds.
+    """
+    candidates = [replica for replica in replicas if replica.healthy]
+    return random.choice(candidates) if candidates else None
+
+
+def pools() -> dict[str, pool.InstrumentedPoolMixin]:
+    # Looked up on every call; dispose() swaps in a new pool object
+    return {
+        "sync": engine.pool,  # type: ignore[dict-item]
+        "async": async_engine.pool,  # type: ignore[dict-item]
+        **{
+            f"replica{index}": replica.engine.pool
+            for index, replica in enumerate(replicas)
+        },  # type: ignore[misc]
+    }
+
+
+metrics.register_collector(lambda: pool.collect(pools()))
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
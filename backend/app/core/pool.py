@@ -0,0 +1,96 @@
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app import metrics
+from app.metrics import Histogram
+
+
+@dataclass
+class PoolStats:
+    # Time blocked waiting for a free connection (or opening an overflow one)
+    wait_time: Histogram = field(default_factory=Histogram)
+    # Full checkout, including pre-ping and reconnects
+    checkout_time: Histogram = field(default_factory=Histogram)
+    timeouts: int = 0
+
+
+class InstrumentedPoolMixin:
+    """
+    Times every checkout. Subclasses set `stats` so it survives `Pool.recreate()`.
+    """
+
+    stats: PoolStats
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()  # type: ignore[misc]
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.wait_time.observe(time.perf_counter() - started)
+
+    def connect(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return super().connect()  # type: ignore[misc]
+        finally:
+            self.stats.checkout_time.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> dict[str, Any]:
+        pool: QueuePool = self  # type: ignore[assignment]
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "timeouts": self.stats.timeouts,
+            "wait_time": self.stats.wait_time.snapshot(),
+            "checkout_time": self.stats.checkout_time.snapshot(),
+        }
+
+
+def instrumented(base: type[QueuePool]) -> type[QueuePool]:
+    """
+    A pool class with its own stats, for one engine.
+    """
+    return type(base.__name__, (InstrumentedPoolMixin, base), {"stats": PoolStats()})
+
+
+SyncPool = instrumented(QueuePool)
+AsyncPool = instrumented(AsyncAdaptedQueuePool)
+
+
+def collect(pools: dict[str, InstrumentedPoolMixin]) -> Iterable[str]:
+    """
+    Prometheus exposition lines for the given pools, labelled by name.
+    """
+    snapshots = {name: pool.snapshot() for name, pool in pools.items()}
+    for key, kind, help in (
+        ("size", "gauge", "Configured pool size"),
+        ("checked_out", "gauge", "Connections in use"),
+        ("overflow", "gauge", "Connections open beyond the pool size"),
+        ("timeouts", "counter", "Checkouts that timed out waiting for a connection"),
+    ):
+        yield from metrics.sample_lines(
+            f"db_pool_{key}",
+            kind,
+            help,
+            [({"pool": name}, snapshot[key]) for name, snapshot in snapshots.items()],
+        )
+    yield from metrics.histogram_lines(
+        "db_pool_wait_seconds",
+        "Time waiting for a free connection",
+        [({"pool": name}, pool.stats.wait_time) for name, pool in pools.items()],
+    )
+    yield from metrics.histogram_lines(
+        "db_pool_checkout_seconds",
+        "Time to check out a connection, including pre-ping",
+        [({"pool": name}, pool.stats.checkout_time) for name, pool in pools.items()],
+    )
@@ -1,16 +1,29 @@
+import asyncio
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, TypeVar
 
 import jwt
+from fastapi import HTTPException
 from passlib.context import CryptContext
 
+from app import metrics
 from app.core.config import settings
+from app.metrics import Histogram
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+T = TypeVar("T")
+
 
 ALGORITHM = "HS256"
 
+# Stored as hashed_password for accounts that sign in through a social provider.
+# It is not a valid bcrypt hash, so no password ever matches it.
+UNUSABLE_PASSWORD = "!"
+
 
 def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
     expire = datetime.now(timezone.utc) + expires_delta
@@ -20,8 +33,130 @@ def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
+    if hashed_password.startswith(UNUSABLE_PASSWORD):
+        return False
     return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+class PasswordService:
+    """
+    Runs bcrypt in a dedicated, bounded thread pool so request handlers never block on it.
+
+    bcrypt releases the GIL, so the workers hash in parallel. At most `max_queue` calls
+    wait for a worker; beyond that callers get an immediate 503 instead of queueing up
+    behind a login burst.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max_queue
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_time = Histogram()
+        self.run_time = Histogram()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password"
+        )
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please try again",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        queued = time.perf_counter()
+
+        def timed() -> T:
+            started = time.perf_counter()
+            self.wait_time.observe(started - queued)
+            try:
+                return fn(*args)
+            finally:
+                self.run_time.observe(time.perf_counter() - started)
+
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._executor, timed
+            )
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+            return result
+        finally:
+            self.pending -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_time": self.wait_time.snapshot(),
+            "run_time": self.run_time.snapshot(),
+        }
+
+    def collect(self) -> Iterable[str]:
+        """
+        Prometheus exposition lines for this worker's password pool.
+        """
+        yield from metrics.sample_lines(
+            "password_pending",
+            "gauge",
+            "Password hashes running or queued",
+            [({}, self.pending)],
+        )
+        yield from metrics.sample_lines(
+            "password_completed_total",
+            "counter",
+            "Password hashes completed",
+            [({}, self.completed)],
+        )
+        yield from metrics.sample_lines(
+            "password_failed_total",
+            "counter",
+            "Password hashes that raised",
+            [({}, self.failed)],
+        )
+        yield from metrics.sample_lines(
+            "password_rejected_total",
+            "counter",
+            "Password hashes rejected with 503",
+            [({}, self.rejected)],
+        )
+        yield from metrics.histogram_lines(
+            "password_wait_seconds",
+            "Time queued for a password worker",
+            [({}, self.wait_time)],
+        )
+        yield from metrics.histogram_lines(
+            "password_run_seconds", "Time spent hashing", [({}, self.run_time)]
+        )
+
+
+password_service = PasswordService(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
+metrics.register_collector(password_service.collect)
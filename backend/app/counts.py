@@ -0,0 +1,46 @@
+import uuid
+from typing import Any, Literal
+
+from sqlalchemy import text
+from sqlmodel import Session, func, select
+
+from app.models import RowCount
+
+# exact: precise, O(1) per owner via trigger-maintained counters, COUNT(*) across all owners
+# estimate: planner statistics across all owners (per-owner counts stay exact)
+# none: skip counting
+CountMode = Literal["exact", "estimate", "none"]
+
+RELTUPLES = text(
+    "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"
+)
+
+
+def count_rows(
+    session: Session,
+    model: Any,
+    mode: CountMode = "exact",
+    owner_id: uuid.UUID | None = None,
+) -> int | None:
+    """
+    Count the rows of a table, or of one owner's rows, without scanning where possible.
+    Args:
+        session: Database session.
+        model: Table model; its owner column must be covered by the row_counts triggers.
+        mode: "exact", "estimate" or "none".
+        owner_id: Count only this owner's rows.
+    Returns:
+        Optional[int]: The count, or None when mode is "none".
+    """
+    if mode == "none":
+        return None
+    table = model.__tablename__
+    if owner_id is not None:
+        counter = session.get(RowCount, (table, owner_id))
+        return counter.count if counter else 0
+    if mode == "estimate":
+        estimate = session.exec(RELTUPLES, params={"table": f'"{table}"'}).scalar()  # type: ignore[call-overload]
+        # -1 until the table has been vacuumed or analyzed at least once
+        if estimate is not None and estimate >= 0:
+            return estimate
+    return session.exec(select(func.count()).select_from(model)).one()
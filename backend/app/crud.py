@@ -2,14 +2,20 @@ import uuid
 from typing import Any
 
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.security import get_password_hash, verify_password
-from app.models import Item, ItemCreate, User, UserCreate, UserUpdate
+from app.core.security import UNUSABLE_PASSWORD, get_password_hash, verify_password
+from app.models import Item, ItemCreate, Social, User, UserCreate, UserUpdate
 
 
-def create_user(*, session: Session, user_create: UserCreate) -> User:
+def create_user(
+    *, session: Session, user_create: UserCreate, hashed_password: str | None = None
+) -> User:
+    # Async callers hash through password_service and pass the result in
+    if hashed_password is None:
+        hashed_password = get_password_hash(user_create.password)
     db_obj = User.model_validate(
-        user_create, update={"hashed_password": get_password_hash(user_create.password)}
+        user_create, update={"hashed_password": hashed_password}
     )
     session.add(db_obj)
     session.commit()
@@ -17,26 +23,95 @@ def create_user(*, session: Session, user_create: UserCreate) -> User:
     return db_obj
 
 
-def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
+async def async_create_user(
+    *, session: AsyncSession, user_create: UserCreate, hashed_password: str
+) -> User:
+    db_obj = User.model_validate(
+        user_create, update={"hashed_password": hashed_password}
+    )
+    session.add(db_obj)
+    await session.commit()
+    await session.refresh(db_obj)
+    return db_obj
+
+
+def _social_user(social: Social) -> User:
+    # Social accounts have no password until the user sets one through a reset
+    return User(
+        email=social.email,
+        first_name=social.firstname,
+        last_name=social.lastname,
+        hashed_password=UNUSABLE_PASSWORD,
+    )
+
+
+def create_social_user(*, session: Session, social: Social) -> User:
+    db_obj = _social_user(social)
+    session.add(db_obj)
+    session.commit()
+    session.refresh(db_obj)
+    return db_obj
+
+
+async def async_create_social_user(*, session: AsyncSession, social: Social) -> User:
+    db_obj = _social_user(social)
+    session.add(db_obj)
+    await session.commit()
+    await session.refresh(db_obj)
+    return db_obj
+
+
+def _apply_user_update(
+    db_user: User, user_in: UserUpdate, hashed_password: str | None
+) -> None:
     user_data = user_in.model_dump(exclude_unset=True)
     extra_data = {}
     if "password" in user_data:
-        password = user_data["password"]
-        hashed_password = get_password_hash(password)
+        if hashed_password is None:
+            hashed_password = get_password_hash(user_data["password"])
         extra_data["hashed_password"] = hashed_password
     db_user.sqlmodel_update(user_data, update=extra_data)
+
+
+def update_user(
+    *,
+    session: Session,
+    db_user: User,
+    user_in: UserUpdate,
+    hashed_password: str | None = None,
+) -> Any:
+    _apply_user_update(db_user, user_in, hashed_password)
     session.add(db_user)
     session.commit()
     session.refresh(db_user)
     return db_user
 
 
+async def async_update_user(
+    *,
+    session: AsyncSession,
+    db_user: User,
+    user_in: UserUpdate,
+    hashed_password: str | None = None,
+) -> User:
+    _apply_user_update(db_user, user_in, hashed_password)
+    session.add(db_user)
+    await session.commit()
+    await session.refresh(db_user)
+    return db_user
+
+
 def get_user_by_email(*, session: Session, email: str) -> User | None:
     statement = select(User).where(User.email == email)
     session_user = session.exec(statement).first()
     return session_user
 
 
+async def async_get_user_by_email(*, session: AsyncSession, email: str) -> User | None:
+    statement = select(User).where(User.email == email)
+    return (await session.exec(statement)).first()
+
+
 def authenticate(*, session: Session, email: str, password: str) -> User | None:
     db_user = get_user_by_email(session=session, email=email)
     if not db_user:
@@ -1,12 +1,23 @@
+import asyncio
 import hashlib
+import inspect
 import json
+import random
 import re
 from collections.abc import Callable
 from functools import wraps
+from typing import Any, get_args
 
-from fastapi import HTTPException
+import pydantic_core
+from fastapi import BackgroundTasks, HTTPException, Request, Response
+from pydantic import BaseModel
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.cache import get_cache_service
+from app import serialization
+from app.cache import CacheService, get_cache_service
+from app.models import User, UserPublic
+from app.ratelimit import Algorithm, KeyBy, RateLimiter, client_identity
 import time
 from typing import Callable, TypeVar, ParamSpec
 from sqlalchemy.exc import OperationalError, DBAPIError
@@ -17,16 +28,29 @@ T = TypeVar('T')
 P = ParamSpec('P')
 
 
-def limit(rate_string: str):
+def limit(
+    rate_string: str,
+    algorithm: Algorithm = "sliding_window",
+    key_by: KeyBy = "user",
+    burst: int | None = None,
+):
     """
     Rate limiting decorator that accepts strings like "5/minute", "10/hour", etc.
     Usage: @limit("5/minute")
+    Args:
+        rate_string: Allowed requests per period.
+        algorithm: "sliding_window" or "token_bucket".
+        key_by: Count per "user" (JWT subject), per "token" or per client "ip".
+            Requests without a valid token are always counted per IP.
+        burst: Token bucket capacity; defaults to the request count.
     """
     pattern = r"(\d+)/(\w+)"
     match = re.match(pattern, rate_string)
 
     if not match:
-        raise ValueError("Rate string must be in format 'number/period' (e.g., '5/minute')")
+        raise ValueError(
+            "Rate string must be in format 'number/period' (e.g., '5/minute')"
+        )
 
     max_requests = int(match.group(1))
     period = match.group(2).lower()
@@ -39,89 +63,185 @@ def limit(rate_string: str):
         "day": 86400
     }
 
-    if period not in time_periods and period + "s" not in time_periods:
-        raise ValueError(f"Invalid time period. Must be one of: {', '.join(time_periods.keys())}")
+    if period not in time_periods and period[:-1] not in time_periods:
+        raise ValueError(
+            f"Invalid time period. Must be one of: {', '.join(time_periods.keys())}"
+        )
 
     # Handle both singular and plural forms
     period_seconds = time_periods.get(period) or time_periods.get(period[:-1])
 
+    if algorithm not in get_args(Algorithm):
+        raise ValueError(
+            f"Invalid algorithm. Must be one of: {', '.join(get_args(Algorithm))}"
+        )
+
     def decorator(func):
+        signature = inspect.signature(func)
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            cache = await get_cache_service()
-            # Extract ip request
-            key = f"rate_limit:{func.__name__}"
+            request: Request = kwargs.pop(_LIMIT_REQUEST)
+            response: Response = kwargs.pop(_LIMIT_RESPONSE)
+            limiter = RateLimiter(
+                await get_cache_service(),
+                max_requests,
+                period_seconds,
+                algorithm=algorithm,
+                burst=burst,
+            )
+            key = f"rate_limit:{func.__name__}:{client_identity(request, key_by)}"
+            result = await limiter.hit(key)
 
-            # Increment the request count
-            current_count = cache.redis.incr(key)
-
-            if current_count == 1:
-                # Set the expiration for the first request
-                cache.redis.expire(key, period_seconds)
-
-            if current_count > max_requests:
+            if not result.allowed:
                 raise HTTPException(
                     status_code=429,
-                    detail=f"Rate limit exceeded. Maximum {max_requests} requests per {period} allowed."
+                    detail=f"Rate limit exceeded. Maximum {max_requests} requests per {period} allowed.",
+                    headers=result.headers(),
                 )
 
+            response.headers.update(result.headers())
             return await func(*args, **kwargs)
+
+        # Have FastAPI inject the request (to identify the client) and the response
+        # (to attach X-RateLimit-* headers) without the endpoint declaring them
+        parameters = [
+            p for p in signature.parameters.values() if p.kind != p.VAR_KEYWORD
+        ]
+        parameters += [
+            inspect.Parameter(
+                _LIMIT_REQUEST, inspect.Parameter.KEYWORD_ONLY, annotation=Request
+            ),
+            inspect.Parameter(
+                _LIMIT_RESPONSE, inspect.Parameter.KEYWORD_ONLY, annotation=Response
+            ),
+        ]
+        parameters += [
+            p for p in signature.parameters.values() if p.kind == p.VAR_KEYWORD
+        ]
+        wrapper.__signature__ = signature.replace(parameters=parameters)
         return wrapper
     return decorator
 
 
-def cache(expire: int = 86400, key: str | None = None, hash: bool = True):
+_LIMIT_REQUEST = "rate_limit_request"
+_LIMIT_RESPONSE = "rate_limit_response"
+
+
+def cache(
+    expire: int = 86400,
+    key: str | None = None,
+    hash: bool = True,
+    tags: list[str] | None = None,
+    as_response: bool = False,
+    single_flight: bool = False,
+    stale_ttl: int = 0,
+    jitter: float = 0.0,
+    lock_timeout: int = 10,
+    lock_wait: float = 2.0,
+    key_params: list[str] | None = None,
+    per_user: bool = False,
+):
     """
     Decorator to cache the result of a function.
     Args:
         expire: Expiration time in seconds for the cache.
         key: Optional custom key for caching. If not provided, a key is generated.
+        tags: Extra tags to register entries under. Entries are always tagged with
+            the key (or function name), so `CacheService.invalidate(key)` drops them.
+        as_response: Return a JSON `Response` built from the stored bytes instead of
+            the decoded value. Only for endpoints: the result is serialized as returned,
+            bypassing `response_model` filtering.
+        single_flight: On a miss, only the caller holding a short Redis lock recomputes;
+            the others poll for up to `lock_wait` seconds before computing themselves.
+        stale_ttl: Keep entries this many seconds past `expire`. A stale hit is served
+            as-is while one caller (holding the lock) recomputes it.
+        jitter: Randomly stretch TTLs by up to this fraction so keys written together
+            do not expire together.
+        lock_timeout: Seconds before a recompute lock is released automatically.
+        lock_wait: Seconds a single-flight caller waits for another caller's result.
+        key_params: Only these parameters contribute to the key. Defaults to every
+            parameter except injected dependencies (sessions, the cache, requests...).
+        per_user: Scope entries to the calling user even if no `User` argument is
+            listed in `key_params`. A `User` argument always keys on its id.
     """
-    def generate_cache_key(key: str, func_name: str, args: tuple, kwargs: dict) -> str:
-        """
-        Generate a consistent cache key based on the function name and normalized arguments.
-        Args:
-            func_name: The name of the function.
-            args: Positional arguments.
-            kwargs: Keyword arguments.
-        Returns:
-            str: A hash representing the cache key.
-        """
-        temp_kwargs = ":".join([str(v.id) if k == "user" else str(v) for k, v in kwargs.items() if k not in ["db", "redis", "cache", "cart_in"]])
-        if hash:
-            temp_kwargs = hashlib.sha256(temp_kwargs.encode()).hexdigest()
-
-        return f"{key or func_name}:{temp_kwargs}"
-
     def decorator(func: Callable):
+        signature = inspect.signature(func)
+
         @wraps(func)
         async def wrapped(*args, **kwargs):
             # Initialize cache service
             cache_service = await get_cache_service()
 
             # Use the provided key or generate one
-            cache_key = generate_cache_key(key=key, func_name=func.__name__, args=args, kwargs=kwargs)
+            cache_key = build_cache_key(
+                signature,
+                args,
+                kwargs,
+                prefix=key or func.__name__,
+                key_params=key_params,
+                per_user=per_user,
+                hash=hash,
+            )
+
+            fresh_key = f"{cache_key}:fresh"
+            lock_key = f"{cache_key}:lock"
+
+            def load(payload: bytes):
+                if as_response:
+                    return _json_response(payload)
+                return serialization.decode(payload)
 
             # Try to get the result from the cache
-            cached_result = cache_service.get(cache_key)
-            if cached_result is not None:
-                return json.loads(cached_result)
+            if stale_ttl:
+                cached_result, fresh = await cache_service.get_many_bytes(
+                    [cache_key, fresh_key]
+                )
+            else:
+                cached_result, fresh = await cache_service.get_bytes(cache_key), b"1"
 
-            # Compute the result, cache it, and return it
-            result = await func(*args, **kwargs)
+            lock = None
+            if cached_result is not None:
+                try:
+                    if fresh is not None:
+                        return load(cached_result)
+                    # Stale: whoever wins the lock recomputes, everyone else is served stale
+                    lock = await cache_service.acquire_lock(lock_key, lock_timeout)
+                    if lock is None:
+                        return load(cached_result)
+                except Exception as e:
+                    logging.warning(
+                        "Discarding undecodable cache entry %s: %s", cache_key, e
+                    )
+            elif single_flight:
+                lock = await cache_service.acquire_lock(lock_key, lock_timeout)
+                if lock is None:
+                    cached_result = await _wait_for(cache_service, cache_key, lock_wait)
+                    if cached_result is not None:
+                        return load(cached_result)
 
             try:
-                if isinstance(result, dict):
-                    serialized_result = json.dumps(result)
-                elif hasattr(result, "model_dump_json"):
-                    serialized_result = result.model_dump_json()  # For Pydantic v2.x
-                elif hasattr(result, "json"):
-                    serialized_result = result.json()  # For Pydantic v1.x
-                else:
-                    raise Exception("Cannot serialize result")
-                cache_service.set(cache_key, serialized_result, expire)
-            except Exception as e:
-                raise ValueError(f"Failed to serialize result: {e}")
+                # Compute the result, cache it, and return it
+                result = await func(*args, **kwargs)
+
+                try:
+                    serialized_result = serialization.encode(result)
+                except Exception as e:
+                    raise ValueError(f"Failed to serialize result: {e}")
+                ttl = _jittered(expire, jitter)
+                await cache_service.set(
+                    cache_key,
+                    serialized_result,
+                    ttl + stale_ttl,
+                    tags=[key or func.__name__, *(tags or [])],
+                )
+                if stale_ttl:
+                    await cache_service.set(fresh_key, b"1", ttl)
+            finally:
+                if lock is not None:
+                    await cache_service.release_lock(lock)
+            if as_response:
+                return _json_response(serialized_result)
             return result
 
         return wrapped
@@ -129,6 +249,117 @@ def cache(expire: int = 86400, key: str | None = None, hash: bool = True):
     return decorator
 
 
+# Injected per request; never part of what a cached result depends on
+_UNKEYED_TYPES = (
+    Session,
+    AsyncSession,
+    CacheService,
+    Request,
+    Response,
+    BackgroundTasks,
+)
+# CurrentUser resolves to the cached UserPublic projection
+_USER_TYPES = (User, UserPublic)
+
+
+def _canonical(value: Any) -> Any:
+    """
+    Reduce a value to plain JSON types whose encoding is stable across processes.
+    """
+    if isinstance(value, _USER_TYPES):
+        return {"user": str(value.id)}
+    if isinstance(value, BaseModel):
+        return _canonical(value.model_dump(mode="json"))
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, list | tuple):
+        return [_canonical(v) for v in value]
+    if isinstance(value, set | frozenset):
+        return sorted((_canonical(v) for v in value), key=json.dumps)
+    if value is None or isinstance(value, str | int | float | bool):
+        return value
+    try:
+        # UUIDs, datetimes, enums, decimals...
+        return pydantic_core.to_jsonable_python(value)
+    except pydantic_core.PydanticSerializationError:
+        raise TypeError(
+            f"Cannot build a cache key from {type(value).__name__}; "
+            "exclude it with key_params"
+        )
+
+
+def build_cache_key(
+    signature: inspect.Signature,
+    args: tuple,
+    kwargs: dict,
+    prefix: str,
+    key_params: list[str] | None = None,
+    per_user: bool = False,
+    hash: bool = True,
+) -> str:
+    """
+    Build a cache key from a call's bound arguments, positional or keyword, with defaults applied.
+    Args:
+        signature: Signature of the decorated function.
+        args: Positional arguments.
+        kwargs: Keyword arguments.
+        prefix: Key namespace, usually the function name.
+        key_params: Parameters to include; defaults to all non-dependency parameters.
+        per_user: Always include the id of a `User` argument.
+        hash: Hash the canonical arguments instead of embedding them.
+    Returns:
+        str: `{prefix}:{arguments}`
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    parts: dict[str, Any] = {}
+    for name, value in bound.arguments.items():
+        is_user = isinstance(value, _USER_TYPES)
+        if (
+            key_params is not None
+            and name not in key_params
+            and not (per_user and is_user)
+        ):
+            continue
+        if key_params is None and isinstance(value, _UNKEYED_TYPES):
+            continue
+        parts[name] = _canonical(value)
+    if per_user and not any(
+        isinstance(v, _USER_TYPES) for v in bound.arguments.values()
+    ):
+        raise TypeError(f"{prefix}: per_user caching needs a User argument")
+
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    if hash:
+        canonical = hashlib.sha256(canonical.encode()).hexdigest()
+    return f"{prefix}:{canonical}"
+
+
+def _jittered(ttl: int, jitter: float) -> int:
+    if not jitter:
+        return ttl
+    return ttl + random.randint(0, int(ttl * jitter))
+
+
+async def _wait_for(cache_service, key: str, timeout: float) -> bytes | None:
+    """
+    Poll for a value another caller is computing, giving up after `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        value = await cache_service.get_bytes(key)
+        if value is not None:
+            return value
+    return None
+
+
+def _json_response(payload: bytes) -> Response:
+    return Response(
+        content=serialization.to_json_bytes(payload), media_type="application/json"
+    )
+
+
 def with_retry(
     retries: int = 3,
     delay: float = 1.0,
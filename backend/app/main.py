@@ -1,9 +1,19 @@
+from contextlib import asynccontextmanager
+
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from starlette.middleware.cors import CORSMiddleware
 
+from app import metrics
+from app.api.deps import pin_reads_to_primary
 from app.api.main import api_router
+from app.cache import cache_service
 from app.core.config import settings
+from app.core.db import async_engine
+from app.core.security import password_service
+from app.twitter import twitter_client
+from app.webpush import webpush_service
 
 # def custom_generate_unique_id(route: APIRoute) -> str:
 #     return f"{route.tags[0]}-{route.name}"
@@ -12,9 +22,24 @@ from app.core.config import settings
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Each worker opens its Redis pool once and keeps its L1 cache coherent with its peers
+    await cache_service.connect()
+    await webpush_service.connect()
+    yield
+    await cache_service.close()
+    password_service.shutdown()
+    await twitter_client.close()
+    await webpush_service.close()
+    await async_engine.dispose()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
     # generate_unique_id_function=custom_generate_unique_id,
 )
 
@@ -29,6 +54,27 @@ async def health_check():
     return {"status": "ok"}
 
 
+if settings.METRICS_ENABLED:
+
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def prometheus_metrics():
+        # Counters are per worker; each sample carries a worker="<pid>" label
+        return metrics.render()
+
+
+if settings.DATABASE_REPLICA_URLS:
+
+    @app.middleware("http")
+    async def read_your_writes(request: Request, call_next):
+        response = await call_next(request)
+        if (
+            request.method not in ("GET", "HEAD", "OPTIONS")
+            and response.status_code < 400
+        ):
+            await pin_reads_to_primary(request, cache_service)
+        return response
+
+
 # Set all CORS enabled origins
 if settings.all_cors_origins:
     app.add_middleware(
@@ -0,0 +1,108 @@
+import os
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+# Seconds; suits both sub-millisecond cache calls and slower network calls
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+@dataclass
+class Histogram:
+    """
+    Fixed-bucket latency histogram, cheap enough to update on every call.
+    """
+
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    counts: list[int] = field(default_factory=list)
+    sum: float = 0.0
+    count: int = 0
+
+    def __post_init__(self) -> None:
+        # One extra slot for observations above the last bucket (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0.0,
+            "buckets": dict(
+                zip([*map(str, self.buckets), "+Inf"], self.counts, strict=True)
+            ),
+        }
+
+
+Labels = dict[str, str]
+Collector = Callable[[], Iterable[str]]
+
+_collectors: list[Collector] = []
+
+
+def register_collector(collector: Collector) -> None:
+    """
+    Register a callable yielding Prometheus exposition lines for `render`.
+    """
+    _collectors.append(collector)
+
+
+def _labels(labels: Labels) -> str:
+    # Metrics are per worker process; the pid keeps samples from different workers apart
+    labels = {"worker": str(os.getpid()), **labels}
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+
+def sample_lines(
+    name: str, kind: str, help: str, samples: Iterable[tuple[Labels, float]]
+) -> Iterable[str]:
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} {kind}"
+    for labels, value in samples:
+        yield f"{name}{{{_labels(labels)}}} {value}"
+
+
+def histogram_lines(
+    name: str, help: str, samples: Iterable[tuple[Labels, Histogram]]
+) -> Iterable[str]:
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} histogram"
+    for labels, histogram in samples:
+        cumulative = 0
+        for bound, count in zip(
+            [*map(str, histogram.buckets), "+Inf"], histogram.counts, strict=True
+        ):
+            cumulative += count
+            yield f"{name}_bucket{{{_labels({**labels, 'le': bound})}}} {cumulative}"
+        yield f"{name}_sum{{{_labels(labels)}}} {histogram.sum}"
+        yield f"{name}_count{{{_labels(labels)}}} {histogram.count}"
+
+
+def render() -> str:
+    """
+    Prometheus text exposition of every registered collector, for this worker.
+    """
+    lines: list[str] = []
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
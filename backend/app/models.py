@@ -1,4 +1,3 @@
-import secrets
 import uuid
 from datetime import datetime
 
@@ -10,7 +9,6 @@ class Social(SQLModel):
     email: str
     firstname: str
     lastname: str
-    password: str = secrets.token_urlsafe(6)
 
 
 # Shared properties
@@ -55,6 +53,7 @@ class UpdatePassword(SQLModel):
 class User(UserBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     hashed_password: str
+    created_at: datetime = Field(default_factory=datetime.now)
     items: list["Item"] = Relationship(back_populates="owner", cascade_delete=True)
     drafts: list["Draft"] = Relationship(back_populates="user", cascade_delete=True)
 
@@ -66,7 +65,10 @@ class UserPublic(UserBase):
 
 class UsersPublic(SQLModel):
     data: list[UserPublic]
-    count: int
+    # None when requested with count=none
+    count: int | None
+    # Pass back as `cursor` to fetch the next page; None on the last page
+    next_cursor: str | None = None
 
 
 # Shared properties
@@ -92,6 +94,7 @@ class Item(ItemBase, table=True):
     owner_id: uuid.UUID = Field(
         foreign_key="user.id", nullable=False, ondelete="CASCADE"
     )
+    created_at: datetime = Field(default_factory=datetime.now)
     owner: User | None = Relationship(back_populates="items")
 
 
@@ -103,7 +106,16 @@ class ItemPublic(ItemBase):
 
 class ItemsPublic(SQLModel):
     data: list[ItemPublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
+
+
+# Rows per owner, maintained by triggers on drafts and item (see app.counts)
+class RowCount(SQLModel, table=True):
+    __tablename__ = "row_counts"
+    table_name: str = Field(primary_key=True, max_length=63)
+    owner_id: uuid.UUID = Field(primary_key=True)
+    count: int = 0
 
 
 # Generic message
@@ -203,7 +215,40 @@ class DraftPublic(DraftBase):
 
 class DraftsPublic(SQLModel):
     data: list[DraftPublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
+
+
+# Tweets waiting to be delivered to Twitter by the outbox relay (see app.outbox)
+class TweetOutbox(SQLModel, table=True):
+    __tablename__ = "tweet_outbox"
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    draft_id: uuid.UUID = Field(
+        foreign_key="drafts.id", nullable=False, ondelete="CASCADE"
+    )
+    user_id: uuid.UUID = Field(
+        foreign_key="user.id", nullable=False, ondelete="CASCADE"
+    )
+    content: str = Field(max_length=280)
+    # pending, sending (leased by a relay until next_attempt_at), sent or failed
+    status: str = Field(default="pending", max_length=20)
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.now)
+    last_error: str | None = Field(default=None, max_length=1000)
+    twitter_id: str | None = Field(default=None, max_length=255)
+    created_at: datetime = Field(default_factory=datetime.now)
+    sent_at: datetime | None = None
+
+
+class TweetOutboxPublic(SQLModel):
+    id: uuid.UUID
+    draft_id: uuid.UUID
+    status: str
+    attempts: int
+    last_error: str | None
+    twitter_id: str | None
+    created_at: datetime
+    sent_at: datetime | None
 
 
 class PushSubscriptionBase(SQLModel):
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import time
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import col, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import metrics
+from app.core.config import settings
+from app.core.db import async_engine
+from app.metrics import Histogram
+from app.models import Draft, Tweet, TweetOutbox
+from app.twitter import TwitterError, TwitterRateLimited, twitter_client
+
+logger = logging.getLogger(__name__)
+
+# Seconds from enqueue to Twitter accepting the tweet
+DELIVERY_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+
+def enqueue_tweet(session: AsyncSession, draft: Draft) -> TweetOutbox:
+    """
+    Mark a draft published and queue its tweet, to be committed by the caller.
+
+    Both writes land in the same transaction, so a draft is never marked published
+    without a delivery queued for it, or queued twice (see the partial unique index).
+    Args:
+        session: Session holding the draft, ideally locked FOR UPDATE.
+        draft: Unpublished draft to publish.
+    Returns:
+        TweetOutbox: The queued delivery.
+    """
+    entry = TweetOutbox(draft_id=draft.id, user_id=draft.user_id, content=draft.content)
+    draft.sqlmodel_update({"is_published": True, "updated_at": datetime.now()})
+    session.add(draft)
+    session.add(entry)
+    return entry
+
+
+class OutboxRelay:
+    """
+    Delivers queued tweets to Twitter, at least once.
+
+    Due rows are leased in a short transaction of their own: FOR UPDATE SKIP LOCKED
+    lets any number of relays share the outbox, and each claimed row is marked
+    `sending` until `next_attempt_at`. Twitter is then called with no transaction or
+    connection held, and each outcome is recorded in its own transaction, fenced on
+    the lease. A row whose lease runs out (the relay died, or its write failed) is
+    claimed again as a redelivery, which is the only case where Twitter's
+    duplicate-content rejection counts as delivered.
+    """
+
+    def __init__(self, batch_size: int, concurrency: int, poll_interval: float):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.delivery = Histogram(buckets=DELIVERY_BUCKETS)
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.last_poll = 0.0
+
+    def _retry(
+        self, entry: TweetOutbox, detail: Any, delay: float | None = None
+    ) -> None:
+        entry.status = "pending"
+        entry.last_error = str(detail)[:1000]
+        if delay is None:
+            entry.attempts += 1
+            if entry.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                self._give_up(entry, detail)
+                return
+            delay = min(
+                self.poll_interval * 2**entry.attempts, settings.OUTBOX_MAX_RETRY_DELAY
+            )
+        self.retried += 1
+        entry.next_attempt_at = datetime.now() + timedelta(seconds=delay)
+
+    def _give_up(self, entry: TweetOutbox, detail: Any) -> None:
+        self.failed += 1
+        entry.status = "failed"
+        entry.last_error = str(detail)[:1000]
+        logger.error(f"Error delivering tweet for draft {entry.draft_id}: {detail}")
+
+    def _complete(self, entry: TweetOutbox, twitter_id: str | None) -> None:
+        now = datetime.now()
+        self.sent += 1
+        self.delivery.observe(max((now - entry.created_at).total_seconds(), 0.0))
+        entry.sqlmodel_update(
+            {"status": "sent", "twitter_id": twitter_id, "sent_at": now}
+        )
+
+    async def _claim(self) -> list[tuple[TweetOutbox, bool]]:
+        """
+        Lease one batch of due rows and commit, so no lock outlives the claim.
+        Returns:
+            list: Each claimed row, and whether it was already being sent under a
+                lease that ran out
+        """
+        now = datetime.now()
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            entries = (
+                await session.exec(
+                    select(TweetOutbox)
+                    .where(
+                        col(TweetOutbox.status).in_(("pending", "sending")),
+                        TweetOutbox.next_attempt_at <= now,
+                    )
+                    .order_by(TweetOutbox.next_attempt_at)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+            ).all()
+            claimed = []
+            for entry in entries:
+                claimed.append((entry, entry.status == "sending"))
+                entry.status = "sending"
+                entry.next_attempt_at = now + timedelta(seconds=settings.OUTBOX_LEASE)
+                session.add(entry)
+            await session.commit()
+        return claimed
+
+    async def _deliver(self, entry: TweetOutbox, resent: bool) -> Tweet | None:
+        try:
+            response = await twitter_client.create_tweet(entry.content, max_wait=0)
+        except TwitterRateLimited as e:
+            # Not the tweet's fault: wait out the window without using up an attempt
+            self._retry(entry, e.detail, delay=e.retry_after)
+            return None
+        except TwitterError as e:
+            if resent and e.status_code == 403 and "duplicate" in str(e.detail).lower():
+                # Twitter accepted the earlier send, but its outcome was never recorded
+                self._complete(entry, None)
+            elif e.status_code is None or e.status_code == 429 or e.status_code >= 500:
+                self._retry(entry, e.detail)
+            else:
+                self._give_up(entry, e.detail)
+            return None
+        twitter_id = response.get("data", {}).get("id")
+        self._complete(entry, twitter_id)
+        if twitter_id is None:
+            # Accepted, but with nothing to record: tweets.twitter_id is required
+            logger.warning(
+                f"Twitter returned no id for the tweet of draft {entry.draft_id}"
+            )
+            return None
+        return Tweet(
+            content=entry.content, twitter_id=twitter_id, created_at=datetime.now()
+        )
+
+    async def _record(
+        self, entry: TweetOutbox, leased_until: datetime, tweet: Tweet | None
+    ) -> None:
+        """
+        Write one delivery's outcome, unless its lease was lost to another relay.
+        """
+        async with AsyncSession(async_engine) as session:
+            result = await session.exec(  # type: ignore[call-overload]
+                update(TweetOutbox)
+                .where(
+                    col(TweetOutbox.id) == entry.id,
+                    col(TweetOutbox.status) == "sending",
+                    col(TweetOutbox.next_attempt_at) == leased_until,
+                )
+                .values(
+                    status=entry.status,
+                    attempts=entry.attempts,
+                    next_attempt_at=entry.next_attempt_at,
+                    last_error=entry.last_error,
+                    twitter_id=entry.twitter_id,
+                    sent_at=entry.sent_at,
+                )
+            )
+            if result.rowcount == 0:
+                logger.warning(
+                    f"Lease on the tweet of draft {entry.draft_id} ran out before "
+                    "its outcome was recorded"
+                )
+                return
+            if tweet is not None:
+                # tweets.content and twitter_id are unique; the same text may have been
+                # recorded by an earlier post
+                await session.exec(  # type: ignore[call-overload]
+                    insert(Tweet).values(tweet.model_dump()).on_conflict_do_nothing()
+                )
+            if entry.status == "failed":
+                # Let the owner edit and publish a draft whose tweet could not be delivered
+                await session.exec(  # type: ignore[call-overload]
+                    update(Draft)
+                    .where(col(Draft.id) == entry.draft_id)
+                    .values(is_published=False, updated_at=datetime.now())
+                )
+            await session.commit()
+
+    async def _process(self, entry: TweetOutbox, resent: bool) -> None:
+        leased_until = entry.next_attempt_at
+        async with self.semaphore:
+            try:
+                tweet = await self._deliver(entry, resent)
+                await self._record(entry, leased_until, tweet)
+            except Exception as e:
+                # The lease runs out and the row is claimed again as a redelivery
+                logger.error(
+                    f"Error recording tweet delivery for draft {entry.draft_id}: {str(e)}"
+                )
+
+    async def run_once(self) -> int:
+        """
+        Claim and deliver one batch of due outbox rows.
+        Returns:
+            int: Number of rows claimed, so the caller can poll again immediately when full
+        """
+        self.last_poll = time.time()
+        claimed = await self._claim()
+        await asyncio.gather(
+            *(self._process(entry, resent) for entry, resent in claimed)
+        )
+        return len(claimed)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Error polling tweet outbox: {str(e)}")
+                claimed = 0
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def collect(self) -> Iterable[str]:
+        """
+        Prometheus exposition lines for this relay process.
+        """
+        yield from metrics.sample_lines(
+            "outbox_sent_total", "counter", "Queued tweets delivered", [({}, self.sent)]
+        )
+        yield from metrics.sample_lines(
+            "outbox_retried_total",
+            "counter",
+            "Tweet deliveries deferred for a retry",
+            [({}, self.retried)],
+        )
+        yield from metrics.sample_lines(
+            "outbox_failed_total",
+            "counter",
+            "Tweet deliveries given up on",
+            [({}, self.failed)],
+        )
+        yield from metrics.sample_lines(
+            "outbox_last_poll_timestamp_seconds",
+            "gauge",
+            "Unix time of the last poll",
+            [({}, self.last_poll)],
+        )
+        yield from metrics.histogram_lines(
+            "outbox_delivery_seconds",
+            "Time from enqueue to Twitter accepting the tweet",
+            [({}, self.delivery)],
+        )
@@ -0,0 +1,71 @@
+import base64
+import json
+import uuid
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any, TypeVar
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlmodel.sql.expression import SelectOfScalar
+
+T = TypeVar("T")
+
+
+def encode_cursor(created_at: datetime, id: uuid.UUID) -> str:
+    """
+    Opaque token pointing just past a row, for keyset pagination.
+    """
+    raw = json.dumps([created_at.isoformat(), str(id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), uuid.UUID(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(
+    statement: SelectOfScalar[T],
+    model: Any,
+    skip: int,
+    limit: int,
+    cursor: str | None = None,
+) -> SelectOfScalar[T]:
+    """
+    Newest first, ordered on (created_at, id). With a cursor the page starts right after
+    it using the (created_at, id) index, so deep pages cost the same as the first;
+    without one, offset paging is kept for compatibility.
+    One extra row is fetched so `page` can tell whether another page follows.
+    Args:
+        statement: Select of `model`, already filtered.
+        model: Table model with `created_at` and `id` columns.
+        skip: Rows to skip when no cursor is given.
+        limit: Page size.
+        cursor: Token from a previous page's `next_cursor`.
+    Returns:
+        SelectOfScalar: The paginated statement.
+    """
+    statement = statement.order_by(model.created_at.desc(), model.id.desc())
+    if cursor:
+        statement = statement.where(
+            tuple_(model.created_at, model.id) < tuple_(*decode_cursor(cursor))
+        )
+    else:
+        statement = statement.offset(skip)
+    return statement.limit(limit + 1)
+
+
+def page(rows: Sequence[T], limit: int) -> tuple[Sequence[T], str | None]:
+    """
+    Trim the look-ahead row fetched by `paginate` and build the next cursor.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.created_at, last.id)  # type: ignore[attr-defined]
@@ -0,0 +1,255 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Literal
+
+import jwt
+from fastapi import Request
+from jwt.exceptions import InvalidTokenError
+
+from app.cache import CacheService, CacheUnavailableError
+from app.core import security
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Algorithm = Literal["sliding_window", "token_bucket"]
+KeyBy = Literal["user", "token", "ip"]
+
+# Both scripts keep their state in a single hash, read the clock from Redis so every
+# worker agrees on it, and reply {allowed, remaining, retry_after_ms, reset_ms}.
+
+# Sliding window counter: the previous fixed window's count is weighted by how much
+# of it still overlaps the sliding window. O(1) memory per client.
+SLIDING_WINDOW = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local index = math.floor(now / window)
+local state = redis.call('HMGET', KEYS[1], 'index', 'current', 'previous')
+local current = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+local stored = tonumber(state[1])
+if stored == index - 1 then
+    previous = current
+    current = 0
+elseif stored ~= index then
+    previous = 0
+    current = 0
+end
+local into = now % window
+local reset = window - into
+local weighted = previous * (1 - into / window) + current
+if weighted + 1 > limit then
+    local retry
+    if previous > 0 and limit - current - 1 >= 0 then
+        retry = math.ceil((1 - (limit - current - 1) / previous) * window) - into
+    else
+        retry = reset
+        if current > 0 then
+            retry = retry + math.max(0, math.ceil((1 - (limit - 1) / current) * window))
+        end
+    end
+    return {0, 0, math.max(retry, 1), reset}
+end
+current = current + 1
+redis.call('HSET', KEYS[1], 'index', index, 'current', current, 'previous', previous)
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return {1, math.floor(limit - weighted - 1), 0, reset}
+"""
+
+# Token bucket: holds up to `capacity` tokens and refills at `rate` tokens per ms.
+TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate))
+return {allowed, math.floor(tokens), retry, math.ceil((capacity - tokens) / rate)}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after_ms: int
+    reset_ms: int
+
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(self.remaining, 0)),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_ms / 1000)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(math.ceil(self.retry_after_ms / 1000))
+        return headers
+
+
+class LocalRateLimiter:
+    """
+    In-process version of the Lua limiters, used while Redis is unavailable.
+
+    State is per worker, so with N workers a client may get up to N times its limit;
+    that is still far better than not limiting at all during an outage.
+    """
+
+    def __init__(self, max_keys: int = 10_000):
+        self.max_keys = max_keys
+        self._state: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str, default: list[float]) -> list[float]:
+        state = self._state.get(key)
+        if state is None:
+            state = self._state[key] = default
+            if len(self._state) > self.max_keys:
+                self._state.popitem(last=False)
+        else:
+            self._state.move_to_end(key)
+        return state
+
+    def sliding_window(
+        self, key: str, limit: int, window: int
+    ) -> tuple[int, int, int, int]:
+        now = time.monotonic() * 1000
+        index = now // window
+        with self._lock:
+            # [window index, current count, previous count]
+            state = self._get(key, [index, 0, 0])
+            if state[0] == index - 1:
+                state[:] = [index, 0, state[1]]
+            elif state[0] != index:
+                state[:] = [index, 0, 0]
+            into = now % window
+            reset = math.ceil(window - into)
+            weighted = state[2] * (1 - into / window) + state[1]
+            if weighted + 1 > limit:
+                return 0, 0, reset, reset
+            state[1] += 1
+            return 1, math.floor(limit - weighted - 1), 0, reset
+
+    def token_bucket(
+        self, key: str, capacity: int, rate: float
+    ) -> tuple[int, int, int, int]:
+        now = time.monotonic() * 1000
+        with self._lock:
+            # [tokens, updated]
+            state = self._get(key, [capacity, now])
+            tokens = min(capacity, state[0] + max(0.0, now - state[1]) * rate)
+            allowed, retry = 0, 0
+            if tokens >= 1:
+                tokens -= 1
+                allowed = 1
+            else:
+                retry = math.ceil((1 - tokens) / rate)
+            state[:] = [tokens, now]
+            return (
+                allowed,
+                math.floor(tokens),
+                retry,
+                math.ceil((capacity - tokens) / rate),
+            )
+
+
+local_limiter = LocalRateLimiter()
+
+
+class RateLimiter:
+    """
+    Atomic, Redis-backed rate limiter: one script call (one round trip) per check.
+    """
+
+    def __init__(
+        self,
+        cache: CacheService,
+        max_requests: int,
+        period_seconds: int,
+        algorithm: Algorithm = "sliding_window",
+        burst: int | None = None,
+    ):
+        if algorithm not in ("sliding_window", "token_bucket"):
+            raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+        self.cache = cache
+        self.max_requests = max_requests
+        self.period_ms = period_seconds * 1000
+        self.algorithm = algorithm
+        # Token bucket only: how many requests may arrive back to back
+        self.capacity = burst or max_requests
+
+    async def hit(self, key: str) -> RateLimitResult:
+        """
+        Count one request against `key`. Falls back to a per-worker limiter if Redis is unavailable.
+        """
+        rate = self.max_requests / self.period_ms
+        if self.algorithm == "token_bucket":
+            script = TOKEN_BUCKET
+            args = [self.capacity, repr(rate)]
+            limit = self.capacity
+        else:
+            script = SLIDING_WINDOW
+            args = [self.max_requests, self.period_ms]
+            limit = self.max_requests
+        try:
+            allowed, remaining, retry_after, reset = await self.cache.run_script(
+                script, keys=[key], args=args
+            )
+        except Exception as e:
+            if not isinstance(e, CacheUnavailableError):
+                logger.error(f"Error checking rate limit: {str(e)}")
+            if self.algorithm == "token_bucket":
+                allowed, remaining, retry_after, reset = local_limiter.token_bucket(
+                    key, self.capacity, rate
+                )
+            else:
+                allowed, remaining, retry_after, reset = local_limiter.sliding_window(
+                    key, self.max_requests, self.period_ms
+                )
+        return RateLimitResult(
+            bool(allowed), limit, int(remaining), int(retry_after), int(reset)
+        )
+
+
+def client_identity(request: Request, key_by: KeyBy = "user") -> str:
+    """
+    Identify the caller for rate limiting. Unauthenticated requests fall back to the client IP,
+    which uvicorn takes from X-Forwarded-For when the proxy is in FORWARDED_ALLOW_IPS.
+    Args:
+        request: Incoming request
+        key_by: "user" (JWT subject), "token" (hash of the bearer token) or "ip"
+    Returns:
+        str: A stable, Redis-safe identity such as "user:<id>" or "ip:<addr>"
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if key_by != "ip" and scheme.lower() == "bearer" and token:
+        if key_by == "token":
+            return f"token:{hashlib.sha256(token.encode()).hexdigest()[:32]}"
+        try:
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+            )
+            return f"user:{payload['sub']}"
+        except (InvalidTokenError, KeyError):
+            pass
+    host = request.client.host if request.client else "unknown"
+    return f"ip:{host}"
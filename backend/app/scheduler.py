@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import Iterable
+from datetime import datetime
+
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import metrics
+from app.cache import cache_service
+from app.core.config import settings
+from app.core.db import async_engine
+from app.metrics import Histogram
+from app.models import Draft
+from app.outbox import OutboxRelay, enqueue_tweet
+from app.twitter import twitter_client
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds between a draft's scheduled_time and its tweet being queued
+LAG_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 900.0, 3600.0)
+
+
+class Scheduler:
+    """
+    Queues drafts whose scheduled_time has passed for the outbox relay to publish.
+
+    Due drafts are claimed with FOR UPDATE SKIP LOCKED, so any number of scheduler
+    processes can share the queue without queueing a draft twice. Each claimed draft
+    is queued with enqueue_tweet in the claiming transaction; Twitter is never called
+    while the row locks are held. A draft that cannot be queued is retried with
+    exponential backoff instead of on every poll.
+    """
+
+    def __init__(self, batch_size: int, poll_interval: float):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lag = Histogram(buckets=LAG_BUCKETS)
+        self.queued = 0
+        self.failed = 0
+        self.last_poll = 0.0
+        # Draft id -> (failures so far, monotonic time it may be retried)
+        self._backoff: dict[uuid.UUID, tuple[int, float]] = {}
+
+    def _skipped(self) -> list[uuid.UUID]:
+        now = time.monotonic()
+        return [id for id, (_, retry_at) in self._backoff.items() if retry_at > now]
+
+    def _fail(self, draft: Draft, detail: object) -> None:
+        self.failed += 1
+        failures = self._backoff.get(draft.id, (0, 0.0))[0] + 1
+        delay = min(
+            self.poll_interval * 2**failures, settings.SCHEDULER_MAX_RETRY_DELAY
+        )
+        self._backoff[draft.id] = (failures, time.monotonic() + delay)
+        logger.error(f"Error queueing scheduled draft {draft.id}: {detail}")
+
+    def _queue(self, session: AsyncSession, draft: Draft) -> None:
+        if len(draft.content) > 280:
+            self._fail(draft, "Content exceeds the maximum length of 280 characters")
+            return
+        enqueue_tweet(session, draft)
+        self.queued += 1
+        self._backoff.pop(draft.id, None)
+        self.lag.observe(
+            max((datetime.now() - draft.scheduled_time).total_seconds(), 0.0)
+        )
+
+    async def run_once(self) -> int:
+        """
+        Claim and queue one batch of due drafts.
+        Returns:
+            int: Number of drafts claimed, so the caller can poll again immediately when full
+        """
+        self.last_poll = time.time()
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            statement = (
+                select(Draft)
+                .where(
+                    # Spelled like the partial index predicate, NOT is_published
+                    ~col(Draft.is_published),
+                    col(Draft.scheduled_time) <= datetime.now(),
+                )
+                .order_by(Draft.scheduled_time)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            skipped = self._skipped()
+            if skipped:
+                statement = statement.where(col(Draft.id).notin_(skipped))
+            drafts = (await session.exec(statement)).all()
+            for draft in drafts:
+                self._queue(session, draft)
+            await session.commit()
+        return len(drafts)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Error polling scheduled drafts: {str(e)}")
+                claimed = 0
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def collect(self) -> Iterable[str]:
+        """
+        Prometheus exposition lines for this scheduler process.
+        """
+        yield from metrics.sample_lines(
+            "scheduler_queued_total",
+            "counter",
+            "Scheduled drafts queued for publishing",
+            [({}, self.queued)],
+        )
+        yield from metrics.sample_lines(
+            "scheduler_failed_total",
+            "counter",
+            "Scheduled drafts that could not be queued",
+            [({}, self.failed)],
+        )
+        yield from metrics.sample_lines(
+            "scheduler_last_poll_timestamp_seconds",
+            "gauge",
+            "Unix time of the last poll",
+            [({}, self.last_poll)],
+        )
+        yield from metrics.histogram_lines(
+            "scheduler_queue_lag_seconds",
+            "How late scheduled drafts were queued",
+            [({}, self.lag)],
+        )
+
+
+async def serve_metrics(port: int) -> None:
+    """
+    Minimal HTTP listener answering every request with the Prometheus text exposition.
+    """
+
+    async def handle(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = metrics.render().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            ConnectionError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, port=port)
+    async with server:
+        await server.serve_forever()
+
+
+async def run() -> None:
+    scheduler = Scheduler(
+        batch_size=settings.SCHEDULER_BATCH_SIZE,
+        poll_interval=settings.SCHEDULER_POLL_INTERVAL,
+    )
+    relay = OutboxRelay(
+        batch_size=settings.OUTBOX_BATCH_SIZE,
+        concurrency=settings.OUTBOX_CONCURRENCY,
+        poll_interval=settings.OUTBOX_POLL_INTERVAL,
+    )
+    metrics.register_collector(scheduler.collect)
+    metrics.register_collector(relay.collect)
+    tasks = [asyncio.create_task(scheduler.run()), asyncio.create_task(relay.run())]
+    if settings.SCHEDULER_METRICS_PORT:
+        tasks.append(
+            asyncio.create_task(serve_metrics(settings.SCHEDULER_METRICS_PORT))
+        )
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        await twitter_client.close()
+        await cache_service.close()
+        await async_engine.dispose()
+
+
+def main() -> None:
+    logger.info("Starting scheduled publishing and tweet outbox worker")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
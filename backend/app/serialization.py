@@ -0,0 +1,149 @@
+import zlib
+from typing import Any, Protocol
+
+import pydantic_core
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional speedup
+    msgpack = None
+
+
+# Every payload starts with one header byte: the codec id, with the high bit set
+# when the body is zlib-compressed. Unknown headers are read as legacy plain JSON.
+COMPRESSED = 0x80
+
+
+class Codec(Protocol):
+    id: int
+    name: str
+    # Whether the encoded body is valid JSON that can be sent to clients as-is
+    is_json: bool
+
+    def dumps(self, obj: Any) -> bytes: ...
+
+    def loads(self, data: bytes) -> Any: ...
+
+
+class JsonCodec:
+    """
+    JSON via pydantic-core: handles models, UUIDs and datetimes natively.
+    """
+
+    id = 1
+    name = "json"
+    is_json = True
+
+    def dumps(self, obj: Any) -> bytes:
+        return pydantic_core.to_json(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return pydantic_core.from_json(data)
+
+
+class OrjsonCodec:
+    id = 2
+    name = "orjson"
+    is_json = True
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, default=pydantic_core.to_jsonable_python)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackCodec:
+    id = 3
+    name = "msgpack"
+    is_json = False
+
+    def dumps(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, default=pydantic_core.to_jsonable_python)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data)
+
+
+codecs: dict[int, Codec] = {JsonCodec.id: JsonCodec()}
+if orjson is not None:
+    codecs[OrjsonCodec.id] = OrjsonCodec()
+if msgpack is not None:
+    codecs[MsgpackCodec.id] = MsgpackCodec()
+
+
+def get_codec(name: str) -> Codec:
+    """
+    Resolve a codec by name, falling back to JSON when its library is missing.
+    """
+    for codec in codecs.values():
+        if codec.name == name:
+            return codec
+    return codecs[JsonCodec.id]
+
+
+default_codec = get_codec(settings.CACHE_CODEC)
+
+
+def encode(
+    obj: Any,
+    codec: Codec | None = None,
+    compress_threshold: int | None = None,
+) -> bytes:
+    """
+    Encode a value into a header-prefixed payload.
+    Args:
+        obj: Value to encode; Pydantic models are dumped in JSON mode.
+        codec: Codec to use, defaults to the CACHE_CODEC setting.
+        compress_threshold: Bodies larger than this many bytes are zlib-compressed; 0 disables.
+    Returns:
+        bytes: Header byte followed by the encoded body.
+    """
+    codec = codec or default_codec
+    if compress_threshold is None:
+        compress_threshold = settings.CACHE_COMPRESS_THRESHOLD
+    body = codec.dumps(obj)
+    header = codec.id
+    if compress_threshold and len(body) > compress_threshold:
+        body = zlib.compress(body, 1)
+        header |= COMPRESSED
+    return bytes((header,)) + body
+
+
+def _split(data: bytes) -> tuple[Codec | None, bytes]:
+    header = data[0] if data else 0
+    codec = codecs.get(header & ~COMPRESSED)
+    if codec is None:
+        # Written before payloads carried a header
+        return None, data
+    body = data[1:]
+    if header & COMPRESSED:
+        body = zlib.decompress(body)
+    return codec, body
+
+
+def decode(data: bytes) -> Any:
+    """
+    Decode a payload produced by `encode`, or a legacy plain JSON value.
+    """
+    codec, body = _split(data)
+    if codec is None:
+        return pydantic_core.from_json(body)
+    return codec.loads(body)
+
+
+def to_json_bytes(data: bytes) -> bytes:
+    """
+    Turn a payload into a JSON body, skipping the parse/re-encode step for JSON codecs.
+    """
+    codec, body = _split(data)
+    if codec is None or codec.is_json:
+        return body
+    return pydantic_core.to_json(codec.loads(body))
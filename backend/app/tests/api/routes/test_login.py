@@ -1,11 +1,20 @@
+import asyncio
+import uuid
 from unittest.mock import patch
 
+import jwt
+from fakeredis import FakeAsyncRedis
 from fastapi.testclient import TestClient
 from sqlmodel import Session, select
 
+from app.api.routes.login import social
+from app.cache import CacheService
+from app.core import security
 from app.core.config import settings
-from app.core.security import verify_password
-from app.models import User
+from app.core.security import UNUSABLE_PASSWORD, verify_password
+from app.models import Social, User
+from app.tests.utils.session import FakeSession
+from app.tests.utils.utils import random_email
 from app.utils import generate_password_reset_token
 
 
@@ -102,3 +111,46 @@ def test_reset_password_invalid_token(
     assert "detail" in response
     assert r.status_code == 400
     assert response["detail"] == "Invalid token"
+
+
+def test_social_account_cannot_log_in_with_a_password(
+    client: TestClient, db: Session
+) -> None:
+    email = random_email()
+    credentials = {"email": email, "firstname": "Ada", "lastname": "Lovelace"}
+    r = client.post(f"{settings.API_V1_STR}/login/social", json=credentials)
+    assert r.status_code == 200
+    user = db.exec(select(User).where(User.email == email)).first()
+    assert user
+    assert user.hashed_password == UNUSABLE_PASSWORD
+
+    for password in ("", UNUSABLE_PASSWORD, "changethis"):
+        r = client.post(
+            f"{settings.API_V1_STR}/login/access-token",
+            data={"username": email, "password": password},
+        )
+        assert r.status_code == 400
+
+
+def token_subject(token: str) -> str:
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM])
+    return payload["sub"]
+
+
+def test_social_login_finds_an_existing_user() -> None:
+    user_id = uuid.uuid4()
+    credentials = Social(email=random_email(), firstname="Ada", lastname="Lovelace")
+    cache = CacheService(FakeAsyncRedis())
+
+    session = FakeSession([user_id])
+    token = asyncio.run(social(credentials, session, cache))  # type: ignore[arg-type]
+    assert token_subject(token.access_token) == str(user_id)
+    assert session.added == []
+    assert session.params == [{"email_1": credentials.email}]
+
+    # The next login resolves the email from the cache alone
+    session = FakeSession()
+    token = asyncio.run(social(credentials, session, cache))  # type: ignore[arg-type]
+    assert token_subject(token.access_token) == str(user_id)
+    assert session.statements == []
+    assert session.added == []
@@ -0,0 +1,100 @@
+import asyncio
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app import crud
+from app.api.routes.twitter import pick_random_unpublished_draft
+from app.core.config import settings
+from app.models import Draft, TweetOutbox, UserPublic
+from app.tests.utils.draft import create_random_draft
+from app.tests.utils.session import FakeSession
+
+
+def test_bulk_post_tweets_queues_each_draft(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    superuser = crud.get_user_by_email(session=db, email=settings.FIRST_SUPERUSER)
+    assert superuser
+    draft = create_random_draft(db, user_id=superuser.id)
+    published = create_random_draft(db, user_id=superuser.id, is_published=True)
+    missing = uuid.uuid4()
+    response = client.post(
+        f"{settings.API_V1_STR}/twitter/bulk",
+        headers=superuser_token_headers,
+        json={"ids": [str(draft.id), str(published.id), str(missing), str(draft.id)]},
+    )
+    assert response.status_code == 202
+    content = response.json()
+    assert content["queued"] == 1
+    assert content["failed"] == 2
+    results = {result["id"]: result for result in content["results"]}
+    assert len(results) == 3
+    assert results[str(published.id)]["status"] == "already_published"
+    assert results[str(missing)]["status"] == "not_found"
+    queued = results[str(draft.id)]
+    assert queued["status"] == "queued"
+
+    # Queued only: the outbox relay delivers the tweet
+    entry = db.exec(
+        select(TweetOutbox).where(TweetOutbox.id == uuid.UUID(queued["outbox_id"]))
+    ).one()
+    assert entry.draft_id == draft.id
+    assert entry.status == "pending"
+    db.refresh(draft)
+    assert draft.is_published
+
+
+def test_bulk_post_tweets_reports_drafts_of_other_users(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    draft = create_random_draft(db)
+    response = client.post(
+        f"{settings.API_V1_STR}/twitter/bulk",
+        headers=normal_user_token_headers,
+        json={"ids": [str(draft.id)]},
+    )
+    assert response.status_code == 202
+    content = response.json()
+    assert content["queued"] == 0
+    assert content["results"] == [
+        {"id": str(draft.id), "status": "forbidden", "outbox_id": None, "error": None}
+    ]
+    db.refresh(draft)
+    assert not draft.is_published
+
+
+def make_user_public(is_superuser: bool = False) -> UserPublic:
+    return UserPublic(
+        id=uuid.uuid4(), email="user@example.com", is_superuser=is_superuser
+    )
+
+
+def test_random_draft_seeks_from_a_random_id() -> None:
+    user = make_user_public()
+    draft = Draft(title="t", content="c", user_id=user.id)
+    session = FakeSession([draft])
+    picked = asyncio.run(pick_random_unpublished_draft(session, user))  # type: ignore[arg-type]
+    assert picked is draft
+    (seek,) = session.statements
+    assert "WHERE NOT drafts.is_published AND drafts.user_id = " in seek
+    assert "AND drafts.id >= " in seek
+    assert seek.endswith(
+        "ORDER BY drafts.id \n LIMIT %(param_1)s FOR UPDATE SKIP LOCKED"
+    )
+
+
+def test_random_draft_wraps_around_past_the_highest_id() -> None:
+    # No draft at or after the pivot: the pick wraps around to the lowest id
+    user = make_user_public(is_superuser=True)
+    draft = Draft(title="t", content="c", user_id=user.id)
+    session = FakeSession([], [draft])
+    picked = asyncio.run(pick_random_unpublished_draft(session, user))  # type: ignore[arg-type]
+    assert picked is draft
+    seek, wrap = session.statements
+    assert "drafts.id >= " in seek
+    assert "WHERE NOT drafts.is_published ORDER BY drafts.id" in wrap
+    assert wrap.endswith(
+        "ORDER BY drafts.id \n LIMIT %(param_1)s FOR UPDATE SKIP LOCKED"
+    )
@@ -2,9 +2,10 @@ import uuid
 from unittest.mock import patch
 
 from fastapi.testclient import TestClient
-from sqlmodel import Session, select
+from sqlmodel import Session, func, select
 
 from app import crud
+from app.api.routes.users import read_users
 from app.core.config import settings
 from app.core.security import verify_password
 from app.models import User, UserCreate
@@ -168,6 +169,46 @@ def test_retrieve_users(
         assert "email" in item
 
 
+def test_retrieve_users_exact_count_is_opt_in(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/users/?count=exact", headers=superuser_token_headers
+    )
+    assert r.json()["count"] == db.exec(select(func.count()).select_from(User)).one()
+    r = client.get(
+        f"{settings.API_V1_STR}/users/?count=none", headers=superuser_token_headers
+    )
+    assert r.json()["count"] is None
+
+
+class EstimateSession:
+    """
+    Answers the planner estimate query with `estimate`, and every other query with no rows.
+    """
+
+    def __init__(self, estimate: int):
+        self.estimate = estimate
+        self.statements: list[str] = []
+
+    def exec(self, statement: object, params: dict | None = None) -> "EstimateSession":
+        self.statements.append(str(statement))
+        return self
+
+    def scalar(self) -> int:
+        return self.estimate
+
+    def all(self) -> list[User]:
+        return []
+
+
+def test_retrieve_users_counts_by_estimate_by_default() -> None:
+    session = EstimateSession(1234)
+    users = read_users(session)  # type: ignore[arg-type]
+    assert users.count == 1234
+    assert "reltuples" in session.statements[0]
+
+
 def test_update_user_me(
     client: TestClient, normal_user_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import time
+
+from fakeredis import FakeAsyncRedis, FakeAsyncRedisConnection, FakeServer
+from redis.asyncio import ConnectionPool
+
+from app.cache import (
+    CacheService,
+    CacheStats,
+    CacheUnavailableError,
+    CircuitBreaker,
+    GuardedRedis,
+    LocalCache,
+    LocalLock,
+)
+from app.core.config import settings
+
+
+def guarded(server: FakeServer, breaker: CircuitBreaker) -> GuardedRedis:
+    pool = ConnectionPool(connection_class=FakeAsyncRedisConnection, server=server)
+    return GuardedRedis(connection_pool=pool, breaker=breaker)
+
+
+def test_invalidate_deletes_every_tagged_key() -> None:
+    async def main() -> None:
+        redis = FakeAsyncRedis()
+        cache = CacheService(redis)
+        await cache.set("product:1", "a", expire=60, tags=["product"])
+        await cache.set("product:2", "b", expire=None, tags=["product"])
+        await cache.set("other:1", "c", expire=60)
+        assert await cache.invalidate("product")
+        assert await cache.get("product:1") is None
+        assert await cache.get("product:2") is None
+        assert await cache.get("other:1") == "c"
+        assert await redis.keys("tags:*") == []
+
+    asyncio.run(main())
+
+
+def test_invalidate_spares_untagged_keys_sharing_the_tag_as_prefix() -> None:
+    async def main() -> None:
+        local = LocalCache(
+            max_size=10,
+            ttl=60,
+            prefixes=["product:"],
+            max_item_bytes=1024,
+            stats=CacheStats(),
+        )
+        cache = CacheService(FakeAsyncRedis(), local=local)
+        await cache.set("product:1", "a", expire=60, tags=["product"])
+        await cache.set("product:2", "b", expire=60)
+        sent = cache.stats.invalidations_sent
+        assert await cache.invalidate("product")
+        assert local.get("product:1") is None
+        assert local.get("product:2") == b"b"
+        assert await cache.get("product:2") == "b"
+        # One invalidation for the tag's members, none by prefix
+        assert cache.stats.invalidations_sent == sent + 1
+
+    asyncio.run(main())
+
+
+def test_tagged_set_publishes_one_invalidation() -> None:
+    async def main() -> None:
+        local = LocalCache(
+            max_size=10,
+            ttl=60,
+            prefixes=["product:"],
+            max_item_bytes=1024,
+            stats=CacheStats(),
+        )
+        cache = CacheService(FakeAsyncRedis(), local=local)
+        await cache.set("product:1", "a", expire=60, tags=["product"])
+        assert cache.stats.invalidations_sent == 1
+        assert local.get("product:1") == b"a"
+
+    asyncio.run(main())
+
+
+def test_tag_index_sheds_expired_members() -> None:
+    async def main() -> None:
+        redis = FakeAsyncRedis()
+        cache = CacheService(redis)
+        await cache.set("product:1", "a", expire=60, tags=["product"])
+        # Backdate the first member as if its key had expired long ago
+        await redis.zadd("tags:product", {"product:1": time.time() - 1})
+        await cache.set("product:2", "b", expire=60, tags=["product"])
+        assert await redis.zrange("tags:product", 0, -1) == [b"product:2"]
+
+    asyncio.run(main())
+
+
+def test_tag_index_outlives_its_longest_member() -> None:
+    async def main() -> None:
+        redis = FakeAsyncRedis()
+        cache = CacheService(redis)
+        await cache.set("product:1", "a", expire=600, tags=["product"])
+        await cache.set("product:2", "b", expire=60, tags=["product"])
+        assert 590 < await redis.ttl("tags:product") <= 600
+        await cache.set("product:3", "c", expire=None, tags=["product"])
+        assert await redis.ttl("tags:product") == -1
+
+    asyncio.run(main())
+
+
+def test_breaker_opens_after_consecutive_failures() -> None:
+    breaker = CircuitBreaker(failure_threshold=3)
+    closed: list[bool] = []
+    breaker.on_close.append(lambda: closed.append(True))
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.is_open
+    breaker.record_failure()
+    assert breaker.is_open
+    assert breaker.opens == 1
+    breaker.close()
+    assert not breaker.is_open
+    assert breaker.failures == 0
+    assert closed == [True]
+
+
+def test_open_circuit_fails_fast_and_serves_fallbacks() -> None:
+    async def main() -> None:
+        server = FakeServer()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.01)
+        cache = CacheService(guarded(server, breaker), breaker=breaker)
+        server.connected = False
+        assert not await cache.set("user:1", "a", expire=60)
+        assert await cache.get("user:1") is None
+        assert breaker.is_open
+
+        with_redis_down = await cache.incr("counter")
+        assert with_redis_down == 0
+        # Writes made while open land in the per-worker fallback
+        assert not await cache.set("user:1", "b", expire=60)
+        assert await cache.get("user:1") == "b"
+        try:
+            await cache.redis.get("user:1")
+        except CacheUnavailableError:
+            pass
+        else:
+            raise AssertionError("open circuit reached Redis")
+
+        lock = await cache.acquire_lock("lock:job", timeout=5)
+        assert isinstance(lock, LocalLock)
+        assert await cache.acquire_lock("lock:job", timeout=5) is None
+        await cache.release_lock(lock)
+        assert await cache.acquire_lock("lock:job", timeout=5) is not None
+
+        # The probe closes the circuit once Redis answers, and the fallback is dropped
+        server.connected = True
+        for _ in range(100):
+            if not breaker.is_open:
+                break
+            await asyncio.sleep(0.01)
+        assert not breaker.is_open
+        assert await cache.get("user:1") is None
+        assert await cache.set("user:1", "c", expire=60)
+        assert await cache.get("user:1") == "c"
+        breaker.stop()
+
+    asyncio.run(main())
+
+
+def test_listener_uses_its_own_client_and_drops_peer_keys() -> None:
+    channel = settings.CACHE_INVALIDATION_CHANNEL
+
+    async def main() -> None:
+        # Only the listener's client can reach the server the peer publishes to
+        pubsub_server = FakeServer()
+        local = LocalCache(
+            max_size=10,
+            ttl=60,
+            prefixes=["user:"],
+            max_item_bytes=1024,
+            stats=CacheStats(),
+        )
+        cache = CacheService(
+            FakeAsyncRedis(),
+            local=local,
+            pubsub_redis=FakeAsyncRedis(server=pubsub_server),
+        )
+        publisher = FakeAsyncRedis(server=pubsub_server)
+        await cache.connect()
+        for _ in range(100):
+            if await publisher.pubsub_numsub(channel) == [(channel.encode(), 1)]:
+                break
+            await asyncio.sleep(0.01)
+        local.set("user:1", b"a", 60)
+        await publisher.publish(
+            channel, json.dumps({"origin": "peer", "keys": ["user:1"]})
+        )
+        for _ in range(100):
+            if local.get("user:1") is None:
+                break
+            await asyncio.sleep(0.01)
+        assert local.get("user:1") is None
+        assert cache.stats.invalidations_received == 1
+        await cache.close()
+
+    asyncio.run(main())
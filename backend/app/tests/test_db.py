@@ -0,0 +1,38 @@
+import asyncio
+import threading
+
+import pytest
+from sqlmodel import create_engine
+
+from app.core import db
+from app.core.db import Replica, pick_replica, refresh_stale_replicas
+
+
+def test_stale_replicas_are_checked_without_blocking(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    replica = Replica(create_engine("sqlite://"))
+    monkeypatch.setattr(db, "replicas", [replica])
+    release = threading.Event()
+    checks: list[bool] = []
+
+    def refresh_lag() -> float:
+        checks.append(True)
+        release.wait()
+        replica.lag = 0.0
+        return replica.lag
+
+    monkeypatch.setattr(replica, "refresh_lag", refresh_lag)
+
+    async def main() -> None:
+        refresh_stale_replicas()
+        # The caller is not held up, and an unmeasured replica is not used
+        assert pick_replica() is None
+        assert not replica.stale
+        refresh_stale_replicas()
+        release.set()
+        await asyncio.gather(*db._lag_checks)
+        assert pick_replica() is replica
+
+    asyncio.run(main())
+    assert checks == [True]
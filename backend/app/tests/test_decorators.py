@@ -0,0 +1,228 @@
+import asyncio
+import inspect
+import uuid
+from datetime import datetime
+
+import pytest
+from fakeredis import FakeAsyncRedis
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import decorators
+from app.cache import CacheService
+from app.decorators import _jittered, build_cache_key, cache, limit
+from app.models import DraftCreate, User, UserPublic
+
+
+def endpoint(
+    session: Session,
+    current_user: User,
+    q: str,
+    skip: int = 0,
+    body: DraftCreate | None = None,
+    when: datetime | None = None,
+) -> None:
+    pass
+
+
+signature = inspect.signature(endpoint)
+
+
+def make_user() -> User:
+    return User(id=uuid.uuid4(), email="user@example.com", hashed_password="x")
+
+
+def test_positional_and_keyword_calls_share_a_key() -> None:
+    user = make_user()
+    # Never used, so it never connects
+    session = Session()
+    positional = build_cache_key(signature, (session, user, "q"), {}, prefix="endpoint")
+    keyword = build_cache_key(
+        signature,
+        (),
+        {"current_user": user, "q": "q", "skip": 0, "session": session},
+        prefix="endpoint",
+    )
+    assert positional == keyword
+
+
+def test_async_sessions_are_left_out_of_the_key() -> None:
+    async def async_endpoint(session: AsyncSession, q: str) -> None:
+        pass
+
+    async_signature = inspect.signature(async_endpoint)
+    first = build_cache_key(async_signature, (AsyncSession(), "q"), {}, prefix="e")
+    second = build_cache_key(async_signature, (AsyncSession(), "q"), {}, prefix="e")
+    assert first == second
+
+
+def test_key_is_stable_for_models_and_datetimes() -> None:
+    user = make_user()
+    kwargs = {"body": DraftCreate(content="hello"), "when": datetime(2024, 1, 1)}
+    first = build_cache_key(signature, (None, user, "q"), kwargs, prefix="endpoint")
+    second = build_cache_key(
+        signature, (None, user, "q"), dict(reversed(kwargs.items())), prefix="endpoint"
+    )
+    assert first == second
+    assert first.startswith("endpoint:")
+
+
+def test_users_never_share_a_key() -> None:
+    first = build_cache_key(
+        signature,
+        (None, make_user(), "q"),
+        {},
+        prefix="endpoint",
+        key_params=["q"],
+        per_user=True,
+    )
+    second = build_cache_key(
+        signature,
+        (None, make_user(), "q"),
+        {},
+        prefix="endpoint",
+        key_params=["q"],
+        per_user=True,
+    )
+    assert first != second
+
+
+def test_per_user_accepts_the_cached_user_projection() -> None:
+    user = make_user()
+    projected = build_cache_key(
+        signature,
+        (None, UserPublic.model_validate(user), "q"),
+        {},
+        prefix="endpoint",
+        key_params=["q"],
+        per_user=True,
+    )
+    full = build_cache_key(
+        signature,
+        (None, user, "q"),
+        {},
+        prefix="endpoint",
+        key_params=["q"],
+        per_user=True,
+    )
+    assert projected == full
+
+
+def test_unkeyable_argument_is_rejected() -> None:
+    with pytest.raises(TypeError):
+        build_cache_key(signature, (None, make_user(), object()), {}, prefix="endpoint")
+
+
+def test_limit_lets_fastapi_inject_request_and_response() -> None:
+    @limit("5/minute")
+    async def handler(q: str, **kwargs: str) -> None:
+        pass
+
+    params = list(inspect.signature(handler).parameters.values())
+    assert [p.name for p in params] == [
+        "q",
+        "rate_limit_request",
+        "rate_limit_response",
+        "kwargs",
+    ]
+    assert params[1].annotation is Request
+    assert params[2].annotation is Response
+    assert params[1].kind is inspect.Parameter.KEYWORD_ONLY
+
+
+def test_limit_rejects_bad_rate_strings() -> None:
+    with pytest.raises(ValueError):
+        limit("five per minute")
+    with pytest.raises(ValueError):
+        limit("5/fortnight")
+
+
+def use_cache(monkeypatch: pytest.MonkeyPatch) -> CacheService:
+    cache_service = CacheService(FakeAsyncRedis())
+
+    async def get_cache_service() -> CacheService:
+        return cache_service
+
+    monkeypatch.setattr(decorators, "get_cache_service", get_cache_service)
+    return cache_service
+
+
+def test_limit_sets_headers_and_rejects_over_the_limit(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    use_cache(monkeypatch)
+    app = FastAPI()
+
+    @app.get("/limited")
+    @limit("2/minutes")
+    async def limited(q: str = "") -> dict[str, str]:
+        return {"q": q}
+
+    client = TestClient(app)
+    first = client.get("/limited", params={"q": "a"})
+    assert first.status_code == 200
+    assert first.json() == {"q": "a"}
+    assert first.headers["X-RateLimit-Limit"] == "2"
+    assert first.headers["X-RateLimit-Remaining"] == "1"
+    assert client.get("/limited").headers["X-RateLimit-Remaining"] == "0"
+    denied = client.get("/limited")
+    assert denied.status_code == 429
+    assert int(denied.headers["Retry-After"]) > 0
+
+
+def test_single_flight_computes_a_miss_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    use_cache(monkeypatch)
+    calls: list[str] = []
+
+    @cache(expire=60, single_flight=True)
+    async def compute(q: str) -> dict[str, str]:
+        calls.append(q)
+        await asyncio.sleep(0.1)
+        return {"q": q}
+
+    async def main() -> list[dict[str, str]]:
+        return await asyncio.gather(*(compute("a") for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"q": "a"}] * 5
+    assert calls == ["a"]
+
+
+def test_stale_hit_is_served_while_one_caller_recomputes(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    cache_service = use_cache(monkeypatch)
+    version = 1
+    calls = 0
+
+    @cache(expire=60, stale_ttl=60)
+    async def compute() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return version
+
+    async def main() -> None:
+        nonlocal version
+        assert await compute() == 1
+        # Past `expire`, within `stale_ttl`
+        fresh = [key async for key in cache_service.redis.scan_iter("*:fresh")]
+        assert len(fresh) == 1
+        await cache_service.redis.delete(*fresh)
+        version = 2
+        results = await asyncio.gather(*(compute() for _ in range(5)))
+        assert sorted(results) == [1, 1, 1, 1, 2]
+        assert calls == 2
+        assert await compute() == 2
+        assert calls == 2
+
+    asyncio.run(main())
+
+
+def test_jitter_stretches_ttls_by_up_to_the_fraction() -> None:
+    ttls = {_jittered(100, 0.1) for _ in range(1000)}
+    assert min(ttls) >= 100
+    assert max(ttls) <= 110
+    assert len(ttls) > 1
+    assert _jittered(100, 0.0) == 100
@@ -0,0 +1,179 @@
+import asyncio
+import uuid
+from datetime import timedelta
+
+import pytest
+from fakeredis import FakeAsyncRedis
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.api import deps
+from app.api.deps import (
+    cache_user,
+    get_current_user,
+    get_read_db,
+    get_user_id_by_email,
+    pin_reads_to_primary,
+    read_pin_key,
+    uncache_user,
+    user_cache_key,
+    user_email_cache_key,
+)
+from app.cache import CacheService
+from app.core.security import create_access_token
+from app.models import User, UserPublic
+from app.tests.utils.session import FakeSession
+
+
+class Users(FakeSession):
+    """
+    A session holding `users`, counting the primary key lookups made against it.
+    """
+
+    def __init__(self, *users: User):
+        super().__init__()
+        self.users = {user.id: user for user in users}
+        self.gets = 0
+
+    async def get(self, model: type[User], user_id: uuid.UUID) -> User | None:
+        self.gets += 1
+        return self.users.get(user_id)
+
+
+def make_user(**kwargs: object) -> User:
+    return User(email="user@example.com", hashed_password="x", **kwargs)
+
+
+def current_user(session: Users, cache: CacheService, user: User) -> UserPublic:
+    token = create_access_token(user.id, expires_delta=timedelta(minutes=5))
+    return asyncio.run(get_current_user(session, token, cache))
+
+
+def test_cached_user_skips_the_database() -> None:
+    user = make_user()
+    session, cache = Users(user), CacheService(FakeAsyncRedis())
+    assert current_user(session, cache, user).id == user.id
+    assert session.gets == 1
+    assert current_user(session, cache, user).email == user.email
+    assert session.gets == 1
+    # The cached projection never carries the password hash
+    cached = asyncio.run(cache.get(user_cache_key(user.id)))
+    assert "hashed_password" not in cached
+
+
+def test_update_refreshes_the_cached_user() -> None:
+    user = make_user()
+    session, cache = Users(user), CacheService(FakeAsyncRedis())
+    current_user(session, cache, user)
+    user.first_name = "Ada"
+    asyncio.run(cache_user(cache, user))
+    assert current_user(session, cache, user).first_name == "Ada"
+    assert session.gets == 1
+
+
+def test_deactivated_user_is_rejected_from_the_cache() -> None:
+    user = make_user()
+    session, cache = Users(user), CacheService(FakeAsyncRedis())
+    current_user(session, cache, user)
+    user.is_active = False
+    asyncio.run(cache_user(cache, user))
+    with pytest.raises(HTTPException) as raised:
+        current_user(session, cache, user)
+    assert raised.value.status_code == 400
+    assert session.gets == 1
+
+
+def test_deleted_user_is_evicted() -> None:
+    user = make_user()
+    session, cache = Users(user), CacheService(FakeAsyncRedis())
+    current_user(session, cache, user)
+    asyncio.run(get_user_id_by_email(FakeSession([user.id]), cache, user.email))
+    del session.users[user.id]
+    asyncio.run(uncache_user(cache, user))
+    assert asyncio.run(cache.get(user_email_cache_key(user.email))) is None
+    with pytest.raises(HTTPException) as raised:
+        current_user(session, cache, user)
+    assert raised.value.status_code == 404
+    assert session.gets == 2
+
+
+def test_invalid_token_is_rejected() -> None:
+    cache = CacheService(FakeAsyncRedis())
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(get_current_user(Users(), "not-a-token", cache))
+    assert raised.value.status_code == 403
+
+
+def test_email_lookup_is_cached() -> None:
+    user_id = uuid.uuid4()
+    cache = CacheService(FakeAsyncRedis())
+    session = FakeSession([user_id])
+    email = "user@example.com"
+    assert asyncio.run(get_user_id_by_email(session, cache, email)) == user_id
+    assert asyncio.run(get_user_id_by_email(session, cache, email)) == user_id
+    assert len(session.statements) == 1
+    assert session.params[0] == {"email_1": email}
+    # Unknown emails are not cached
+    unknown = FakeSession()
+    assert asyncio.run(get_user_id_by_email(unknown, cache, "x@example.com")) is None
+    assert asyncio.run(cache.get(user_email_cache_key("x@example.com"))) is None
+
+
+def make_request(token: str | None = None, client: str = "10.0.0.1") -> Request:
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "headers": headers, "client": (client, 1234)})
+
+
+class FakeBind:
+    def __init__(self, bind: object):
+        self.bind = bind
+
+    def __enter__(self) -> "FakeBind":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        pass
+
+
+def read_bind(
+    monkeypatch: pytest.MonkeyPatch, request: Request, cache: CacheService
+) -> str:
+    replica = type("Replica", (), {"engine": object()})()
+    monkeypatch.setattr(deps, "replicas", [replica])
+    monkeypatch.setattr(deps, "refresh_stale_replicas", lambda: None)
+    monkeypatch.setattr(deps, "pick_replica", lambda: replica)
+    monkeypatch.setattr(deps, "Session", lambda bind: FakeBind(bind))
+
+    async def main() -> object:
+        generator = get_read_db(request, cache)
+        bind = (await anext(generator)).bind
+        await generator.aclose()
+        return bind
+
+    bind = asyncio.run(main())
+    return "primary" if bind is deps.engine else "replica"
+
+
+def test_writes_pin_the_user_reads_to_the_primary(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    user_id = uuid.uuid4()
+    token = create_access_token(user_id, expires_delta=timedelta(minutes=5))
+    cache = CacheService(FakeAsyncRedis())
+    assert read_bind(monkeypatch, make_request(token), cache) == "replica"
+
+    asyncio.run(pin_reads_to_primary(make_request(token), cache))
+    assert asyncio.run(cache.get(read_pin_key(user_id))) is not None
+    # Keyed on the user, not the address the request came from
+    request = make_request(token, client="10.0.0.2")
+    assert read_bind(monkeypatch, request, cache) == "primary"
+    other = create_access_token(uuid.uuid4(), expires_delta=timedelta(minutes=5))
+    assert read_bind(monkeypatch, make_request(other), cache) == "replica"
+
+
+def test_anonymous_writes_are_not_pinned(monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = CacheService(FakeAsyncRedis())
+    asyncio.run(pin_reads_to_primary(make_request(), cache))
+    asyncio.run(pin_reads_to_primary(make_request("not-a-token"), cache))
+    assert asyncio.run(cache.redis.keys("*")) == []
+    assert read_bind(monkeypatch, make_request(), cache) == "replica"
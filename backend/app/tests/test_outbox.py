@@ -0,0 +1,216 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Any
+
+import pytest
+
+from app import outbox
+from app.core.config import settings
+from app.models import TweetOutbox
+from app.outbox import OutboxRelay
+from app.tests.utils.session import FakeSession
+from app.twitter import TwitterError, TwitterRateLimited
+
+
+class FakeTwitter:
+    def __init__(self, outcome: dict[str, Any] | Exception, session: FakeSession):
+        self.outcome = outcome
+        self.session = session
+        self.calls: list[tuple[str, float | None]] = []
+        self.commits_before_call: list[int] = []
+
+    async def create_tweet(
+        self, text: str, max_wait: float | None = None
+    ) -> dict[str, Any]:
+        self.calls.append((text, max_wait))
+        self.commits_before_call.append(self.session.commits)
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+def make_entry(attempts: int = 0, status: str = "pending") -> TweetOutbox:
+    return TweetOutbox(
+        draft_id=uuid.uuid4(),
+        user_id=uuid.uuid4(),
+        content="hello",
+        status=status,
+        attempts=attempts,
+        created_at=datetime.now() - timedelta(seconds=1),
+    )
+
+
+def run(
+    monkeypatch: pytest.MonkeyPatch,
+    outcome: dict[str, Any] | Exception,
+    entry: TweetOutbox,
+    rowcount: int = 1,
+) -> tuple[OutboxRelay, FakeSession, FakeTwitter]:
+    session = FakeSession([entry], rowcount=rowcount)
+    twitter = FakeTwitter(outcome, session)
+    monkeypatch.setattr(outbox, "AsyncSession", session)
+    monkeypatch.setattr(outbox, "twitter_client", twitter)
+    relay = OutboxRelay(batch_size=10, concurrency=2, poll_interval=1.0)
+    assert asyncio.run(relay.run_once()) == 1
+    assert session.added == [entry]
+    # The claim is committed, releasing its row locks, before Twitter is called
+    assert twitter.commits_before_call == [1]
+    return relay, session, twitter
+
+
+def recorded(session: FakeSession) -> tuple[list[str], list[dict[str, Any]]]:
+    """
+    Statements of the transaction recording the outcome, after the claim's select.
+    """
+    statement, *rest = session.statements[1:]
+    assert statement.startswith("UPDATE tweet_outbox SET")
+    assert statement.endswith(
+        "WHERE tweet_outbox.id = %(id_1)s::UUID AND tweet_outbox.status = %(status_1)s "
+        "AND tweet_outbox.next_attempt_at = %(next_attempt_at_1)s"
+    )
+    return session.statements[1:], session.params[1:]
+
+
+def test_claim_leases_rows_in_its_own_transaction(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    entry = make_entry()
+    _, session, _ = run(monkeypatch, {"data": {"id": "42"}}, entry)
+    claim = session.statements[0]
+    assert "WHERE tweet_outbox.status IN" in claim
+    assert claim.endswith("FOR UPDATE SKIP LOCKED")
+    assert session.params[0]["status_1"] == ["pending", "sending"]
+    # The outcome is fenced on the lease the claim took
+    leased_until = session.params[1]["next_attempt_at_1"]
+    lease = (leased_until - datetime.now()).total_seconds()
+    assert settings.OUTBOX_LEASE - 5 < lease <= settings.OUTBOX_LEASE
+    assert session.params[1]["status_1"] == "sending"
+    assert session.commits == 2
+
+
+def test_delivered_tweet_completes_entry_and_records_tweet(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    entry = make_entry()
+    relay, session, twitter = run(monkeypatch, {"data": {"id": "42"}}, entry)
+    # Never waits on an exhausted rate limit window
+    assert twitter.calls == [("hello", 0)]
+    assert entry.status == "sent"
+    assert entry.twitter_id == "42"
+    assert entry.sent_at is not None
+    assert relay.sent == 1
+    statements, params = recorded(session)
+    assert params[0]["status"] == "sent"
+    assert params[0]["twitter_id"] == "42"
+    (insert,) = statements[1:]
+    assert insert.startswith("INSERT INTO tweets")
+    assert insert.endswith("ON CONFLICT DO NOTHING")
+    assert params[1]["twitter_id"] == "42"
+
+
+def test_accepted_tweet_without_an_id_is_not_recorded(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    entry = make_entry()
+    _, session, _ = run(monkeypatch, {"data": {}}, entry)
+    assert entry.status == "sent"
+    assert entry.twitter_id is None
+    statements, _ = recorded(session)
+    assert len(statements) == 1
+
+
+def test_outcome_is_dropped_once_the_lease_is_lost(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    entry = make_entry()
+    _, session, _ = run(monkeypatch, {"data": {"id": "42"}}, entry, rowcount=0)
+    # Another relay reclaimed the row; it records the delivery instead
+    statements, _ = recorded(session)
+    assert len(statements) == 1
+    assert session.commits == 1
+
+
+DUPLICATE = TwitterError(
+    403, {"detail": "You are not allowed to create a Tweet with duplicate content."}
+)
+
+
+def test_duplicate_completes_a_redelivered_entry(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Claimed while still `sending`: an earlier relay's lease ran out
+    entry = make_entry(status="sending")
+    relay, session, _ = run(monkeypatch, DUPLICATE, entry)
+    assert entry.status == "sent"
+    assert entry.twitter_id is None
+    assert relay.sent == 1
+    assert relay.failed == 0
+    statements, _ = recorded(session)
+    assert len(statements) == 1
+
+
+def test_duplicate_of_an_earlier_tweet_fails_a_new_entry(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    entry = make_entry()
+    relay, session, _ = run(monkeypatch, DUPLICATE, entry)
+    assert entry.status == "failed"
+    assert relay.sent == 0
+    assert relay.failed == 1
+    statements, _ = recorded(session)
+    assert statements[1].startswith("UPDATE drafts SET is_published=")
+
+
+def test_transient_error_is_retried_with_backoff(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    entry = make_entry(attempts=1)
+    relay, session, _ = run(
+        monkeypatch, TwitterError(503, "Service Unavailable"), entry
+    )
+    assert entry.status == "pending"
+    assert entry.attempts == 2
+    assert entry.last_error == "Service Unavailable"
+    # poll_interval * 2**attempts
+    delay = (entry.next_attempt_at - datetime.now()).total_seconds()
+    assert 3 < delay <= 4
+    assert relay.retried == 1
+    statements, params = recorded(session)
+    assert len(statements) == 1
+    assert params[0]["status"] == "pending"
+    assert params[0]["attempts"] == 2
+
+
+def test_rate_limit_defers_without_using_an_attempt(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    entry = make_entry()
+    relay, _, _ = run(monkeypatch, TwitterRateLimited("POST /2/tweets", 120), entry)
+    assert entry.status == "pending"
+    assert entry.attempts == 0
+    delay = (entry.next_attempt_at - datetime.now()).total_seconds()
+    assert 119 < delay <= 120
+    assert relay.retried == 1
+
+
+@pytest.mark.parametrize(
+    "error, attempts",
+    [
+        (TwitterError(400, "Invalid tweet"), 0),
+        (TwitterError(None, "Connection refused"), settings.OUTBOX_MAX_ATTEMPTS - 1),
+    ],
+)
+def test_giving_up_fails_entry_and_unpublishes_draft(
+    monkeypatch: pytest.MonkeyPatch, error: TwitterError, attempts: int
+) -> None:
+    entry = make_entry(attempts=attempts)
+    relay, session, _ = run(monkeypatch, error, entry)
+    assert entry.status == "failed"
+    assert entry.last_error == error.detail
+    assert relay.failed == 1
+    statements, params = recorded(session)
+    (unpublish,) = statements[1:]
+    assert unpublish.startswith("UPDATE drafts SET is_published=")
+    assert params[1]["is_published"] is False
+    assert params[1]["id_1"] == entry.draft_id
@@ -0,0 +1,31 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import decode_cursor, encode_cursor, page
+
+
+def test_cursor_round_trip() -> None:
+    created_at, id = datetime(2024, 1, 1, 12, 30, 15, 123456), uuid.uuid4()
+    assert decode_cursor(encode_cursor(created_at, id)) == (created_at, id)
+
+
+def test_invalid_cursor_is_rejected() -> None:
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor("not-a-cursor")
+    assert exc_info.value.status_code == 400
+
+
+def test_page_trims_look_ahead_row() -> None:
+    class Row:
+        def __init__(self, minute: int) -> None:
+            self.created_at = datetime(2024, 1, 1, 12, minute)
+            self.id = uuid.uuid4()
+
+    rows = [Row(3), Row(2), Row(1)]
+    data, next_cursor = page(rows, limit=2)
+    assert data == rows[:2]
+    assert decode_cursor(next_cursor) == (rows[1].created_at, rows[1].id)
+    assert page(rows, limit=3) == (rows, None)
@@ -0,0 +1,102 @@
+import asyncio
+import uuid
+
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+from starlette.requests import Request
+from starlette.types import Receive, Scope, Send
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from app.cache import CacheService
+from app.ratelimit import RateLimiter, RateLimitResult, client_identity
+
+
+def key() -> str:
+    # The fallback limiter is shared by the whole process
+    return f"rate_limit:test:{uuid.uuid4().hex}"
+
+
+def hits(limiter: RateLimiter, n: int) -> list[RateLimitResult]:
+    async def main() -> list[RateLimitResult]:
+        k = key()
+        return [await limiter.hit(k) for _ in range(n)]
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("algorithm", ["sliding_window", "token_bucket"])
+def test_allows_up_to_the_limit_then_denies(algorithm: str) -> None:
+    limiter = RateLimiter(CacheService(FakeAsyncRedis()), 3, 60, algorithm=algorithm)
+    results = hits(limiter, 4)
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert [r.remaining for r in results] == [2, 1, 0, 0]
+    assert results[-1].retry_after_ms > 0
+
+
+def test_token_bucket_burst_sets_capacity() -> None:
+    limiter = RateLimiter(
+        CacheService(FakeAsyncRedis()), 1, 60, algorithm="token_bucket", burst=5
+    )
+    results = hits(limiter, 6)
+    assert [r.allowed for r in results] == [True] * 5 + [False]
+    assert results[0].limit == 5
+
+
+def test_unknown_algorithm_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        RateLimiter(CacheService(FakeAsyncRedis()), 1, 60, algorithm="leaky")  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize("algorithm", ["sliding_window", "token_bucket"])
+def test_falls_back_to_the_local_limiter_without_redis(algorithm: str) -> None:
+    server = FakeServer()
+    server.connected = False
+    limiter = RateLimiter(
+        CacheService(FakeAsyncRedis(server=server)), 2, 60, algorithm=algorithm
+    )
+    results = hits(limiter, 3)
+    assert [r.allowed for r in results] == [True, True, False]
+
+
+def test_headers() -> None:
+    allowed = RateLimitResult(
+        allowed=True, limit=10, remaining=4, retry_after_ms=0, reset_ms=1500
+    )
+    assert allowed.headers() == {
+        "X-RateLimit-Limit": "10",
+        "X-RateLimit-Remaining": "4",
+        "X-RateLimit-Reset": "2",
+    }
+    denied = RateLimitResult(
+        allowed=False, limit=10, remaining=-1, retry_after_ms=2001, reset_ms=3000
+    )
+    assert denied.headers() == {
+        "X-RateLimit-Limit": "10",
+        "X-RateLimit-Remaining": "0",
+        "X-RateLimit-Reset": "3",
+        "Retry-After": "3",
+    }
+
+
+def test_client_ip_is_the_one_forwarded_by_the_proxy() -> None:
+    # As configured for the backend in docker-compose.yml
+    trusted = "10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"
+    identities = []
+
+    async def app(scope: Scope, _receive: Receive, _send: Send) -> None:
+        identities.append(client_identity(Request(scope)))
+
+    async def call(client: str, forwarded_for: str) -> None:
+        scope = {
+            "type": "http",
+            "client": (client, 1234),
+            "headers": [(b"x-forwarded-for", forwarded_for.encode())],
+        }
+        await ProxyHeadersMiddleware(app, trusted)(scope, None, None)  # type: ignore[arg-type]
+
+    asyncio.run(call("172.18.0.2", "203.0.113.7"))
+    # A spoofed address ahead of the one the proxy appended is ignored
+    asyncio.run(call("172.18.0.2", "198.51.100.1, 203.0.113.7"))
+    # Only a trusted proxy can forward an address
+    asyncio.run(call("203.0.113.9", "198.51.100.1"))
+    assert identities == ["ip:203.0.113.7", "ip:203.0.113.7", "ip:203.0.113.9"]
@@ -0,0 +1,97 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import scheduler
+from app.core.config import settings
+from app.models import Draft, TweetOutbox
+from app.scheduler import Scheduler
+from app.tests.utils.session import FakeSession
+
+
+def make_draft(content: str = "hello", late: float = 30.0) -> Draft:
+    return Draft(
+        id=uuid.uuid4(),
+        title="t",
+        content=content,
+        user_id=uuid.uuid4(),
+        scheduled_time=datetime.now() - timedelta(seconds=late),
+    )
+
+
+def run_once(
+    monkeypatch: pytest.MonkeyPatch, worker: Scheduler, drafts: list[Draft]
+) -> FakeSession:
+    session = FakeSession(drafts)
+    monkeypatch.setattr(scheduler, "AsyncSession", session)
+    assert asyncio.run(worker.run_once()) == len(drafts)
+    assert session.commits == 1
+    return session
+
+
+def test_claims_due_drafts_without_blocking_on_locked_ones(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    worker = Scheduler(batch_size=5, poll_interval=1.0)
+    session = run_once(monkeypatch, worker, [])
+    (claim,) = session.statements
+    # Matches the partial index on due, unpublished drafts
+    assert "WHERE NOT drafts.is_published AND drafts.scheduled_time <=" in claim
+    assert "ORDER BY drafts.scheduled_time" in claim
+    assert claim.endswith("FOR UPDATE SKIP LOCKED")
+    assert session.params[0]["param_1"] == 5
+
+
+def test_due_drafts_are_queued_in_the_claiming_transaction(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    worker = Scheduler(batch_size=5, poll_interval=1.0)
+    draft = make_draft()
+    session = run_once(monkeypatch, worker, [draft])
+    assert draft.is_published
+    (entry,) = [obj for obj in session.added if isinstance(obj, TweetOutbox)]
+    assert entry.draft_id == draft.id
+    assert entry.content == draft.content
+    assert worker.queued == 1
+    assert worker.lag.count == 1
+    assert worker.lag.sum >= 30
+
+
+def test_draft_that_cannot_be_queued_backs_off(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    worker = Scheduler(batch_size=5, poll_interval=1.0)
+    draft = make_draft(content="x" * 281)
+    session = run_once(monkeypatch, worker, [draft])
+    assert not draft.is_published
+    assert session.added == []
+    assert worker.failed == 1
+    assert worker._skipped() == [draft.id]
+
+    # Left out of the next claim while backing off
+    session = run_once(monkeypatch, worker, [])
+    assert "drafts.id NOT IN" in session.statements[0]
+    assert [draft.id] in session.params[0].values()
+
+
+def test_backoff_doubles_up_to_the_limit_and_expires(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    worker = Scheduler(batch_size=5, poll_interval=1.0)
+    draft = make_draft()
+    delays = []
+    for _ in range(20):
+        worker._fail(draft, "error")
+        delays.append(round(worker._backoff[draft.id][1] - time.monotonic()))
+    assert delays[:3] == [2, 4, 8]
+    assert delays[-1] == settings.SCHEDULER_MAX_RETRY_DELAY
+
+    failures, _ = worker._backoff[draft.id]
+    worker._backoff[draft.id] = (failures, time.monotonic() - 1)
+    assert worker._skipped() == []
+    # A later success clears the failure count
+    run_once(monkeypatch, worker, [draft])
+    assert draft.id not in worker._backoff
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.security import UNUSABLE_PASSWORD, PasswordService, verify_password
+
+
+def test_saturated_pool_rejects_with_503() -> None:
+    service = PasswordService(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def main() -> HTTPException:
+        # One call running, one queued: the pool is full
+        blocked = [asyncio.ensure_future(service._run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exc_info:
+            await service.hash("changethis")
+        release.set()
+        await asyncio.gather(*blocked)
+        # Capacity frees up once the backlog drains
+        assert verify_password("changethis", await service.hash("changethis"))
+        return exc_info.value
+
+    try:
+        error = asyncio.run(main())
+    finally:
+        service.shutdown()
+    assert error.status_code == 503
+    assert error.headers == {"Retry-After": "1"}
+    assert service.rejected == 1
+    assert service.pending == 0
+
+
+@pytest.mark.parametrize("password", ["", UNUSABLE_PASSWORD, "changethis"])
+def test_unusable_password_never_matches(password: str) -> None:
+    service = PasswordService(max_workers=1, max_queue=1)
+    try:
+        assert not asyncio.run(service.verify(password, UNUSABLE_PASSWORD))
+    finally:
+        service.shutdown()
+
+
+def test_failures_are_counted_apart_from_completions() -> None:
+    service = PasswordService(max_workers=1, max_queue=1)
+
+    def broken() -> None:
+        raise ValueError("malformed hash")
+
+    async def main() -> None:
+        with pytest.raises(ValueError):
+            await service._run(broken)
+        await service.hash("changethis")
+
+    try:
+        asyncio.run(main())
+    finally:
+        service.shutdown()
+    assert (service.completed, service.failed, service.pending) == (1, 1, 0)
+    (failed,) = [
+        line for line in service.collect() if line.startswith("password_failed_total{")
+    ]
+    assert failed.endswith(" 1")
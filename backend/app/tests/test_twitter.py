@@ -0,0 +1,215 @@
+import asyncio
+import time
+from collections.abc import Callable
+from typing import Any
+
+import httpx
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from app import twitter
+from app.cache import CacheService
+from app.twitter import (
+    MAX_BACKOFF,
+    MAX_RETRIES,
+    READ,
+    RECORD,
+    RESERVE,
+    TWEETS_ENDPOINT,
+    RateLimitTracker,
+    TwitterClient,
+    TwitterError,
+    TwitterRateLimited,
+    backoff,
+)
+
+KEY = RateLimitTracker.key(TWEETS_ENDPOINT)
+
+
+def run(cache: CacheService, script: str, *args: int) -> list[Any]:
+    return asyncio.run(cache.run_script(script, keys=[KEY], args=list(args)))
+
+
+def test_reserve_is_open_until_a_budget_is_recorded() -> None:
+    cache = CacheService(FakeAsyncRedis())
+    assert run(cache, RESERVE) == [1, -1, 0]
+
+
+def test_reserve_spends_the_recorded_budget() -> None:
+    cache = CacheService(FakeAsyncRedis())
+    reset = int(time.time()) + 60
+    assert run(cache, RECORD, 3, 2, reset) == 1
+    assert run(cache, RESERVE)[:2] == [1, 1]
+    assert run(cache, RESERVE)[:2] == [1, 0]
+    allowed, remaining, wait_ms = run(cache, RESERVE)
+    assert (allowed, remaining) == (0, 0)
+    assert 58_000 < wait_ms <= 60_000
+
+
+def test_reserve_is_open_again_once_the_window_resets() -> None:
+    cache = CacheService(FakeAsyncRedis())
+    run(cache, RECORD, 3, 0, int(time.time()) - 1)
+    assert run(cache, RESERVE) == [1, -1, 0]
+
+
+def test_record_keeps_the_newest_window_and_the_lowest_count() -> None:
+    cache = CacheService(FakeAsyncRedis())
+    reset = int(time.time()) + 60
+    run(cache, RECORD, 10, 5, reset)
+    # A response from an older window arriving late is ignored
+    assert run(cache, RECORD, 10, 9, reset - 900) == 0
+    # Within a window, requests reserved since a response was sent are already deducted
+    run(cache, RECORD, 10, 7, reset)
+    assert run(cache, READ) == [b"10", b"5", str(reset).encode()]
+    run(cache, RECORD, 10, 9, reset + 900)
+    assert run(cache, READ) == [b"10", b"9", str(reset + 900).encode()]
+    # Kept for a minute past the window's reset
+    assert 960 < asyncio.run(cache.redis.ttl(KEY)) <= 1020
+
+
+def response(
+    status_code: int, reset: int | None = None, **kwargs: Any
+) -> httpx.Response:
+    headers = {}
+    if reset is not None:
+        headers = {
+            "x-rate-limit-limit": "10",
+            "x-rate-limit-remaining": "0" if status_code == 429 else "9",
+            "x-rate-limit-reset": str(reset),
+        }
+    return httpx.Response(status_code, headers=headers, **kwargs)
+
+
+def test_tracker_records_headers_and_reports_budgets() -> None:
+    tracker = RateLimitTracker(CacheService(FakeAsyncRedis()))
+    reset = int(time.time()) + 60
+
+    async def main() -> None:
+        assert not await tracker.record(TWEETS_ENDPOINT, response(201))
+        assert await tracker.record(TWEETS_ENDPOINT, response(201, reset))
+        assert await tracker.reserve(TWEETS_ENDPOINT) == 0
+        budget = (await tracker.budgets())[TWEETS_ENDPOINT]
+        assert budget["limit"] == 10
+        assert budget["remaining"] == 8
+        assert 55 < budget["resets_in"] <= 60
+
+    asyncio.run(main())
+    assert tracker.last_seen == {TWEETS_ENDPOINT: (10, 9, reset)}
+
+
+def test_tracker_lets_requests_through_without_redis() -> None:
+    server = FakeServer()
+    server.connected = False
+    tracker = RateLimitTracker(CacheService(FakeAsyncRedis(server=server)))
+    reset = int(time.time()) + 60
+
+    async def main() -> None:
+        assert await tracker.record(TWEETS_ENDPOINT, response(429, reset))
+        assert await tracker.reserve(TWEETS_ENDPOINT) == 0
+        # Budgets fall back to what this worker saw last
+        budget = (await tracker.budgets())[TWEETS_ENDPOINT]
+        assert (budget["limit"], budget["remaining"]) == (10, 0)
+
+    asyncio.run(main())
+
+
+def test_backoff_is_full_jitter_up_to_the_cap() -> None:
+    for attempt in range(8):
+        delays = [backoff(attempt) for _ in range(200)]
+        assert all(0 <= d <= min(MAX_BACKOFF, 2**attempt) for d in delays)
+    assert max(backoff(8) for _ in range(200)) > MAX_BACKOFF / 2
+
+
+def make_client(
+    monkeypatch: pytest.MonkeyPatch,
+    responses: list[httpx.Response | Exception],
+) -> tuple[TwitterClient, list[httpx.Request], list[int]]:
+    client = TwitterClient(RateLimitTracker(CacheService(FakeAsyncRedis())))
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        outcome = responses.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    backoffs: list[int] = []
+
+    def no_wait(attempt: int) -> float:
+        backoffs.append(attempt)
+        return 0.0
+
+    monkeypatch.setattr(twitter, "backoff", no_wait)
+    return client, requests, backoffs
+
+
+def tweet(client: TwitterClient, max_wait: float = 0) -> dict[str, Any]:
+    return asyncio.run(client.create_tweet("hello", max_wait=max_wait))
+
+
+CREATED = response(201, json={"data": {"id": "42"}})
+
+
+@pytest.mark.parametrize(
+    "failure",
+    [
+        lambda: response(503, text="Service Unavailable"),
+        lambda: response(429),
+        lambda: httpx.ConnectError("Connection refused"),
+    ],
+)
+def test_create_tweet_retries_with_backoff(
+    monkeypatch: pytest.MonkeyPatch,
+    failure: Callable[[], httpx.Response | Exception],
+) -> None:
+    client, requests, backoffs = make_client(monkeypatch, [failure(), CREATED])
+    assert tweet(client) == {"data": {"id": "42"}}
+    assert len(requests) == 2
+    assert len(backoffs) == 1
+
+
+def test_create_tweet_gives_up_after_the_last_retry(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    failures = [response(500, json={"detail": "oops"}) for _ in range(MAX_RETRIES)]
+    client, requests, _ = make_client(monkeypatch, failures)
+    with pytest.raises(TwitterError) as raised:
+        tweet(client)
+    assert raised.value.status_code == 500
+    assert raised.value.detail == {"detail": "oops"}
+    assert len(requests) == MAX_RETRIES
+
+
+def test_create_tweet_does_not_retry_a_rejection(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    client, requests, _ = make_client(monkeypatch, [response(403, text="Forbidden")])
+    with pytest.raises(TwitterError) as raised:
+        tweet(client)
+    assert raised.value.status_code == 403
+    assert raised.value.detail == "Forbidden"
+    assert len(requests) == 1
+
+
+def test_tracked_429_waits_for_the_window_instead_of_backing_off(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # The window resets now: the next reservation goes straight through
+    spent = response(429, int(time.time()) - 1)
+    client, requests, backoffs = make_client(monkeypatch, [spent, CREATED])
+    assert tweet(client) == {"data": {"id": "42"}}
+    assert len(requests) == 2
+    assert backoffs == []
+
+
+def test_exhausted_window_is_rejected_past_max_wait(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    spent = response(429, int(time.time()) + 120)
+    client, requests, _ = make_client(monkeypatch, [spent])
+    with pytest.raises(TwitterRateLimited) as raised:
+        tweet(client, max_wait=5)
+    assert 115 < raised.value.retry_after <= 120
+    assert len(requests) == 1
@@ -0,0 +1,160 @@
+import asyncio
+import base64
+import os
+import uuid
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from py_vapid import Vapid
+
+from app import webpush
+from app.api.routes import notification
+from app.api.routes.notification import (
+    NotificationRequest,
+    send_notifications_to_subscribers,
+)
+from app.tests.utils.session import FakeSession
+from app.webpush import Target, WebPushService
+
+
+def b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def make_target(endpoint: str) -> Target:
+    key = ec.generate_private_key(ec.SECP256R1()).public_key()
+    p256dh = key.public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    )
+    return uuid.uuid4(), endpoint, b64(p256dh), b64(os.urandom(16))
+
+
+class SigningVapid:
+    def __init__(self) -> None:
+        self.vapid = Vapid()
+        self.vapid.generate_keys()
+        self.audiences: list[str] = []
+
+    def sign(self, claims: dict, *args: object) -> dict[str, str]:
+        self.audiences.append(claims["aud"])
+        return self.vapid.sign(claims)
+
+
+def make_service(
+    monkeypatch: pytest.MonkeyPatch, statuses: dict[str, int]
+) -> tuple[WebPushService, SigningVapid, list[str]]:
+    """
+    A push service whose HTTP calls answer with `statuses[endpoint]`, in the order
+    they are sent.
+    """
+    service = WebPushService(
+        concurrency=10, connections_per_service=2, encrypt_workers=0, ttl=0
+    )
+    vapid = SigningVapid()
+    service._vapid = vapid  # type: ignore[assignment]
+    requests: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.headers["Content-Encoding"] == "aes128gcm"
+        assert request.headers["Authorization"].startswith("vapid ")
+        requests.append(str(request.url))
+        return httpx.Response(statuses[str(request.url)])
+
+    transport = httpx.MockTransport(handler)
+    for endpoint in statuses:
+        service._clients[webpush.push_service(endpoint)] = httpx.AsyncClient(
+            transport=transport
+        )
+    monkeypatch.setattr(webpush.settings, "ADMIN_EMAIL", "admin@example.com")
+    return service, vapid, requests
+
+
+def test_gone_subscriptions_are_reported_and_deleted(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    statuses = {
+        "https://fcm.googleapis.com/send/ok": 201,
+        "https://fcm.googleapis.com/send/expired": 410,
+        "https://updates.push.services.mozilla.com/wpush/v2/missing": 404,
+        "https://updates.push.services.mozilla.com/wpush/v2/down": 503,
+    }
+    service, _, _ = make_service(monkeypatch, statuses)
+    targets = [make_target(endpoint) for endpoint in statuses]
+    monkeypatch.setattr(notification, "webpush_service", service)
+    session = FakeSession([])
+    monkeypatch.setattr(notification, "AsyncSession", session)
+
+    request = NotificationRequest(title="t", body="b", group="all")
+    asyncio.run(send_notifications_to_subscribers(targets, request))
+    assert service.last_fanout["sent"] == 1
+    assert service.last_fanout["failed"] == 1
+    assert service.last_fanout["gone"] == 2
+    assert service.services["https://fcm.googleapis.com"].gone == 1
+
+    (statement,) = session.statements
+    assert statement.startswith("DELETE FROM push_subscriptions")
+    assert set(*session.params[0].values()) == {targets[1][0], targets[2][0]}
+    assert session.commits == 1
+
+
+def test_vapid_headers_are_signed_once_per_service(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    endpoints = [
+        "https://fcm.googleapis.com/send/a",
+        "https://fcm.googleapis.com/send/b",
+        "https://web.push.apple.com/c",
+    ]
+    service, vapid, _ = make_service(monkeypatch, dict.fromkeys(endpoints, 201))
+    targets = [make_target(endpoint) for endpoint in endpoints]
+
+    async def main() -> None:
+        await service.send(targets, {"title": "t"})
+        await service.send(targets, {"title": "u"})
+
+    asyncio.run(main())
+    assert sorted(vapid.audiences) == [
+        "https://fcm.googleapis.com",
+        "https://web.push.apple.com",
+    ]
+    # Re-signed once the cached token is about to expire
+    expiry, headers = service._vapid_headers["https://web.push.apple.com"]
+    service._vapid_headers["https://web.push.apple.com"] = (0, headers)
+    service._vapid_for("https://web.push.apple.com")
+    assert vapid.audiences[-1] == "https://web.push.apple.com"
+    assert len(vapid.audiences) == 3
+    assert service._vapid_headers["https://web.push.apple.com"][0] >= expiry
+
+
+def test_clients_are_kept_per_push_service() -> None:
+    service = WebPushService(
+        concurrency=10, connections_per_service=2, encrypt_workers=0, ttl=0
+    )
+    fcm = service._client("https://fcm.googleapis.com")
+    assert service._client("https://fcm.googleapis.com") is fcm
+    assert service._client("https://web.push.apple.com") is not fcm
+    asyncio.run(service.close())
+    assert service._clients == {}
+
+
+def test_chunks_are_sent_in_order(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(webpush, "ENCRYPT_CHUNK", 2)
+    endpoints = [f"https://fcm.googleapis.com/send/{i}" for i in range(5)]
+    service, _, requests = make_service(monkeypatch, dict.fromkeys(endpoints, 201))
+    targets = [make_target(endpoint) for endpoint in endpoints]
+
+    async def main() -> None:
+        await service.connect()
+        await service.send(targets, {"title": "t"})
+
+    asyncio.run(main())
+    chunk = {endpoint: index // 2 for index, endpoint in enumerate(endpoints)}
+    assert [chunk[url] for url in requests] == [0, 0, 1, 1, 2]
+    # The in-flight limit is made on the loop that connects, not shared across loops
+    semaphore = service.semaphore
+    service.semaphore = None
+    asyncio.run(main())
+    assert service.semaphore is not semaphore
+    assert len(requests) == 10
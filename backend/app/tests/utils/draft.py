@@ -0,0 +1,24 @@
+import uuid
+
+from sqlmodel import Session
+
+from app.models import Draft
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_lower_string
+
+
+def create_random_draft(
+    db: Session, user_id: uuid.UUID | None = None, is_published: bool = False
+) -> Draft:
+    if user_id is None:
+        user_id = create_random_user(db).id
+    draft = Draft(
+        title=random_lower_string(),
+        content=random_lower_string(),
+        is_published=is_published,
+        user_id=user_id,
+    )
+    db.add(draft)
+    db.commit()
+    db.refresh(draft)
+    return draft
@@ -0,0 +1,55 @@
+from typing import Any
+
+from sqlalchemy.dialects import postgresql
+
+
+class FakeResult:
+    def __init__(self, rows: list[Any], rowcount: int):
+        self.rows = rows
+        self.rowcount = rowcount
+
+    def all(self) -> list[Any]:
+        return self.rows
+
+    def first(self) -> Any:
+        return self.rows[0] if self.rows else None
+
+
+class FakeSession:
+    """
+    Stands in for an AsyncSession: the n-th query returns the n-th of `results` (later
+    ones return nothing), and every UPDATE reports `rowcount` rows. Every statement is compiled for Postgres and
+    recorded, with its parameters. Patch it over the module's AsyncSession; calling
+    it returns itself, so each transaction a worker opens lands in the same record.
+    """
+
+    def __init__(self, *results: list[Any], rowcount: int = 1):
+        self.results = results
+        self.rowcount = rowcount
+        self.statements: list[str] = []
+        self.params: list[dict[str, Any]] = []
+        self.added: list[Any] = []
+        self.commits = 0
+
+    def __call__(self, *args: Any, **kwargs: Any) -> "FakeSession":
+        return self
+
+    async def __aenter__(self) -> "FakeSession":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        pass
+
+    async def exec(self, statement: Any) -> FakeResult:
+        compiled = statement.compile(dialect=postgresql.dialect())
+        self.statements.append(str(compiled))
+        self.params.append(compiled.params)
+        index = len(self.statements) - 1
+        rows = self.results[index] if index < len(self.results) else []
+        return FakeResult(rows, self.rowcount)
+
+    def add(self, obj: Any) -> None:
+        self.added.append(obj)
+
+    async def commit(self) -> None:
+        self.commits += 1
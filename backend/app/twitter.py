@@ -0,0 +1,334 @@
+import asyncio
+import logging
+import math
+import random
+import time
+from collections.abc import Generator, Iterable
+from typing import Any
+
+import httpx
+from oauthlib.oauth1 import Client as OAuth1Client
+
+from app import metrics
+from app.cache import CacheService, CacheUnavailableError, cache_service
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Define the Twitter API endpoint for creating tweets
+TWITTER_API_URL = "https://api.twitter.com/2/tweets"
+# Constants
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 2  # Exponential backoff factor
+MAX_BACKOFF = 10.0
+# Rate limit windows are per endpoint; these are the ones this client calls
+TWEETS_ENDPOINT = "POST /2/tweets"
+ENDPOINTS = (TWEETS_ENDPOINT,)
+
+# The rate limit scripts keep {limit, remaining, reset} in one hash per endpoint, where
+# reset is Twitter's x-rate-limit-reset (unix seconds).
+
+# Take one request from the budget. Replies {allowed, remaining, wait_ms}; remaining is
+# -1 while the current window's budget is not known yet.
+RESERVE = """
+local state = redis.call('HMGET', KEYS[1], 'remaining', 'reset')
+local remaining = tonumber(state[1])
+local reset = tonumber(state[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+if remaining == nil or reset == nil or now >= reset * 1000 then
+    return {1, -1, 0}
+end
+if remaining <= 0 then
+    return {0, 0, reset * 1000 - now}
+end
+redis.call('HINCRBY', KEYS[1], 'remaining', -1)
+return {1, remaining - 1, 0}
+"""
+
+# Store the budget reported by a response. Responses can arrive out of order: one from
+# an older window is ignored, and within a window the lower remaining count wins, since
+# requests reserved after this one was sent are already deducted.
+RECORD = """
+local limit = tonumber(ARGV[1])
+local remaining = tonumber(ARGV[2])
+local reset = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'remaining', 'reset')
+local stored = tonumber(state[2])
+if stored ~= nil and stored > reset then
+    return 0
+end
+if stored == reset and tonumber(state[1]) ~= nil then
+    remaining = math.min(remaining, tonumber(state[1]))
+end
+redis.call('HSET', KEYS[1], 'limit', limit, 'remaining', remaining, 'reset', reset)
+redis.call('EXPIREAT', KEYS[1], reset + 60)
+return 1
+"""
+
+READ = """
+return redis.call('HMGET', KEYS[1], 'limit', 'remaining', 'reset')
+"""
+
+
+class TwitterError(Exception):
+    """
+    A tweet could not be created. `status_code` is None when Twitter was never reached.
+    """
+
+    def __init__(self, status_code: int | None, detail: Any):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class TwitterRateLimited(TwitterError):
+    """
+    The endpoint's rate limit window is exhausted for longer than the caller will wait.
+    """
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(
+            429,
+            f"Twitter rate limit for {endpoint} exhausted, retry in {math.ceil(retry_after)} seconds",
+        )
+        self.retry_after = retry_after
+
+
+class RateLimitTracker:
+    """
+    Twitter's rate limit budget per endpoint, shared by every worker through Redis.
+
+    Fed from the x-rate-limit-* headers of each response and consulted before each
+    request, so workers stop sending once the window is spent instead of collecting
+    429s. If Redis is unavailable requests go through untracked.
+    """
+
+    def __init__(self, cache: CacheService):
+        self.cache = cache
+        # Endpoint -> (limit, remaining, reset) last reported to this process, for metrics
+        self.last_seen: dict[str, tuple[int, int, int]] = {}
+
+    @staticmethod
+    def key(endpoint: str) -> str:
+        return f"twitter:ratelimit:{endpoint}"
+
+    async def reserve(self, endpoint: str) -> float:
+        """
+        Take one request from the endpoint's budget.
+        Returns:
+            float: 0 if the request may be sent, otherwise seconds until the window resets
+        """
+        try:
+            allowed, _, wait_ms = await self.cache.run_script(
+                RESERVE, keys=[self.key(endpoint)], args=[]
+            )
+        except Exception as e:
+            if not isinstance(e, CacheUnavailableError):
+                logger.error(f"Error reserving Twitter rate limit: {str(e)}")
+            return 0.0
+        return 0.0 if allowed else wait_ms / 1000
+
+    async def record(self, endpoint: str, response: httpx.Response) -> bool:
+        """
+        Store the budget reported in a response's rate limit headers.
+        Returns:
+            bool: True if the response carried rate limit headers
+        """
+        try:
+            limit = int(response.headers["x-rate-limit-limit"])
+            remaining = int(response.headers["x-rate-limit-remaining"])
+            reset = int(response.headers["x-rate-limit-reset"])
+        except (KeyError, ValueError):
+            return False
+        self.last_seen[endpoint] = (limit, remaining, reset)
+        try:
+            await self.cache.run_script(
+                RECORD, keys=[self.key(endpoint)], args=[limit, remaining, reset]
+            )
+        except Exception as e:
+            if not isinstance(e, CacheUnavailableError):
+                logger.error(f"Error recording Twitter rate limit: {str(e)}")
+        return True
+
+    async def budgets(
+        self, endpoints: Iterable[str] = ENDPOINTS
+    ) -> dict[str, dict[str, Any]]:
+        """
+        Remaining budget per endpoint, as shared by all workers.
+        Returns:
+            dict: Endpoint -> limit, remaining and seconds until reset; None where unknown
+        """
+        result = {}
+        for endpoint in endpoints:
+            try:
+                state = await self.cache.run_script(
+                    READ, keys=[self.key(endpoint)], args=[]
+                )
+                limit, remaining, reset = (
+                    int(v) if v is not None else None for v in state
+                )
+            except Exception as e:
+                if not isinstance(e, CacheUnavailableError):
+                    logger.error(f"Error reading Twitter rate limit: {str(e)}")
+                limit, remaining, reset = self.last_seen.get(
+                    endpoint, (None, None, None)
+                )
+            resets_in = max(reset - time.time(), 0.0) if reset is not None else None
+            if resets_in == 0.0:
+                # The window rolled over; the next response reports the new budget
+                remaining = limit
+            result[endpoint] = {
+                "limit": limit,
+                "remaining": remaining,
+                "resets_in": round(resets_in, 1) if resets_in is not None else None,
+            }
+        return result
+
+    def collect(self) -> Iterable[str]:
+        """
+        Prometheus exposition lines for the budgets last reported to this worker.
+        """
+        yield from metrics.sample_lines(
+            "twitter_rate_limit_remaining",
+            "gauge",
+            "Requests left in the endpoint's rate limit window, as last reported",
+            [
+                ({"endpoint": e}, remaining)
+                for e, (_, remaining, _) in self.last_seen.items()
+            ],
+        )
+        yield from metrics.sample_lines(
+            "twitter_rate_limit_reset_timestamp_seconds",
+            "gauge",
+            "Unix time the endpoint's rate limit window resets",
+            [({"endpoint": e}, reset) for e, (_, _, reset) in self.last_seen.items()],
+        )
+
+
+class OAuth1Auth(httpx.Auth):
+    """
+    OAuth 1.0a request signing for httpx. JSON bodies are not part of the signature.
+    """
+
+    def __init__(self, client: OAuth1Client):
+        self.client = client
+
+    def auth_flow(
+        self, request: httpx.Request
+    ) -> Generator[httpx.Request, httpx.Response, None]:
+        _, headers, _ = self.client.sign(str(request.url), request.method)
+        request.headers.update(headers)
+        yield request
+
+
+def backoff(attempt: int) -> float:
+    """
+    Full-jitter exponential backoff, so retrying workers do not stampede together.
+    """
+    return random.uniform(0, min(MAX_BACKOFF, BACKOFF_FACTOR**attempt))
+
+
+class TwitterClient:
+    """
+    Shared async Twitter client: one keep-alive connection pool per worker.
+    """
+
+    def __init__(self, rate_limits: RateLimitTracker) -> None:
+        self.rate_limits = rate_limits
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                auth=OAuth1Auth(
+                    OAuth1Client(
+                        settings.TWITTER_CONSUMER_KEY,
+                        client_secret=settings.TWITTER_CONSUMER_SECRET,
+                        resource_owner_key=settings.TWITTER_ACCESS_TOKEN,
+                        resource_owner_secret=settings.TWITTER_ACCESS_TOKEN_SECRET,
+                    )
+                ),
+                timeout=httpx.Timeout(
+                    settings.TWITTER_TIMEOUT, connect=settings.TWITTER_CONNECT_TIMEOUT
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.TWITTER_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.TWITTER_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _reserve(self, endpoint: str, max_wait: float) -> None:
+        wait = await self.rate_limits.reserve(endpoint)
+        # Other workers may take the fresh window first, so check again after waiting
+        while wait:
+            if wait > max_wait:
+                raise TwitterRateLimited(endpoint, wait)
+            # Jitter so queued workers do not all fire the moment the window resets
+            delay = wait + random.uniform(0, 1)
+            await asyncio.sleep(delay)
+            max_wait -= delay
+            wait = await self.rate_limits.reserve(endpoint)
+
+    async def create_tweet(
+        self, text: str, max_wait: float | None = None
+    ) -> dict[str, Any]:
+        """
+        Post a tweet, retrying rate limits, server errors and network failures.
+        Args:
+            text: Tweet content
+            max_wait: Seconds to queue for an exhausted rate limit window before giving up;
+                defaults to TWITTER_RATE_LIMIT_MAX_WAIT
+        Returns:
+            dict: Twitter's response body
+        Raises:
+            TwitterRateLimited: The rate limit window resets later than `max_wait`
+            TwitterError: Twitter rejected the tweet or could not be reached after retries
+        """
+        if max_wait is None:
+            max_wait = settings.TWITTER_RATE_LIMIT_MAX_WAIT
+        for attempt in range(MAX_RETRIES):
+            last = attempt == MAX_RETRIES - 1
+            await self._reserve(TWEETS_ENDPOINT, max_wait)
+            try:
+                response = await self.client.post(TWITTER_API_URL, json={"text": text})
+            except httpx.HTTPError as e:
+                logger.error(f"Error posting tweet: {str(e)}")
+                if last:
+                    raise TwitterError(None, str(e)) from e
+                await asyncio.sleep(backoff(attempt + 1))
+                continue
+
+            tracked = await self.rate_limits.record(TWEETS_ENDPOINT, response)
+            if response.status_code == 201:
+                return response.json()
+            if response.status_code == 429 and tracked:
+                if last:
+                    raise TwitterError(response.status_code, _detail(response))
+                # The recorded window makes the next reservation wait for, or reject, the reset
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                if last:
+                    raise TwitterError(response.status_code, _detail(response))
+                await asyncio.sleep(backoff(attempt))
+                continue
+            raise TwitterError(response.status_code, _detail(response))
+        raise AssertionError("unreachable")
+
+
+def _detail(response: httpx.Response) -> Any:
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+twitter_client = TwitterClient(RateLimitTracker(cache_service))
+metrics.register_collector(twitter_client.rate_limits.collect)
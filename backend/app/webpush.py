@@ -0,0 +1,346 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import time
+import uuid
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+from py_vapid import Vapid
+from pywebpush import WebPusher
+
+from app import metrics
+from app.core.config import settings
+from app.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# (subscription id, endpoint, p256dh, auth); plain tuples so they pickle cheaply
+Target = tuple[uuid.UUID, str, str, str]
+
+# Subscriptions encrypted per process pool task, amortizing the pickling round trip
+ENCRYPT_CHUNK = 64
+# Push services accept VAPID tokens valid for up to 24 hours
+VAPID_EXPIRY = 12 * 60 * 60
+
+
+def encrypt_batch(targets: list[Target], data: bytes) -> list[bytes | None]:
+    """
+    Encrypt `data` (aes128gcm) for each subscription. Runs in a worker process.
+    Returns:
+        list: One body per target; None where the subscription's keys are unusable
+    """
+    bodies: list[bytes | None] = []
+    for _, endpoint, p256dh, auth in targets:
+        try:
+            pusher = WebPusher(
+                {"endpoint": endpoint, "keys": {"p256dh": p256dh, "auth": auth}}
+            )
+            bodies.append(pusher.encode(data, "aes128gcm")["body"])
+        # Malformed keys raise anything from WebPushException to ValueError; one bad
+        # subscription must not fail the rest of the chunk
+        except Exception:
+            bodies.append(None)
+    return bodies
+
+
+def push_service(endpoint: str) -> str:
+    parts = urlsplit(endpoint)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+@dataclass
+class ServiceStats:
+    sent: int = 0
+    failed: int = 0
+    gone: int = 0
+    latency: Histogram = field(default_factory=Histogram)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "gone": self.gone,
+            "latency": self.latency.snapshot(),
+        }
+
+
+@dataclass
+class FanoutResult:
+    sent: int = 0
+    failed: int = 0
+    # Subscriptions the push service reports expired (404/410); safe to delete
+    gone: list[uuid.UUID] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+class WebPushService:
+    """
+    Fans a notification out to many push subscriptions.
+
+    Payloads are encrypted in chunks on a process pool, since ECDH and AES-GCM are
+    CPU bound; chunks go out in order, the next one encrypting while the current one
+    sends. VAPID headers are signed once per push service instead of per message.
+    Each push service gets its own keep-alive connection pool, and at most
+    `concurrency` requests are in flight across all of them.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        connections_per_service: int,
+        encrypt_workers: int,
+        ttl: int,
+    ):
+        self.concurrency = concurrency
+        self.connections_per_service = connections_per_service
+        self.encrypt_workers = encrypt_workers
+        self.ttl = ttl
+        self.semaphore: asyncio.Semaphore | None = None
+        self.in_flight = 0
+        self.fanouts = 0
+        self.last_fanout: dict[str, Any] = {}
+        self.services: dict[str, ServiceStats] = {}
+        self.encrypt_time = Histogram()
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._executor: ProcessPoolExecutor | None = None
+        self._vapid: Vapid | None = None
+        # Push service -> (expiry, signed VAPID headers)
+        self._vapid_headers: dict[str, tuple[int, dict[str, str]]] = {}
+
+    async def connect(self) -> None:
+        """
+        Create the in-flight limit on the running event loop.
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+
+    def _client(self, service: str) -> httpx.AsyncClient:
+        client = self._clients.get(service)
+        if client is None:
+            client = self._clients[service] = httpx.AsyncClient(
+                timeout=settings.WEBPUSH_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=self.connections_per_service,
+                    max_keepalive_connections=self.connections_per_service,
+                ),
+            )
+        return client
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned, not forked: the server process has an event loop and threads running
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.encrypt_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _vapid_for(self, service: str) -> dict[str, str]:
+        now = int(time.time())
+        cached = self._vapid_headers.get(service)
+        if cached and cached[0] > now + 60:
+            return cached[1]
+        if self._vapid is None:
+            self._vapid = Vapid.from_string(private_key=settings.VAPID_PRIVATE_KEY)
+        expiry = now + VAPID_EXPIRY
+        headers = self._vapid.sign(
+            {"sub": f"mailto:{settings.ADMIN_EMAIL}", "aud": service, "exp": expiry}
+        )
+        self._vapid_headers[service] = (expiry, headers)
+        return headers
+
+    async def _encrypt(self, chunk: list[Target], data: bytes) -> list[bytes | None]:
+        started = time.perf_counter()
+        if self.encrypt_workers:
+            bodies = await asyncio.get_running_loop().run_in_executor(
+                self.executor, encrypt_batch, chunk, data
+            )
+        else:
+            bodies = await asyncio.to_thread(encrypt_batch, chunk, data)
+        self.encrypt_time.observe(time.perf_counter() - started)
+        return bodies
+
+    async def _send(
+        self,
+        target: Target,
+        body: bytes | None,
+        vapid: dict[str, dict[str, str]],
+        result: FanoutResult,
+        semaphore: asyncio.Semaphore,
+    ) -> None:
+        id, endpoint, _, _ = target
+        service = push_service(endpoint)
+        stats = self.services.setdefault(service, ServiceStats())
+        if body is None:
+            stats.failed += 1
+            result.failed += 1
+            return
+        headers = {
+            **vapid[service],
+            "Content-Encoding": "aes128gcm",
+            "TTL": str(self.ttl),
+        }
+        async with semaphore:
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                response = await self._client(service).post(
+                    endpoint, content=body, headers=headers
+                )
+            except httpx.HTTPError as e:
+                stats.failed += 1
+                result.failed += 1
+                logger.error(f"Error sending push notification to {service}: {str(e)}")
+                return
+            finally:
+                self.in_flight -= 1
+            stats.latency.observe(time.perf_counter() - started)
+        if response.status_code in (404, 410):
+            stats.gone += 1
+            result.gone.append(id)
+        elif response.status_code >= 400:
+            stats.failed += 1
+            result.failed += 1
+            logger.error(
+                f"Error sending push notification to {service}: {response.status_code} {response.text}"
+            )
+        else:
+            stats.sent += 1
+            result.sent += 1
+
+    async def send(
+        self, targets: list[Target], payload: dict[str, Any]
+    ) -> FanoutResult:
+        """
+        Deliver one payload to every target.
+        Args:
+            targets: Subscriptions as (id, endpoint, p256dh, auth)
+            payload: JSON-serializable notification body
+        Returns:
+            FanoutResult: Counts, plus the subscriptions that no longer exist
+        """
+        if self.semaphore is None:
+            await self.connect()
+        semaphore = self.semaphore
+        assert semaphore is not None
+        data = json.dumps(payload).encode()
+        result = FanoutResult()
+        started = time.perf_counter()
+        # Signed up front: a bad VAPID key fails the fan-out once, not once per message
+        vapid = {
+            service: self._vapid_for(service)
+            for service in {push_service(endpoint) for _, endpoint, _, _ in targets}
+        }
+
+        chunks = [
+            targets[i : i + ENCRYPT_CHUNK]
+            for i in range(0, len(targets), ENCRYPT_CHUNK)
+        ]
+        # Chunks go out in order; only the next one is encrypted while one is sending
+        encrypting: asyncio.Task[list[bytes | None]] | None = None
+        try:
+            for index, chunk in enumerate(chunks):
+                if encrypting is None:
+                    bodies = await self._encrypt(chunk, data)
+                else:
+                    bodies = await encrypting
+                encrypting = None
+                if index + 1 < len(chunks):
+                    encrypting = asyncio.create_task(
+                        self._encrypt(chunks[index + 1], data)
+                    )
+                await asyncio.gather(
+                    *(
+                        self._send(target, body, vapid, result, semaphore)
+                        for target, body in zip(chunk, bodies, strict=True)
+                    )
+                )
+        finally:
+            if encrypting is not None:
+                encrypting.cancel()
+        result.seconds = time.perf_counter() - started
+        self.fanouts += 1
+        self.last_fanout = {
+            "subscribers": len(targets),
+            "sent": result.sent,
+            "failed": result.failed,
+            "gone": len(result.gone),
+            "seconds": round(result.seconds, 3),
+            "per_second": round(len(targets) / result.seconds, 1)
+            if result.seconds
+            else 0.0,
+        }
+        return result
+
+    async def close(self) -> None:
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.semaphore = None
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "encrypt_workers": self.encrypt_workers,
+            "in_flight": self.in_flight,
+            "fanouts": self.fanouts,
+            "last_fanout": self.last_fanout,
+            "encrypt_time": self.encrypt_time.snapshot(),
+            "services": {
+                service: stats.snapshot() for service, stats in self.services.items()
+            },
+        }
+
+    def collect(self) -> Iterable[str]:
+        """
+        Prometheus exposition lines for this worker's push fan-out.
+        """
+        yield from metrics.sample_lines(
+            "webpush_in_flight",
+            "gauge",
+            "Push requests in flight",
+            [({}, self.in_flight)],
+        )
+        for name, help in (
+            ("sent", "Push notifications accepted by the push service"),
+            ("failed", "Push notifications that could not be delivered"),
+            ("gone", "Push subscriptions reported expired"),
+        ):
+            yield from metrics.sample_lines(
+                f"webpush_{name}_total",
+                "counter",
+                help,
+                [
+                    ({"service": s}, getattr(stats, name))
+                    for s, stats in self.services.items()
+                ],
+            )
+        yield from metrics.histogram_lines(
+            "webpush_request_seconds",
+            "Push service response time",
+            [({"service": s}, stats.latency) for s, stats in self.services.items()],
+        )
+        yield from metrics.histogram_lines(
+            "webpush_encrypt_seconds",
+            f"Time to encrypt a chunk of up to {ENCRYPT_CHUNK} payloads",
+            [({}, self.encrypt_time)],
+        )
+
+
+webpush_service = WebPushService(
+    concurrency=settings.WEBPUSH_CONCURRENCY,
+    connections_per_service=settings.WEBPUSH_CONNECTIONS_PER_SERVICE,
+    encrypt_workers=settings.WEBPUSH_ENCRYPT_WORKERS,
+    ttl=settings.WEBPUSH_TTL,
+)
+metrics.register_collector(webpush_service.collect)